@@ -1,13 +1,18 @@
+import time
+
+# 시작 시간 측정
+_startup_time = time.perf_counter()
+
+from utils import startup_profile
+startup_profile.set_start_time(_startup_time)
+if startup_profile.is_requested():
+    startup_profile.enable()
+
 import os
 import sys
 import threading
-import time
 from tkinter import messagebox
 from tkinterdnd2 import TkinterDnD
-import webbrowser
-
-# 시작 시간 측정
-_startup_time = time.perf_counter()
 
 try:
     import ctypes
@@ -20,8 +25,7 @@ except Exception:
 from ui.main_window import MacroUI
 from core.keyboard_hotkey import _get_keyboard
 from utils.admin_utils import request_admin_if_needed
-from core.version import __version__, get_latest_version, get_release_url, is_update_available
-from core.persistence import load_app_state, save_app_state
+from core.app_state import get_app_state
 
 def main():
     # Windows에서 관리자 권한 확인 및 요청
@@ -41,17 +45,33 @@ def main():
         pass
 
     initial_file = None
-    if len(sys.argv) >= 2:
-        candidate = sys.argv[1]
-        if os.path.exists(candidate) and candidate.lower().endswith(".json"):
+    args = [a for a in sys.argv[1:] if a != "--profile-startup"]
+    if args:
+        candidate = args[0]
+        if os.path.exists(candidate) and candidate.lower().endswith((".json", ".ckp")):
             initial_file = candidate
     root = TkinterDnD.Tk()
     ui = MacroUI(root, initial_file=initial_file)
 
-    # 버전 업데이트 체크 (별도 스레드, 하루에 한 번)
+    # 지표 내보내기 (app_state.json 의 "metrics_exporter" 가 있을 때만)
+    exporter_config = get_app_state().get("metrics_exporter")
+    if exporter_config:
+        from core import metrics_exporter
+        if not metrics_exporter.configure(exporter_config):
+            print("[Metrics] exporter could not be started")
+
+    # 로컬 제어 API (app_state.json 의 "control_api" 가 있을 때만)
+    control_config = get_app_state().get("control_api")
+    if control_config:
+        from core import control_api
+        if not control_api.configure(control_config):
+            print("[Control] API could not be started")
+
+    # 버전 업데이트 체크 (별도 스레드, 하루에 한 번). 시작 직후에는 미룸
     def check_update():
         try:
-            app_state = load_app_state()
+            from core.version import __version__, get_latest_version, get_release_url, is_update_available
+            app_state = get_app_state()
             last_check = app_state.get("last_update_check", 0)
             now = time.time()
 
@@ -66,16 +86,16 @@ def main():
                         "업데이트 확인",
                         f"업데이트가 있습니다.\n다운로드 하러 가시겠습니까?\n\n현재 버전: {__version__}\n최신 버전: {latest}"
                     ):
+                        import webbrowser
                         webbrowser.open(get_release_url())
                 root.after(0, show_update_dialog)
 
             # 체크 시간 저장
-            app_state["last_update_check"] = now
-            save_app_state(app_state)
+            app_state.set("last_update_check", now)
         except Exception:
             pass
 
-    threading.Thread(target=check_update, daemon=True).start()
+    root.after(3000, lambda: threading.Thread(target=check_update, daemon=True).start())
 
     def cleanup_hotkeys():
         kb = _get_keyboard()
@@ -103,6 +123,9 @@ def main():
             except Exception:
                 pass
 
+            ui.autosaver.shutdown()
+            ui.remember_window_geometry()
+
             t = getattr(ui, "worker_thread", None)
             if isinstance(t, threading.Thread) and t.is_alive():
                 t.join(timeout=1.5)
@@ -110,6 +133,7 @@ def main():
             pass
         finally:
             cleanup_hotkeys()
+            get_app_state().flush()
             try:
                 root.destroy()
             except Exception:
@@ -118,17 +142,25 @@ def main():
 
     root.protocol("WM_DELETE_WINDOW", on_close)
 
-    # UI 렌더링 완료 후 시작 시간 출력
+    # UI 렌더링 완료 후 시작 시간 출력. interactive 는 마지막 파일 복원까지 끝난 시점
     def print_startup_time():
-        elapsed = time.perf_counter() - _startup_time
+        elapsed = startup_profile.mark("first_paint")
         print(f"[Startup] UI ready in {elapsed:.3f}s")
 
+    def print_interactive_time():
+        elapsed = startup_profile.mark("interactive")
+        print(f"[Startup] interactive in {elapsed:.3f}s")
+        if startup_profile.is_requested():
+            startup_profile.report()
+
     root.after(0, print_startup_time)
+    ui.on_interactive = print_interactive_time
 
     try:
         root.mainloop()
     finally:
         cleanup_hotkeys()
+        get_app_state().flush()
         os._exit(0)
 
 if __name__ == "__main__":
@@ -0,0 +1,148 @@
+# core/app_state.py
+"""프로세스 전역 앱 상태 (~/.clikey/app_state.json).
+
+파일은 처음 접근할 때 한 번만 읽고, 이후 변경은 메모리에만 반영한 뒤
+잠시 모아서(write-behind) atomic_write 로 기록한다. 종료 시 flush() 를
+호출해야 한다 (app.py 는 os._exit 로 끝나므로 atexit 만으로는 부족).
+"""
+from __future__ import annotations
+from typing import Any, Dict, List, Optional
+import atexit
+import json
+import os
+import threading
+import time
+
+from core.persistence import atomic_write
+
+MAX_RECENT_FILES = 10
+
+
+def _state_dir() -> str:
+    return os.path.join(os.path.expanduser("~"), ".clikey")
+
+
+class AppStateStore:
+    """Loaded-once key/value app state with delayed, atomic flushes."""
+
+    def __init__(self, file_path: Optional[str] = None, flush_delay: float = 1.0):
+        self.file_path = file_path or os.path.join(_state_dir(), "app_state.json")
+        self.flush_delay = flush_delay
+        self._data: Optional[Dict[str, Any]] = None
+        self._dirty = False
+        self._dir_ready = False
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.RLock()
+
+    # ---------- 기본 접근 ----------
+    def _loaded(self) -> Dict[str, Any]:
+        if self._data is None:
+            try:
+                with open(self.file_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                self._data = data if isinstance(data, dict) else {}
+            except Exception:
+                self._data = {}
+        return self._data
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return json.loads(json.dumps(self._loaded()))
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            return self._loaded().get(key, default)
+
+    def set(self, key: str, value: Any) -> None:
+        self.update({key: value})
+
+    def update(self, values: Dict[str, Any]) -> None:
+        with self._lock:
+            data = self._loaded()
+            changed = False
+            for key, value in (values or {}).items():
+                if data.get(key, _MISSING) != value:
+                    data[key] = value
+                    changed = True
+            if changed:
+                self._mark_dirty()
+
+    def _mark_dirty(self) -> None:
+        self._dirty = True
+        if self._timer is None:
+            self._timer = threading.Timer(self.flush_delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return
+            try:
+                if not self._dir_ready:
+                    os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+                    self._dir_ready = True
+                with atomic_write(self.file_path) as f:
+                    json.dump(self._data, f, ensure_ascii=False, indent=2)
+                self._dirty = False
+            except Exception:
+                pass
+
+    # ---------- 최근 파일 ----------
+    def recent_files(self) -> List[str]:
+        return list(self.get("recent_files", []))
+
+    def add_recent_file(self, path: str) -> None:
+        path = os.path.abspath(path)
+        with self._lock:
+            recent = [p for p in self.get("recent_files", []) if os.path.normcase(p) != os.path.normcase(path)]
+            recent.insert(0, path)
+            self.update({"recent_files": recent[:MAX_RECENT_FILES], "last_file_path": path})
+
+    def remove_recent_file(self, path: str) -> None:
+        with self._lock:
+            recent = [p for p in self.get("recent_files", []) if os.path.normcase(p) != os.path.normcase(path)]
+            self.set("recent_files", recent)
+
+    # ---------- 창 위치/크기 ----------
+    def window_geometry(self) -> Optional[str]:
+        return self.get("window_geometry")
+
+    def set_window_geometry(self, geometry: str) -> None:
+        self.set("window_geometry", geometry)
+
+    # ---------- 매크로별 실행 통계 ----------
+    def run_stats(self, path: str) -> Dict[str, Any]:
+        stats = self.get("run_stats", {}).get(os.path.normcase(os.path.abspath(path)))
+        return dict(stats) if stats else {"runs": 0, "completed": 0, "total_seconds": 0.0, "last_run": None}
+
+    def record_run(self, path: str, seconds: float, completed: bool) -> None:
+        key = os.path.normcase(os.path.abspath(path))
+        with self._lock:
+            all_stats = dict(self.get("run_stats", {}))
+            stats = self.run_stats(path)
+            stats["runs"] += 1
+            stats["completed"] += int(bool(completed))
+            stats["total_seconds"] = round(stats["total_seconds"] + seconds, 3)
+            stats["last_run"] = time.time()
+            all_stats[key] = stats
+            self.set("run_stats", all_stats)
+
+
+_MISSING = object()
+_store: Optional[AppStateStore] = None
+_store_lock = threading.Lock()
+
+
+def get_app_state() -> AppStateStore:
+    """Process-wide store, created on first use and flushed at exit."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = AppStateStore()
+                atexit.register(_store.flush)
+    return _store
@@ -0,0 +1,173 @@
+# core/autosave.py
+"""백그라운드 저장.
+
+UI 스레드는 트리 스냅샷(MacroBlock.snapshot)만 만들고, 직렬화와 파일 쓰기는
+작업 스레드에서 atomic_write 로 처리한다. 자동 저장은 편집이 잠잠해질 때까지
+미뤄지며(debounce) 원본 대신 ~/.clikey/autosave 아래 복구 파일에 기록된다.
+"""
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+import hashlib
+import os
+import threading
+from collections import deque
+
+from core.macro_block import MacroBlock
+from core.persistence import save_macro_file
+from core.subroutines import SubroutineLibrary
+
+
+@dataclass
+class SaveJob:
+    path: str
+    macro_blocks: List[MacroBlock]
+    settings: Dict[str, Any]
+    hotkeys: Dict[str, Any]
+    # 패키지 저장 시 새 파일을 mmap 으로 다시 열지 여부 (복구 파일은 열지 않음)
+    keep_open: bool = True
+    # 서브루틴 본문 (스냅샷), 없으면 None
+    subroutines: Optional[SubroutineLibrary] = None
+    # 쓰기에 성공했을 때만 지울 복구 파일 (실패하면 자동 저장본을 남겨 둠)
+    discard_on_success: Optional[str] = None
+    on_done: Optional[Callable[[Optional[Exception]], None]] = field(default=None, repr=False)
+
+
+@dataclass
+class DiscardJob:
+    path: str
+
+
+def recovery_path(source_path: Optional[str]) -> str:
+    """Autosave file for a macro path (or for an untitled macro)."""
+    base = os.path.join(os.path.expanduser("~"), ".clikey", "autosave")
+    if not source_path:
+        return os.path.join(base, "untitled.json")
+    stem, ext = os.path.splitext(os.path.basename(source_path))
+    digest = hashlib.sha1(os.path.normcase(os.path.abspath(source_path)).encode("utf-8")).hexdigest()[:8]
+    return os.path.join(base, f"{stem}-{digest}{ext or '.json'}")
+
+
+def snapshot_blocks(macro_blocks: List[MacroBlock]) -> List[MacroBlock]:
+    return [block.snapshot() for block in macro_blocks]
+
+
+def write_job(job: SaveJob) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(job.path)), exist_ok=True)
+    from core.macro_package import is_package_path, save_macro_package
+    if is_package_path(job.path):
+        save_macro_package(job.path, job.macro_blocks, job.settings, job.hotkeys, keep_open=job.keep_open,
+                           subroutines=job.subroutines)
+    else:
+        save_macro_file(job.path, job.macro_blocks, job.settings, job.hotkeys, job.subroutines)
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class AutoSaver:
+    """Debounced autosave plus a single writer thread for explicit saves.
+
+    ``scheduler`` is anything with Tk-style ``after``/``after_cancel`` so the
+    debounce timer and ``snapshot`` both run on the UI thread. ``snapshot``
+    returns a SaveJob for the recovery file, or None when there is nothing
+    to save.
+    """
+
+    def __init__(self, scheduler, snapshot: Callable[[], Optional[SaveJob]], delay_ms: int = 2000):
+        self.scheduler = scheduler
+        self.snapshot = snapshot
+        self.delay_ms = delay_ms
+        self.last_error: Optional[Exception] = None
+        self._timer = None
+        self._jobs: deque = deque()
+        self._cond = threading.Condition()
+        self._busy = False
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="clikey-autosave", daemon=True)
+        self._thread.start()
+
+    # ---------- UI 스레드 ----------
+    def touch(self) -> None:
+        """Note an edit; the autosave fires delay_ms after the last one."""
+        if self._closed:
+            return
+        if self._timer is not None:
+            self.scheduler.after_cancel(self._timer)
+        self._timer = self.scheduler.after(self.delay_ms, self._on_timer)
+
+    def cancel(self) -> None:
+        if self._timer is not None:
+            self.scheduler.after_cancel(self._timer)
+            self._timer = None
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        try:
+            job = self.snapshot()
+        except Exception as e:
+            self.last_error = e
+            return
+        if job is not None:
+            self.submit(job)
+
+    def submit(self, job) -> None:
+        with self._cond:
+            if self._closed:
+                return
+            # 아직 쓰지 않은 같은 경로의 자동 저장은 최신 스냅샷으로 대체
+            self._jobs = deque(j for j in self._jobs if j.path != job.path or getattr(j, "on_done", None) is not None)
+            self._jobs.append(job)
+            self._cond.notify()
+
+    def discard(self, source_path: Optional[str]) -> None:
+        """Drop any pending autosave and delete the recovery file."""
+        self.cancel()
+        self.submit(DiscardJob(recovery_path(source_path)))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until every queued job is written. Returns False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._jobs and not self._busy, timeout)
+
+    def shutdown(self, timeout: Optional[float] = 5.0) -> None:
+        self.cancel()
+        self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    # ---------- 작업 스레드 ----------
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._jobs or self._closed)
+                if not self._jobs:
+                    return
+                job = self._jobs.popleft()
+                self._busy = True
+            error = None
+            try:
+                if isinstance(job, DiscardJob):
+                    _remove(job.path)
+                else:
+                    write_job(job)
+                    if job.discard_on_success:
+                        # 뒤에 쌓인 자동 저장보다 먼저 지우도록 이 스레드에서 바로 처리
+                        _remove(job.discard_on_success)
+            except Exception as e:
+                error = e
+                self.last_error = e
+            if isinstance(job, SaveJob) and job.on_done is not None:
+                try:
+                    job.on_done(error)
+                except Exception:
+                    pass
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
@@ -0,0 +1,345 @@
+# core/control_api.py
+"""로컬 제어 API (매크로 불러오기/시작/중지/상태).
+
+요청은 HTTP 서버 스레드에서 바로 MacroRunner 를 호출하므로 Tk 이벤트 루프가 바빠도
+지연되지 않는다. 127.0.0.1 에만 바인딩한다.
+
+웹 페이지가 브라우저를 통해 명령을 보내지 못하도록 모든 요청에 다음을 요구한다.
+- X-Clikey-Token 헤더 = 토큰 (설정에 없으면 처음 켤 때 만들어 앱 상태에 저장)
+- Origin 헤더 없음, Host 는 127.0.0.1:<port> 또는 localhost:<port>
+- POST 본문은 Content-Type: application/json
+
+    POST /load   {"path": "...", "name": "선택"}         -> 매크로 파일을 이름으로 불러옴
+    POST /start  {"name": "선택", "settings": {...}}      -> 불러온 매크로 실행 (settings 는 repeat 등 덮어쓰기)
+    POST /stop   {"name": "선택", "wait": 초}             -> 이름 생략 시 편집기 실행을 포함한 모든 실행 중지
+    GET  /status                                          -> 불러온 매크로와 실행 상태
+
+설정은 앱 상태(~/.clikey/app_state.json)의 "control_api" 키에 둔다. 예:
+    {"port": 9465}                      -> 토큰이 만들어져 같은 키에 저장됨
+    {"port": 9465, "token": "secret"}
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+import hmac
+import json
+import os
+import secrets
+import threading
+
+from core.macro_block import MacroBlock
+from core.macro_runner import MacroRunner, active_runners
+from core.subroutines import SubroutineLibrary
+from core.state import default_settings
+
+DEFAULT_PORT = 9465
+# 요청 본문 최대 크기 (명령만 받으므로 작게)
+MAX_BODY = 64 * 1024
+# start 요청으로 덮어쓸 수 있는 설정과 변환
+OVERRIDABLE_SETTINGS = {"repeat": int, "start_delay": float, "step_delay": float, "parallel_conditions": bool}
+
+
+class ControlError(Exception):
+    """A request the controller refuses; status is the HTTP status code."""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass
+class LoadedMacro:
+    path: str
+    blocks: List[MacroBlock]
+    settings: Dict[str, Any]
+    subroutines: SubroutineLibrary
+    # .ckp 이면 그 경로 (load_macro_package 가 늘린 사용자 하나를 release() 가 놓음)
+    package_path: Optional[str] = None
+
+    def release(self) -> None:
+        from core.macro_package import release_macro_package
+        path, self.package_path = self.package_path, None
+        release_macro_package(path)
+
+
+def load_macro(path: str) -> LoadedMacro:
+    """Read a .json or .ckp macro file (blocks, settings merged over defaults, subroutines).
+
+    A .ckp stays mapped until the returned macro's release() is called.
+    """
+    from core.macro_package import load_macro_package, is_package_path
+    from core.persistence import MacroFileReader
+
+    package_path = None
+    if is_package_path(path):
+        blocks, header = load_macro_package(path)
+        package_path = path
+        file_settings = header.get("settings") or {}
+        subroutines = SubroutineLibrary.from_dict(header.get("subroutines"))
+    else:
+        with MacroFileReader(path) as reader:
+            blocks = list(reader)
+            file_settings = reader.settings
+            subroutines = reader.subroutines
+    settings = default_settings()
+    settings.update({key: value for key, value in file_settings.items() if key in settings})
+    return LoadedMacro(path, blocks, settings, subroutines, package_path)
+
+
+class MacroController:
+    """Named loaded macros and their runners; every call goes straight to MacroRunner."""
+
+    def __init__(self):
+        self._macros: Dict[str, LoadedMacro] = {}
+        self._runners: Dict[str, MacroRunner] = {}
+        self._lock = threading.Lock()
+
+    def load(self, path: str, name: Optional[str] = None) -> Dict[str, Any]:
+        if not path or not os.path.isfile(path):
+            raise ControlError(f"파일이 없습니다: {path}", 404)
+        name = name or os.path.splitext(os.path.basename(path))[0]
+        with self._lock:
+            self._check_not_running(name)
+        try:
+            macro = load_macro(path)
+        except Exception as e:
+            raise ControlError(f"불러오기 실패: {e}") from None
+        with self._lock:
+            try:
+                self._check_not_running(name)
+            except ControlError:
+                macro.release()
+                raise
+            previous = self._macros.get(name)
+            self._macros[name] = macro
+        if previous is not None:
+            # 새 것을 먼저 열었으므로 같은 파일이면 mmap 은 그대로 유지됨
+            previous.release()
+        return {"name": name, "blocks": len(macro.blocks), "subroutines": len(macro.subroutines)}
+
+    def _check_not_running(self, name: str) -> None:
+        runner = self._runners.get(name)
+        if runner is not None and runner.running:
+            raise ControlError(f"실행 중입니다: {name}", 409)
+
+    def close(self, wait: float = 2.0) -> None:
+        """Stop this controller's runs and release every loaded macro (server shutdown)."""
+        with self._lock:
+            runners = list(self._runners.values())
+            macros = list(self._macros.values())
+            self._runners.clear()
+            self._macros.clear()
+        for runner in runners:
+            runner.stop()
+        for runner in runners:
+            runner.join(wait)
+        for macro in macros:
+            macro.release()
+
+    def _resolve(self, name: Optional[str]) -> Tuple[str, LoadedMacro]:
+        if name is None:
+            if len(self._macros) != 1:
+                raise ControlError("name 이 필요합니다." if self._macros else "불러온 매크로가 없습니다.",
+                                   400 if self._macros else 404)
+            name = next(iter(self._macros))
+        macro = self._macros.get(name)
+        if macro is None:
+            raise ControlError(f"불러오지 않은 매크로: {name}", 404)
+        return name, macro
+
+    def start(self, name: Optional[str] = None, settings: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        with self._lock:
+            name, macro = self._resolve(name)
+            self._check_not_running(name)
+            missing = macro.subroutines.compile(macro.blocks).missing
+            if missing:
+                raise ControlError("정의되지 않은 서브루틴: " + ", ".join(missing))
+            run_settings = dict(macro.settings)
+            for key, value in (settings or {}).items():
+                convert = OVERRIDABLE_SETTINGS.get(key)
+                if convert is None:
+                    raise ControlError(f"바꿀 수 없는 설정: {key}")
+                try:
+                    run_settings[key] = convert(value)
+                except (TypeError, ValueError):
+                    raise ControlError(f"잘못된 설정 값: {key}={value!r}") from None
+            runner = MacroRunner(macro.blocks, run_settings, name=name, subroutines=macro.subroutines)
+            if not runner.start():
+                raise ControlError("빈 매크로는 실행할 수 없습니다.")
+            self._runners[name] = runner
+        return runner.status()
+
+    def stop(self, name: Optional[str] = None, wait: float = 0.0) -> Dict[str, Any]:
+        """Stop the named run, or every active run (including the editor's) when name is None."""
+        if name is None:
+            runners = active_runners()
+        else:
+            with self._lock:
+                runner = self._runners.get(name)
+            if runner is None:
+                raise ControlError(f"실행한 적 없는 매크로: {name}", 404)
+            runners = [runner]
+        for runner in runners:
+            runner.stop()
+        if wait > 0:
+            for runner in runners:
+                runner.join(wait)
+        return {"stopped": [runner.name for runner in runners],
+                "running": [runner.name for runner in runners if runner.running]}
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            loaded = {name: {"path": macro.path, "blocks": len(macro.blocks)} for name, macro in self._macros.items()}
+            runners = list(self._runners.values())
+        # 편집기 등 이 제어기 밖에서 시작된 실행도 포함
+        runners += [runner for runner in active_runners() if runner not in runners]
+        return {"loaded": loaded, "runs": [runner.status() for runner in runners]}
+
+
+class ControlServer:
+    """Localhost HTTP front end of a MacroController."""
+
+    def __init__(self, controller: MacroController, token: str, port: int = DEFAULT_PORT, host: str = "127.0.0.1"):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        if not token:
+            raise ValueError("token 이 필요합니다.")
+        allowed_hosts = set()
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, status: int, payload: Dict[str, Any]) -> None:
+                body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _handle(self, method: str) -> None:
+                # 브라우저가 보낸 요청(Origin 있음)이나 DNS 리바인딩(다른 Host)은 거부
+                if self.headers.get("Origin") is not None or self.headers.get("Host") not in allowed_hosts:
+                    self._reply(403, {"error": "허용되지 않는 요청"})
+                    return
+                if not hmac.compare_digest((self.headers.get("X-Clikey-Token") or "").encode("utf-8"),
+                                           token.encode("utf-8")):
+                    self._reply(403, {"error": "잘못된 토큰"})
+                    return
+                try:
+                    request = self._read_body() if method == "POST" else {}
+                    self._reply(200, self._dispatch(method, self.path.split("?", 1)[0], request))
+                except ControlError as e:
+                    self._reply(e.status, {"error": str(e)})
+                except Exception as e:
+                    self._reply(500, {"error": f"{type(e).__name__}: {e}"})
+
+            def _read_body(self) -> Dict[str, Any]:
+                content_type = (self.headers.get("Content-Type") or "").split(";", 1)[0].strip().lower()
+                if content_type != "application/json":
+                    raise ControlError("Content-Type 은 application/json 이어야 합니다.", 415)
+                try:
+                    length = int(self.headers.get("Content-Length") or 0)
+                except ValueError:
+                    raise ControlError("잘못된 Content-Length") from None
+                if length > MAX_BODY:
+                    raise ControlError("요청이 너무 큽니다.", 413)
+                if not length:
+                    return {}
+                try:
+                    request = json.loads(self.rfile.read(length).decode("utf-8"))
+                except ValueError:
+                    raise ControlError("JSON 본문이 아닙니다.") from None
+                if not isinstance(request, dict):
+                    raise ControlError("JSON 객체가 필요합니다.")
+                return request
+
+            def _dispatch(self, method: str, path: str, request: Dict[str, Any]) -> Dict[str, Any]:
+                if method == "GET" and path == "/status":
+                    return controller.status()
+                if method == "POST" and path == "/load":
+                    return controller.load(request.get("path"), request.get("name"))
+                if method == "POST" and path == "/start":
+                    return controller.start(request.get("name"), request.get("settings"))
+                if method == "POST" and path == "/stop":
+                    try:
+                        wait = float(request.get("wait") or 0)
+                    except (TypeError, ValueError):
+                        raise ControlError(f"잘못된 wait 값: {request.get('wait')!r}") from None
+                    return controller.stop(request.get("name"), wait)
+                raise ControlError(f"알 수 없는 요청: {method} {path}", 404)
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_POST(self):
+                self._handle("POST")
+
+            def log_message(self, format, *args):
+                pass
+
+        self.controller = controller
+        self.token = token
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        bound_port = self._server.server_address[1]
+        allowed_hosts.update({f"127.0.0.1:{bound_port}", f"localhost:{bound_port}"})
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="clikey-control", daemon=True)
+        self._thread.start()
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self._server.server_address[:2]
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+_server: Optional[ControlServer] = None
+_lock = threading.Lock()
+
+
+def new_token() -> str:
+    return secrets.token_urlsafe(24)
+
+
+def enable(port: int = DEFAULT_PORT, token: Optional[str] = None, host: str = "127.0.0.1") -> ControlServer:
+    """Start the control server (replacing a running one). Raises OSError if the port is taken.
+
+    Without token a random one is generated; read it from the returned server's ``token``.
+    """
+    global _server
+    with _lock:
+        controller = MacroController()
+        if _server is not None:
+            # 같은 포트로 다시 켤 수 있도록 먼저 닫음 (불러온 매크로는 유지)
+            controller = _server.controller
+            _server.close()
+            _server = None
+        _server = ControlServer(controller, token or new_token(), int(port), host)
+        return _server
+
+
+def disable() -> None:
+    global _server
+    with _lock:
+        if _server is not None:
+            _server.close()
+            _server.controller.close()
+        _server = None
+
+
+def configure(config: Optional[Dict[str, Any]]) -> bool:
+    """Enable from the app-state "control_api" dict ({"port", "token"}); False if absent or failed.
+
+    A missing token is generated and saved back to the app state so scripts can read it.
+    """
+    if not config:
+        return False
+    try:
+        server = enable(config.get("port", DEFAULT_PORT), config.get("token"))
+    except (OSError, ValueError, TypeError):
+        return False
+    if config.get("token") != server.token:
+        from core.app_state import get_app_state
+        get_app_state().set("control_api", dict(config, token=server.token))
+    return True
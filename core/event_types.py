@@ -7,9 +7,20 @@ class EventType(Enum):
     DELAY = "delay"
     IF = "if"
     EXIT = "exit"
+    TYPE_TEXT = "type_text"  # event_data: 입력할 문자열, action: 글자 사이 간격(초)
+    REPEAT = "repeat"  # 자식 블록을 repeat_count 번 또는 이미지 조건이 맞을 때까지 반복
+    CALL = "call"  # event_data: 호출할 서브루틴 이름 (본문은 파일의 subroutines 에 한 번만 저장)
+    SET_VAR = "set_var"  # event_data: 변수 이름, action: 값 식 (core.expressions)
+    INCREMENT = "increment"  # event_data: 변수 이름, action: 더할 값 (기본 1)
 
 
 class ConditionType(Enum):
     RGB_MATCH = "rgb_match"
     IMAGE_MATCH = "image_match"
-    COORDINATE_CONDITION = "coordinate_condition"
\ No newline at end of file
+    COORDINATE_CONDITION = "coordinate_condition"
+    FOREACH_MATCH = "foreach_match"  # 이미지를 찾은 위치마다 자식 반복
+    EXPRESSION = "expression"  # action: 변수 조건식, 화면을 보지 않음
+
+
+# 템플릿 이미지를 action 으로 갖는 조건들
+IMAGE_CONDITION_TYPES = (ConditionType.IMAGE_MATCH, ConditionType.FOREACH_MATCH)
\ No newline at end of file
@@ -0,0 +1,114 @@
+# core/execution_context.py
+"""실행 단위 상태.
+
+이미지 매치 결과(MatchResultStore), @parent 스택, 좌표 조건의 RGB, 실행 기록(TraceBuffer), 지표(RunMetrics) 는 실행(MacroRunner)마다 하나씩
+갖는 ExecutionContext 에 둔다. 그래서 여러 매크로를 동시에 돌려도 서로의 @parent
+나 참조 좌표를 덮어쓰지 않는다. 화면 캡처는 FrameSource 로 공유할 수 있다.
+"""
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+import threading
+import time
+
+from core.match_store import MatchResultStore
+from core.trace import TraceBuffer
+from core.run_metrics import RunMetrics
+
+
+class FrameSource:
+    """Full-screen captures shared between concurrent runs.
+
+    frame() hands out the latest capture while it is younger than max_age
+    and otherwise captures once on behalf of every waiting thread. Runs
+    register with acquire()/release(); with a single user the executor
+    keeps taking its own (smaller) region captures instead.
+    """
+
+    def __init__(self, max_age: float = 0.05):
+        self.max_age = max_age
+        self._frame = None
+        self._taken_at = 0.0
+        self._users = 0
+        self._lock = threading.Lock()
+        self._capture_lock = threading.Lock()
+
+    @property
+    def shared(self) -> bool:
+        return self._users > 1
+
+    def acquire(self) -> None:
+        with self._lock:
+            self._users += 1
+
+    def release(self) -> None:
+        with self._lock:
+            self._users = max(0, self._users - 1)
+            if self._users == 0:
+                self._frame = None
+
+    def frame(self):
+        with self._capture_lock:
+            if self._frame is not None and time.perf_counter() - self._taken_at <= self.max_age:
+                return self._frame
+            from core.image_matcher import ImageMatcher
+            frame = ImageMatcher.capture_frame()
+            self._frame, self._taken_at = frame, time.perf_counter()
+            return frame
+
+
+@dataclass
+class ExecutionContext:
+    """Mutable state of one macro run."""
+    matches: MatchResultStore = field(default_factory=MatchResultStore)
+    # 실행 중인 이미지 조건의 매치 슬롯 스택 (@parent 는 맨 위)
+    image_match_stack: List[int] = field(default_factory=list)
+    current_coordinate_rgb: Optional[tuple] = None
+    frame_source: Optional[FrameSource] = None
+    # SET/INCREMENT 블록의 변수 (반복 회차가 바뀌어도 유지, 실행이 끝나면 사라짐)
+    variables: Dict[str, Any] = field(default_factory=dict)
+    # 조건식의 기본 이름 loop / elapsed 값
+    loop_index: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+    # 블록 단위 실행 기록 (None 이면 기록하지 않음)
+    trace: Optional[TraceBuffer] = None
+    # 반복/이미지 확인 지표 (None 이면 측정하지 않음)
+    metrics: Optional[RunMetrics] = None
+
+    def lookup(self, name: str) -> Any:
+        """Variable value for expressions; loop/elapsed are provided, unknown names are 0."""
+        value = self.variables.get(name)
+        if value is not None:
+            return value
+        if name == "loop":
+            return self.loop_index
+        if name == "elapsed":
+            return time.perf_counter() - self.started_at
+        return 0
+
+    def reset(self) -> None:
+        """Clear per-cycle state at the start of each repeat (variables are kept)."""
+        self.matches.new_generation()
+        self.image_match_stack.clear()
+        self.current_coordinate_rgb = None
+
+    def shared_frame(self):
+        """Frame shared with other runs, or None to capture independently."""
+        source = self.frame_source
+        if source is None or not source.shared:
+            return None
+        return source.frame()
+
+
+_frame_source: Optional[FrameSource] = None
+_frame_source_lock = threading.Lock()
+
+
+def get_frame_source() -> FrameSource:
+    """Process-wide frame source used by runs that don't bring their own."""
+    global _frame_source
+    if _frame_source is None:
+        with _frame_source_lock:
+            if _frame_source is None:
+                _frame_source = FrameSource()
+    return _frame_source
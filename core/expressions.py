@@ -0,0 +1,170 @@
+# core/expressions.py
+"""변수 조건식.
+
+조건식/값 식은 ast 로 한 번 파싱해 클로저 트리로 바꾸고, 식 문자열별로 캐시한다.
+실행 중에는 클로저만 호출하므로 매 평가마다 문자열을 해석하지 않는다. 허용하는
+문법은 숫자/문자열/변수, 사칙연산(+ - * / // %), 비교(연쇄 포함), and/or/not,
+``a if 조건 else b``, 그리고 아래 함수뿐이다 (eval 은 쓰지 않는다).
+
+변수는 lookup(name) 으로 읽는다. 정의되지 않은 변수는 0 이다.
+"""
+from __future__ import annotations
+from functools import lru_cache
+from typing import Any, Callable
+import ast
+import keyword
+import operator
+
+Lookup = Callable[[str], Any]
+CompiledExpression = Callable[[Lookup], Any]
+
+# 실행기가 제공하는 읽기 전용 이름: 현재 반복 회차(1부터), 실행 시작 후 경과 초
+BUILTIN_NAMES = ("loop", "elapsed")
+
+_FUNCTIONS = {
+    "min": min,
+    "max": max,
+    "abs": abs,
+    "int": int,
+    "float": float,
+    "round": round,
+}
+
+
+def _mul(left, right):
+    # 문자열 반복("a" * 10**9)으로 메모리를 터뜨리지 않도록 숫자끼리만 허용
+    if isinstance(left, str) or isinstance(right, str):
+        raise TypeError("문자열에는 * 를 쓸 수 없습니다.")
+    return left * right
+
+
+_BIN_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: _mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+}
+
+_COMPARE_OPS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+}
+
+# 너무 긴 식은 거부 (실수로 붙여 넣은 텍스트 등)
+MAX_EXPRESSION_LENGTH = 500
+
+
+class ExpressionError(ValueError):
+    """The expression uses syntax outside the supported subset."""
+
+
+def is_valid_variable_name(name: str) -> bool:
+    return bool(name) and name.isidentifier() and not keyword.iskeyword(name) \
+        and name not in BUILTIN_NAMES and name not in _FUNCTIONS
+
+
+@lru_cache(maxsize=512)
+def compile_expression(text: str) -> CompiledExpression:
+    """Compile text into a closure taking a variable lookup. Raises ExpressionError."""
+    text = (text or "").strip()
+    if not text:
+        raise ExpressionError("빈 식입니다.")
+    if len(text) > MAX_EXPRESSION_LENGTH:
+        raise ExpressionError("식이 너무 깁니다.")
+    try:
+        tree = ast.parse(text, mode="eval")
+    except SyntaxError as e:
+        raise ExpressionError(f"식을 해석할 수 없습니다: {e.msg}") from None
+    return _compile(tree.body)
+
+
+def _compile(node: ast.AST) -> CompiledExpression:
+    if isinstance(node, ast.Constant):
+        value = node.value
+        if isinstance(value, (bool, int, float, str)):
+            return lambda lookup: value
+        raise ExpressionError(f"지원하지 않는 값: {value!r}")
+
+    if isinstance(node, ast.Name):
+        name = node.id
+        return lambda lookup: lookup(name)
+
+    if isinstance(node, ast.BinOp):
+        op = _BIN_OPS.get(type(node.op))
+        if op is None:
+            raise ExpressionError(f"지원하지 않는 연산자: {type(node.op).__name__}")
+        left, right = _compile(node.left), _compile(node.right)
+        return lambda lookup: op(left(lookup), right(lookup))
+
+    if isinstance(node, ast.UnaryOp):
+        operand = _compile(node.operand)
+        if isinstance(node.op, ast.Not):
+            return lambda lookup: not operand(lookup)
+        if isinstance(node.op, ast.USub):
+            return lambda lookup: -operand(lookup)
+        if isinstance(node.op, ast.UAdd):
+            return lambda lookup: +operand(lookup)
+        raise ExpressionError(f"지원하지 않는 연산자: {type(node.op).__name__}")
+
+    if isinstance(node, ast.BoolOp):
+        values = [_compile(value) for value in node.values]
+        if isinstance(node.op, ast.And):
+            def and_(lookup):
+                result = True
+                for value in values:
+                    result = value(lookup)
+                    if not result:
+                        return result
+                return result
+            return and_
+
+        def or_(lookup):
+            result = False
+            for value in values:
+                result = value(lookup)
+                if result:
+                    return result
+            return result
+        return or_
+
+    if isinstance(node, ast.Compare):
+        left = _compile(node.left)
+        ops = []
+        for op_node, comparator in zip(node.ops, node.comparators):
+            op = _COMPARE_OPS.get(type(op_node))
+            if op is None:
+                raise ExpressionError(f"지원하지 않는 비교: {type(op_node).__name__}")
+            ops.append((op, _compile(comparator)))
+
+        def compare(lookup):
+            current = left(lookup)
+            for op, right in ops:
+                value = right(lookup)
+                if not op(current, value):
+                    return False
+                current = value
+            return True
+        return compare
+
+    if isinstance(node, ast.IfExp):
+        test, body, orelse = _compile(node.test), _compile(node.body), _compile(node.orelse)
+        return lambda lookup: body(lookup) if test(lookup) else orelse(lookup)
+
+    if isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name) or node.func.id not in _FUNCTIONS or node.keywords:
+            raise ExpressionError("사용할 수 있는 함수: " + ", ".join(_FUNCTIONS))
+        func = _FUNCTIONS[node.func.id]
+        args = [_compile(arg) for arg in node.args]
+        return lambda lookup: func(*[arg(lookup) for arg in args])
+
+    raise ExpressionError(f"지원하지 않는 문법: {type(node).__name__}")
+
+
+def evaluate(text: str, lookup: Lookup) -> Any:
+    return compile_expression(text)(lookup)
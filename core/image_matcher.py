@@ -1,5 +1,7 @@
-from typing import Optional, Tuple, Dict, Any
+from typing import Optional, Tuple, Dict, Any, Iterable, List
+from collections import OrderedDict
 import os
+import threading
 import cv2
 import numpy as np
 import win32gui
@@ -7,20 +9,166 @@ import win32ui
 import win32con
 from ctypes import windll
 
+from core import template_store
+from core.macro_block import MATCH_MODE_COLOR, MATCH_MODE_GRAY, MATCH_MODE_EDGE
+
+
+class ScreenFrame:
+    """One virtual-desktop capture shared by several searches.
+
+    crop() mirrors _take_screenshot(region), so a search on a frame sees the
+    same pixels and reports the same coordinates as a search that captures.
+    """
+
+    def __init__(self, image: np.ndarray, left: int = 0, top: int = 0):
+        self.image = image
+        self.left = left
+        self.top = top
+
+    def crop(self, region: Optional[Tuple[int, int, int, int]] = None) -> np.ndarray:
+        if not region:
+            return self.image
+        height, width = self.image.shape[:2]
+        x1, y1, x2, y2 = region
+        x1, y1 = max(0, x1), max(0, y1)
+        x2, y2 = min(x2, self.left + width), min(y2, self.top + height)
+        return self.image[y1 - self.top:y2 - self.top, x1 - self.left:x2 - self.left]
+
+    def rgb_at(self, x: int, y: int) -> Optional[Tuple[int, int, int]]:
+        ix, iy = x - self.left, y - self.top
+        height, width = self.image.shape[:2]
+        if not (0 <= ix < width and 0 <= iy < height):
+            return None
+        b, g, r = self.image[iy, ix][:3]
+        return int(r), int(g), int(b)
+
+
+class CachedTemplate:
+    """A decoded template and its prepared (scale, mode) variants, cached as one entry."""
+
+    __slots__ = ("template", "mask", "variants")
+
+    def __init__(self, template: np.ndarray, mask: Optional[np.ndarray]):
+        self.template = template
+        self.mask = mask
+        self.variants: Dict[Tuple[float, str], Tuple[np.ndarray, Optional[np.ndarray]]] = {}
+
 
 class ImageMatcher:
+    # 템플릿 캐시: 캐시 키 -> CachedTemplate. 키에 파일 수정 시각이 들어가므로
+    # 이미지 파일을 바꾸면 자동으로 다시 읽는다. 패키지 참조는 내용 해시라 변하지 않음.
+    # 배율/모드별 변형은 같은 항목에 들어 있으므로 크기는 템플릿 수 기준이다
+    # (여러 배율 조건을 돌아가며 확인해도 서로의 변형을 밀어내지 않음)
+    TEMPLATE_CACHE_SIZE = 64
+    _template_cache: "OrderedDict[tuple, CachedTemplate]" = OrderedDict()
+    _template_cache_lock = threading.Lock()
+    # 실행 지표용 누적 수 (모두 _template_cache_lock 안에서 갱신, 캐시 수는 템플릿 조회 한 번에 하나)
+    _captures = 0
+    _cache_hits = 0
+    _cache_misses = 0
+    # 스레드별 마지막 탐색의 최고 점수 (실행 기록용)
+    _score_local = threading.local()
+
+    @staticmethod
+    def last_score() -> float:
+        """Best score of the last search on this thread (NaN if nothing was scored)."""
+        return getattr(ImageMatcher._score_local, "score", float("nan"))
+
+    @staticmethod
+    def stats() -> Dict[str, int]:
+        """Screen captures and template cache hits/misses since startup."""
+        with ImageMatcher._template_cache_lock:
+            return {"captures": ImageMatcher._captures,
+                    "cache_hits": ImageMatcher._cache_hits,
+                    "cache_misses": ImageMatcher._cache_misses}
+
+    @staticmethod
+    def _template_cache_key(template_path: str) -> Optional[tuple]:
+        digest = template_store.parse_ref(template_path)
+        if digest is not None:
+            return ("ref", digest)
+        try:
+            st = os.stat(template_path)
+        except OSError:
+            return None
+        return ("file", template_path, st.st_mtime_ns, st.st_size)
+
+    @staticmethod
+    def _cached_template(template_path: str) -> Optional[CachedTemplate]:
+        """Cache entry of the template (decoded on a miss), or None if it can't be read."""
+        key = ImageMatcher._template_cache_key(template_path)
+        if key is None:
+            return None
+        cache = ImageMatcher._template_cache
+        with ImageMatcher._template_cache_lock:
+            entry = cache.get(key)
+            if entry is not None:
+                ImageMatcher._cache_hits += 1
+                cache.move_to_end(key)
+                return entry
+            ImageMatcher._cache_misses += 1
+        template, mask = ImageMatcher._load_image(template_path)
+        if template is None:
+            return None
+        # 캐시된 배열은 여러 실행이 공유하므로 읽기 전용으로
+        for array in (template, mask):
+            if array is not None:
+                array.setflags(write=False)
+        entry = CachedTemplate(template, mask)
+        with ImageMatcher._template_cache_lock:
+            # 다른 스레드가 먼저 넣었다면 그 항목(과 변형)을 씀
+            entry = cache.setdefault(key, entry)
+            while len(cache) > ImageMatcher.TEMPLATE_CACHE_SIZE:
+                cache.popitem(last=False)
+        return entry
+
+    @staticmethod
+    def load_template(template_path: str) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        """Decoded (template, mask), cached across runs."""
+        entry = ImageMatcher._cached_template(template_path)
+        if entry is None:
+            return None, None
+        return entry.template, entry.mask
+
+    @staticmethod
+    def template_size(template_path: str, scales: Optional[Iterable[float]] = None) -> Optional[Tuple[int, int]]:
+        """(width, height) of the template at its largest scale, or None."""
+        template = ImageMatcher.load_template(template_path)[0]
+        if template is None:
+            return None
+        scale = max(scales) if scales else 1.0
+        return int(round(template.shape[1] * scale)), int(round(template.shape[0] * scale))
+
+    @staticmethod
+    def warmup(template_paths: Iterable[str] = ()) -> int:
+        """Decode templates into the cache and run one dummy match so OpenCV's
+        lazy initialization is paid up front. Returns the number of templates loaded."""
+        loaded = 0
+        for path in template_paths:
+            template, _ = ImageMatcher.load_template(path)
+            if template is not None:
+                loaded += 1
+        haystack = np.zeros((64, 64, 3), np.uint8)
+        needle = np.zeros((8, 8, 3), np.uint8)
+        cv2.minMaxLoc(cv2.matchTemplate(haystack, needle, cv2.TM_CCOEFF_NORMED))
+        cv2.matchTemplate(haystack, needle, cv2.TM_CCORR_NORMED, mask=np.full((8, 8, 3), 255, np.uint8))
+        return loaded
+
     @staticmethod
     def _load_image(template_path: str) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
-        if not os.path.exists(template_path):
+        data = template_store.read_bytes(template_path)
+        if data is None:
             return None, None
         try:
-            with open(template_path, 'rb') as f:
-                nparr = np.frombuffer(f.read(), np.uint8)
-                image = cv2.imdecode(nparr, cv2.IMREAD_UNCHANGED)
-            if image is None:
+            # 패키지 참조는 mmap 된 memoryview 를 복사 없이 디코딩
+            nparr = np.frombuffer(data, np.uint8)
+            image = cv2.imdecode(nparr, cv2.IMREAD_UNCHANGED)
+            if image is None and template_store.parse_ref(template_path) is None:
                 image = cv2.imread(template_path, cv2.IMREAD_UNCHANGED)
         except Exception:
-            image = cv2.imread(template_path, cv2.IMREAD_UNCHANGED)
+            image = None
+            if template_store.parse_ref(template_path) is None:
+                image = cv2.imread(template_path, cv2.IMREAD_UNCHANGED)
 
         if image is None:
             return None, None
@@ -37,13 +185,29 @@ class ImageMatcher:
             image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
         return image[:, :, :3].copy(), None
 
+    @staticmethod
+    def _virtual_screen() -> Tuple[int, int, int, int]:
+        """(left, top, width, height) of the virtual desktop."""
+        return (
+            windll.user32.GetSystemMetrics(win32con.SM_XVIRTUALSCREEN),
+            windll.user32.GetSystemMetrics(win32con.SM_YVIRTUALSCREEN),
+            windll.user32.GetSystemMetrics(win32con.SM_CXVIRTUALSCREEN),
+            windll.user32.GetSystemMetrics(win32con.SM_CYVIRTUALSCREEN),
+        )
+
+    @staticmethod
+    def capture_frame() -> ScreenFrame:
+        """Capture the whole virtual desktop once for several searches."""
+        left, top, _, _ = ImageMatcher._virtual_screen()
+        return ScreenFrame(ImageMatcher._take_screenshot(), left, top)
+
     @staticmethod
     def _take_screenshot(region: Optional[Tuple[int, int, int, int]] = None) -> np.ndarray:
+        # 병렬 조건 판정에서 여러 스레드가 동시에 캡처하므로 잠금 안에서 증가
+        with ImageMatcher._template_cache_lock:
+            ImageMatcher._captures += 1
         hdesktop = win32gui.GetDesktopWindow()
-        left = windll.user32.GetSystemMetrics(win32con.SM_XVIRTUALSCREEN)
-        top = windll.user32.GetSystemMetrics(win32con.SM_YVIRTUALSCREEN)
-        width = windll.user32.GetSystemMetrics(win32con.SM_CXVIRTUALSCREEN)
-        height = windll.user32.GetSystemMetrics(win32con.SM_CYVIRTUALSCREEN)
+        left, top, width, height = ImageMatcher._virtual_screen()
 
         if region:
             x1, y1, x2, y2 = region
@@ -80,55 +244,210 @@ class ImageMatcher:
 
         return screenshot_bgr
 
+    # 템플릿별로 마지막에 매치된 배율. 다음 탐색은 이 배율부터 시도
+    _best_scales: Dict[str, float] = {}
+
     @staticmethod
-    def find_image_on_screen(
-        template_path: str,
-        threshold: float = 0.9,
-        search_region: Optional[Tuple[int, int, int, int]] = None
-    ) -> Optional[Tuple[int, int]]:
-        template, mask = ImageMatcher._load_image(template_path)
-        if template is None:
-            return None
+    def _preprocess(image: np.ndarray, mode: str) -> np.ndarray:
+        """Convert a BGR image to the representation used by match mode."""
+        if mode == MATCH_MODE_GRAY:
+            return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        if mode == MATCH_MODE_EDGE:
+            return cv2.Canny(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY), 50, 150)
+        return image
 
-        screenshot_bgr = ImageMatcher._take_screenshot(search_region)
+    @staticmethod
+    def _prepared_template(entry: CachedTemplate, scale: float = 1.0,
+                           mode: str = MATCH_MODE_COLOR) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Template and mask of entry resized by scale and converted for mode, kept in entry.variants.
+
+        The mask has as many channels as the prepared template.
+        """
+        template, mask = entry.template, entry.mask
+        if scale == 1.0 and mode == MATCH_MODE_COLOR and mask is None:
+            return template, mask
+        key = (scale, mode)
+        prepared = entry.variants.get(key)
+        if prepared is not None:
+            return prepared
+        if scale != 1.0:
+            h, w = template.shape[:2]
+            size = (max(1, round(w * scale)), max(1, round(h * scale)))
+            interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+            template = cv2.resize(template, size, interpolation=interpolation)
+            if mask is not None:
+                mask = cv2.resize(mask, size, interpolation=cv2.INTER_NEAREST)
+        template = ImageMatcher._preprocess(template, mode)
+        if mask is not None and template.ndim == 3:
+            mask = cv2.merge([mask, mask, mask])
+        prepared = (template, mask)
+        for array in prepared:
+            if array is not None:
+                array.setflags(write=False)
+        with ImageMatcher._template_cache_lock:
+            prepared = entry.variants.setdefault(key, prepared)
+        return prepared
 
+    @staticmethod
+    def _scale_order(template_path: str, scales: Optional[Iterable[float]]) -> list:
+        """Scales to try: the last successful one first, then nearest to it."""
+        candidates = sorted({float(scale) for scale in scales if scale > 0}) if scales else [1.0]
+        if not candidates:
+            candidates = [1.0]
+        best = ImageMatcher._best_scales.get(template_path, 1.0)
+        return sorted(candidates, key=lambda scale: abs(scale - best))
+
+    @staticmethod
+    def _masked_score(screenshot: np.ndarray, template: np.ndarray, mask: np.ndarray, loc: Tuple[int, int]) -> float:
+        # TM_CCORR_NORMED 는 마스크 영역에서 점수가 과대평가되므로 위치만 쓰고
+        # 점수는 마스크 영역 픽셀의 상관계수로 다시 계산
+        template_h, template_w = template.shape[:2]
+        x, y = loc
+        roi = screenshot[y:y + template_h, x:x + template_w]
+        mask_bool = mask > 0
+        t_pixels = template[mask_bool].astype(np.float64)
+        r_pixels = roi[mask_bool].astype(np.float64)
+        t_centered = t_pixels - t_pixels.mean()
+        r_centered = r_pixels - r_pixels.mean()
+        denom = np.sqrt(np.sum(t_centered ** 2) * np.sum(r_centered ** 2))
+        return float(np.sum(t_centered * r_centered) / denom) if denom > 0 else 0.0
+
+    @staticmethod
+    def _result_map(screenshot: np.ndarray, template: np.ndarray, mask: Optional[np.ndarray]) -> np.ndarray:
         if mask is not None:
-            mask_3ch = cv2.merge([mask, mask, mask])
-            result = cv2.matchTemplate(screenshot_bgr, template, cv2.TM_CCORR_NORMED, mask=mask_3ch)
-            _, _, _, max_loc = cv2.minMaxLoc(result)
+            return cv2.matchTemplate(screenshot, template, cv2.TM_CCORR_NORMED, mask=mask)
+        return cv2.matchTemplate(screenshot, template, cv2.TM_CCOEFF_NORMED)
 
-            template_h, template_w = template.shape[:2]
-            y, x = max_loc[1], max_loc[0]
-            if y + template_h > screenshot_bgr.shape[0] or x + template_w > screenshot_bgr.shape[1]:
-                return None
-            roi = screenshot_bgr[y:y + template_h, x:x + template_w]
-
-            mask_bool = np.stack([mask > 0] * 3, axis=-1)
-            t_pixels = template[mask_bool].astype(np.float64)
-            r_pixels = roi[mask_bool].astype(np.float64)
-            t_centered = t_pixels - t_pixels.mean()
-            r_centered = r_pixels - r_pixels.mean()
-            denom = np.sqrt(np.sum(t_centered ** 2) * np.sum(r_centered ** 2))
-            max_val = (np.sum(t_centered * r_centered) / denom) if denom > 0 else 0.0
-        else:
-            result = cv2.matchTemplate(screenshot_bgr, template, cv2.TM_CCOEFF_NORMED)
-            _, max_val, _, max_loc = cv2.minMaxLoc(result)
+    @staticmethod
+    def _match(screenshot: np.ndarray, template: np.ndarray, mask: Optional[np.ndarray]) -> Tuple[float, Tuple[int, int]]:
+        """Best (score, top-left) of template in screenshot."""
+        result = ImageMatcher._result_map(screenshot, template, mask)
+        _, max_val, _, max_loc = cv2.minMaxLoc(result)
+        if mask is not None:
+            max_val = ImageMatcher._masked_score(screenshot, template, mask, max_loc)
+        return float(max_val), max_loc
 
-        if max_val < threshold:
-            return None
+    @staticmethod
+    def _non_max_suppression(result: np.ndarray, threshold: float, template_w: int, template_h: int,
+                             max_results: int) -> list:
+        """Greedy NMS over one result map: (top-left, score) peaks, best first.
+
+        A peak is dropped when it lies within half a template of a kept one.
+        """
+        ys, xs = np.nonzero(result >= threshold)
+        if len(xs) == 0:
+            return []
+        scores = result[ys, xs]
+        order = np.argsort(-scores, kind="stable")
+        min_dx, min_dy = max(1, template_w // 2), max(1, template_h // 2)
+        kept = []
+        for i in order:
+            x, y = int(xs[i]), int(ys[i])
+            if any(abs(x - kx) < min_dx and abs(y - ky) < min_dy for (kx, ky), _ in kept):
+                continue
+            kept.append(((x, y), float(scores[i])))
+            if len(kept) >= max_results:
+                break
+        return kept
 
+    @staticmethod
+    def _match_all(screenshot: np.ndarray, template: np.ndarray, mask: Optional[np.ndarray],
+                   threshold: float, max_results: int) -> list:
+        result = ImageMatcher._result_map(screenshot, template, mask)
         template_h, template_w = template.shape[:2]
+        peaks = ImageMatcher._non_max_suppression(result, threshold, template_w, template_h, max_results)
+        if mask is not None:
+            # 마스크 점수는 과대평가되므로 후보마다 다시 채점
+            peaks = [(loc, ImageMatcher._masked_score(screenshot, template, mask, loc)) for loc, _ in peaks]
+            peaks = sorted((p for p in peaks if p[1] >= threshold), key=lambda p: -p[1])
+        return peaks
+
+    @staticmethod
+    def _locate(template_path: str, threshold: float, search_region, scales, mode,
+                find_all: bool, max_results: int, frame: Optional[ScreenFrame] = None) -> List[Tuple[int, int]]:
+        mode = mode or MATCH_MODE_COLOR
+        order = ImageMatcher._scale_order(template_path, scales)
+        score_local = ImageMatcher._score_local
+        score_local.score = float("nan")
+        entry = ImageMatcher._cached_template(template_path)
+        if entry is None:
+            return []
+
+        screenshot = frame.crop(search_region) if frame is not None else ImageMatcher._take_screenshot(search_region)
+        screenshot = ImageMatcher._preprocess(screenshot, mode)
+        screen_h, screen_w = screenshot.shape[:2]
         offset_x, offset_y = (search_region[0], search_region[1]) if search_region else (0, 0)
-        center_x = max_loc[0] + template_w // 2 + offset_x
-        center_y = max_loc[1] + template_h // 2 + offset_y
 
-        del template, screenshot_bgr, result
+        for scale in order:
+            template, mask = ImageMatcher._prepared_template(entry, scale, mode)
+            template_h, template_w = template.shape[:2]
+            if template_h > screen_h or template_w > screen_w:
+                continue
 
-        return center_x, center_y
+            if find_all:
+                peaks = ImageMatcher._match_all(screenshot, template, mask, threshold, max_results)
+            else:
+                max_val, max_loc = ImageMatcher._match(screenshot, template, mask)
+                if not max_val <= score_local.score:  # 아직 NaN 이면 비교가 거짓이라 항상 갱신
+                    score_local.score = max_val
+                peaks = [(max_loc, max_val)] if max_val >= threshold else []
+            if not peaks:
+                continue
+            if find_all:
+                score_local.score = peaks[0][1]
+
+            if len(order) > 1:
+                ImageMatcher._best_scales[template_path] = scale
+            return [
+                (x + template_w // 2 + offset_x, y + template_h // 2 + offset_y)
+                for (x, y), _ in peaks
+            ]
+
+        return []
+
+    @staticmethod
+    def find_image_on_screen(
+        template_path: str,
+        threshold: float = 0.9,
+        search_region: Optional[Tuple[int, int, int, int]] = None,
+        scales: Optional[Iterable[float]] = None,
+        mode: Optional[str] = None,
+        frame: Optional[ScreenFrame] = None
+    ) -> Optional[Tuple[int, int]]:
+        """Center of the template on screen, or None.
+
+        With scales, each scale is tried (last successful scale first) and the
+        search stops at the first one whose score reaches threshold. mode
+        "gray"/"edge" matches single-channel images (about 3x cheaper).
+        frame searches an existing capture instead of taking a new one.
+        """
+        found = ImageMatcher._locate(template_path, threshold, search_region, scales, mode, False, 1, frame)
+        return found[0] if found else None
+
+    @staticmethod
+    def find_all_on_screen(
+        template_path: str,
+        threshold: float = 0.9,
+        search_region: Optional[Tuple[int, int, int, int]] = None,
+        scales: Optional[Iterable[float]] = None,
+        mode: Optional[str] = None,
+        max_results: int = 100,
+        frame: Optional[ScreenFrame] = None
+    ) -> List[Tuple[int, int]]:
+        """Centers of every match at or above threshold, best first.
+
+        One capture and one result map per scale; overlapping peaks are
+        merged by non-maximum suppression.
+        """
+        return ImageMatcher._locate(template_path, threshold, search_region, scales, mode, True, max_results, frame)
 
     @staticmethod
     def create_context_data(template_path: str, center_pos: Tuple[int, int]) -> Dict[str, Any]:
-        name_without_ext = os.path.splitext(os.path.basename(template_path))[0]
+        if template_store.parse_ref(template_path) is not None:
+            template_path_name = template_path.split("/", 1)[1]
+        else:
+            template_path_name = os.path.basename(template_path)
+        name_without_ext = os.path.splitext(template_path_name)[0]
         return {
             "name": name_without_ext,
             "x": center_pos[0],
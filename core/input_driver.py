@@ -0,0 +1,335 @@
+# core/input_driver.py
+"""키보드/마우스 입력 주입 드라이버.
+
+실행기는 입력 블록을 InputEvent 목록으로 바꿔 드라이버에 넘긴다. 간격(step_delay)이
+0 이면 연속된 입력 블록을 한 번에 모아 보내므로, Windows 에서는 SendInput 한 번으로
+여러 이벤트를 주입한다. 드라이버는 이벤트당 주입 지연을 기록한다.
+
+- SendInputDriver : Windows SendInput (ctypes), 기본값
+- LegacyDriver    : 기존 autoit/keyboard 호출 (이벤트마다 한 번씩)
+- RecordingDriver : 실제로 주입하지 않고 기록만 (테스트/리눅스용)
+
+CLIKEY_INPUT_DRIVER=legacy 로 기존 방식을 강제할 수 있다.
+"""
+from __future__ import annotations
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+import os
+import sys
+import threading
+import time
+
+KEY_DOWN = "key_down"
+KEY_UP = "key_up"
+MOUSE_MOVE = "mouse_move"
+MOUSE_DOWN = "mouse_down"
+MOUSE_UP = "mouse_up"
+# 유니코드 문자 하나 입력 (key 에 문자)
+TEXT_CHAR = "text_char"
+
+# 지연 통계에 보관하는 최근 이벤트 수
+LATENCY_SAMPLES = 2048
+
+
+@dataclass(frozen=True)
+class InputEvent:
+    kind: str
+    key: Optional[str] = None
+    button: str = "left"
+    x: Optional[int] = None
+    y: Optional[int] = None
+
+
+def key_press_events(key: str) -> List[InputEvent]:
+    """Down/up events for a key or a combo such as "ctrl+c" (released in reverse)."""
+    parts = [part.strip() for part in key.split("+")] if len(key) > 1 else [key]
+    parts = [part for part in parts if part] or [key]
+    return ([InputEvent(KEY_DOWN, key=part) for part in parts] +
+            [InputEvent(KEY_UP, key=part) for part in reversed(parts)])
+
+
+def text_events(text: str) -> List[InputEvent]:
+    """Events typing text; newline and tab become Enter/Tab key presses."""
+    events = []
+    for char in text:
+        if char == "\r":
+            continue
+        if char == "\n":
+            events.extend(key_press_events("enter"))
+        elif char == "\t":
+            events.extend(key_press_events("tab"))
+        else:
+            events.append(InputEvent(TEXT_CHAR, key=char))
+    return events
+
+
+def click_events(x: int, y: int, button: str = "left") -> List[InputEvent]:
+    return [InputEvent(MOUSE_MOVE, x=x, y=y), InputEvent(MOUSE_DOWN, button=button), InputEvent(MOUSE_UP, button=button)]
+
+
+class InputDriver:
+    """Base driver: send() injects a batch and records per-event latency."""
+
+    name = "base"
+
+    def __init__(self):
+        self._latencies: deque = deque(maxlen=LATENCY_SAMPLES)
+        self._events = 0
+        self._batches = 0
+        self._lock = threading.Lock()
+
+    def send(self, events: Sequence[InputEvent]) -> None:
+        if not events:
+            return
+        start = time.perf_counter()
+        try:
+            self._send(list(events))
+        finally:
+            per_event = (time.perf_counter() - start) / len(events)
+            with self._lock:
+                self._events += len(events)
+                self._batches += 1
+                self._latencies.extend([per_event] * len(events))
+
+    def _send(self, events: List[InputEvent]) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, float]:
+        """Event/batch counts and per-event injection latency in microseconds."""
+        with self._lock:
+            samples = sorted(self._latencies)
+            events, batches = self._events, self._batches
+        if not samples:
+            return {"events": events, "batches": batches, "mean_us": 0.0, "p95_us": 0.0, "max_us": 0.0}
+        return {
+            "events": events,
+            "batches": batches,
+            "mean_us": sum(samples) / len(samples) * 1e6,
+            "p95_us": samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1e6,
+            "max_us": samples[-1] * 1e6,
+        }
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._latencies.clear()
+            self._events = 0
+            self._batches = 0
+
+
+class RecordingDriver(InputDriver):
+    """Records events instead of injecting them."""
+
+    name = "recording"
+
+    def __init__(self):
+        super().__init__()
+        self.events: List[InputEvent] = []
+        self.batches: List[List[InputEvent]] = []
+
+    def _send(self, events: List[InputEvent]) -> None:
+        self.batches.append(events)
+        self.events.extend(events)
+
+
+class LegacyDriver(InputDriver):
+    """One autoit/keyboard call per event, as before the driver existed."""
+
+    name = "legacy"
+
+    def _send(self, events: List[InputEvent]) -> None:
+        for event in events:
+            self.send_one(event)
+
+    @staticmethod
+    def send_one(event: InputEvent) -> None:
+        if event.kind == TEXT_CHAR:
+            import keyboard as kb
+            kb.write(event.key)
+            return
+        if event.kind in (KEY_DOWN, KEY_UP):
+            import keyboard as kb
+            if event.kind == KEY_DOWN:
+                kb.press(event.key)
+            else:
+                kb.release(event.key)
+            return
+        from core import mouse
+        if event.kind == MOUSE_MOVE:
+            mouse.mouse_move_only(event.x, event.y)
+        elif event.kind == MOUSE_DOWN:
+            mouse.mouse_down_at_current(event.button)
+        elif event.kind == MOUSE_UP:
+            mouse.mouse_up_at_current(event.button)
+
+
+# keyboard 라이브러리 키 이름 -> 가상 키 코드
+_VK_NAMES = {
+    "backspace": 0x08, "tab": 0x09, "enter": 0x0D, "shift": 0x10, "ctrl": 0x11, "alt": 0x12,
+    "pause": 0x13, "caps_lock": 0x14, "esc": 0x1B, "space": 0x20, "page up": 0x21, "page down": 0x22,
+    "end": 0x23, "home": 0x24, "left": 0x25, "up": 0x26, "right": 0x27, "down": 0x28,
+    "print": 0x2C, "insert": 0x2D, "delete": 0x2E, "win_l": 0x5B, "win_r": 0x5C, "windows": 0x5B,
+    "num_lock": 0x90, "scroll_lock": 0x91,
+}
+# 확장 키 (KEYEVENTF_EXTENDEDKEY 필요)
+_EXTENDED_VK = {0x21, 0x22, 0x23, 0x24, 0x25, 0x26, 0x27, 0x28, 0x2D, 0x2E, 0x5B, 0x5C}
+# VkKeyScanW 상위 바이트의 시프트 상태 비트 -> 함께 눌러야 하는 키 (Shift, Ctrl, Alt 순)
+_SHIFT_STATE_VK = ((0x01, 0x10), (0x02, 0x11), (0x04, 0x12))
+
+
+class SendInputDriver(InputDriver):
+    """Windows SendInput: one call per batch. Keys it can't map go through LegacyDriver."""
+
+    name = "sendinput"
+
+    _MOUSE_FLAGS = {
+        ("left", MOUSE_DOWN): 0x0002, ("left", MOUSE_UP): 0x0004,
+        ("right", MOUSE_DOWN): 0x0008, ("right", MOUSE_UP): 0x0010,
+        ("middle", MOUSE_DOWN): 0x0020, ("middle", MOUSE_UP): 0x0040,
+    }
+
+    def __init__(self):
+        super().__init__()
+        import ctypes
+        from ctypes import wintypes
+        self._ctypes = ctypes
+        user32 = ctypes.WinDLL("user32", use_last_error=True)
+
+        class MOUSEINPUT(ctypes.Structure):
+            _fields_ = [("dx", wintypes.LONG), ("dy", wintypes.LONG), ("mouseData", wintypes.DWORD),
+                        ("dwFlags", wintypes.DWORD), ("time", wintypes.DWORD), ("dwExtraInfo", ctypes.c_size_t)]
+
+        class KEYBDINPUT(ctypes.Structure):
+            _fields_ = [("wVk", wintypes.WORD), ("wScan", wintypes.WORD), ("dwFlags", wintypes.DWORD),
+                        ("time", wintypes.DWORD), ("dwExtraInfo", ctypes.c_size_t)]
+
+        class HARDWAREINPUT(ctypes.Structure):
+            _fields_ = [("uMsg", wintypes.DWORD), ("wParamL", wintypes.WORD), ("wParamH", wintypes.WORD)]
+
+        class _INPUTUNION(ctypes.Union):
+            _fields_ = [("mi", MOUSEINPUT), ("ki", KEYBDINPUT), ("hi", HARDWAREINPUT)]
+
+        class INPUT(ctypes.Structure):
+            _anonymous_ = ("u",)
+            _fields_ = [("type", wintypes.DWORD), ("u", _INPUTUNION)]
+
+        self._INPUT = INPUT
+        self._user32 = user32
+        user32.SendInput.argtypes = (wintypes.UINT, ctypes.POINTER(INPUT), ctypes.c_int)
+        user32.SendInput.restype = wintypes.UINT
+        user32.VkKeyScanW.argtypes = (wintypes.WCHAR,)
+        user32.VkKeyScanW.restype = ctypes.c_short
+
+    def _virtual_key(self, key: str) -> Optional[Tuple[int, Tuple[int, ...]]]:
+        """(virtual key, modifier keys to hold with it), or None if the key can't be mapped.
+
+        Characters typed with Shift (or AltGr) on the current layout, such as
+        "!" or ":", come with those modifiers.
+        """
+        if key in _VK_NAMES:
+            return _VK_NAMES[key], ()
+        if key.startswith("f") and key[1:].isdigit() and 1 <= int(key[1:]) <= 24:
+            return 0x70 + int(key[1:]) - 1, ()
+        if len(key) == 1:
+            scan = self._user32.VkKeyScanW(key)
+            if scan != -1:
+                shift_state = (scan >> 8) & 0xFF
+                return scan & 0xFF, tuple(vk for bit, vk in _SHIFT_STATE_VK if shift_state & bit)
+        return None
+
+    def _key_input(self, vk: int, up: bool):
+        inp = self._INPUT()
+        inp.type = 1  # INPUT_KEYBOARD
+        inp.ki.wVk = vk
+        inp.ki.dwFlags = (0x0002 if up else 0) | (0x0001 if vk in _EXTENDED_VK else 0)
+        return inp
+
+    def _unicode_inputs(self, char: str) -> list:
+        """KEYEVENTF_UNICODE down/up pairs, one per UTF-16 code unit."""
+        encoded = char.encode("utf-16-le")
+        inputs = []
+        for i in range(0, len(encoded), 2):
+            for flags in (0x0004, 0x0004 | 0x0002):  # UNICODE, UNICODE | KEYUP
+                inp = self._INPUT()
+                inp.type = 1  # INPUT_KEYBOARD
+                inp.ki.wScan = int.from_bytes(encoded[i:i + 2], "little")
+                inp.ki.dwFlags = flags
+                inputs.append(inp)
+        return inputs
+
+    def _to_inputs(self, event: InputEvent) -> Optional[list]:
+        if event.kind in (KEY_DOWN, KEY_UP):
+            mapped = self._virtual_key(event.key or "")
+            if mapped is None:
+                return None
+            vk, modifiers = mapped
+            if event.kind == KEY_DOWN:
+                # 시프트 문자: 수정 키를 누른 채로 키를 누름 (keyboard.press 와 같음)
+                return [self._key_input(mod, False) for mod in modifiers] + [self._key_input(vk, False)]
+            return [self._key_input(vk, True)] + [self._key_input(mod, True) for mod in reversed(modifiers)]
+        inp = self._INPUT()
+        inp.type = 0  # INPUT_MOUSE
+        if event.kind == MOUSE_MOVE:
+            left = self._user32.GetSystemMetrics(76)
+            top = self._user32.GetSystemMetrics(77)
+            width = max(2, self._user32.GetSystemMetrics(78))
+            height = max(2, self._user32.GetSystemMetrics(79))
+            inp.mi.dx = ((event.x - left) * 65535) // (width - 1)
+            inp.mi.dy = ((event.y - top) * 65535) // (height - 1)
+            # MOVE | ABSOLUTE | VIRTUALDESK
+            inp.mi.dwFlags = 0x0001 | 0x8000 | 0x4000
+            return [inp]
+        flag = self._MOUSE_FLAGS.get((event.button, event.kind))
+        if flag is None:
+            return None
+        inp.mi.dwFlags = flag
+        return [inp]
+
+    def _send(self, events: List[InputEvent]) -> None:
+        pending = []
+        for event in events:
+            if event.kind == TEXT_CHAR:
+                pending.extend(self._unicode_inputs(event.key))
+                continue
+            inputs = self._to_inputs(event)
+            if inputs is None:
+                self._submit(pending)
+                pending = []
+                LegacyDriver.send_one(event)
+            else:
+                pending.extend(inputs)
+        self._submit(pending)
+
+    def _submit(self, inputs: list) -> None:
+        if not inputs:
+            return
+        array = (self._INPUT * len(inputs))(*inputs)
+        sent = self._user32.SendInput(len(inputs), array, self._ctypes.sizeof(self._INPUT))
+        if sent != len(inputs):
+            raise OSError(self._ctypes.get_last_error(), "SendInput was blocked")
+
+
+_driver: Optional[InputDriver] = None
+_driver_lock = threading.Lock()
+
+
+def create_driver(name: Optional[str] = None) -> InputDriver:
+    name = name or os.environ.get("CLIKEY_INPUT_DRIVER") or ("sendinput" if sys.platform == "win32" else "legacy")
+    if name == "recording":
+        return RecordingDriver()
+    if name == "sendinput":
+        try:
+            return SendInputDriver()
+        except Exception:
+            pass
+    return LegacyDriver()
+
+
+def get_input_driver() -> InputDriver:
+    """Process-wide driver shared by every run (so latency stats cover all of them)."""
+    global _driver
+    if _driver is None:
+        with _driver_lock:
+            if _driver is None:
+                _driver = create_driver()
+    return _driver
@@ -4,7 +4,18 @@ from typing import Optional, List, Dict, Any, Union
 import json
 import uuid
 
-from core.event_types import EventType, ConditionType
+from core.event_types import EventType, ConditionType, IMAGE_CONDITION_TYPES
+
+
+KEYBOARD_ACTION_LABELS = {"press": "누르기", "down": "누르고있기", "up": "떼기"}
+# 다중 배율 탐색을 켤 때 기본으로 제안하는 배율 (Windows 배율 75%~150% 대응)
+DEFAULT_MATCH_SCALES = [0.75, 0.8, 0.9, 1.0, 1.1, 1.25, 1.5]
+# 이미지 매칭 방식: 컬러(기본) / 흑백 / 윤곽선
+MATCH_MODE_COLOR = "color"
+MATCH_MODE_GRAY = "gray"
+MATCH_MODE_EDGE = "edge"
+MATCH_MODE_LABELS = {MATCH_MODE_COLOR: "컬러", MATCH_MODE_GRAY: "흑백", MATCH_MODE_EDGE: "윤곽선"}
+DEFAULT_MATCH_THRESHOLD = 0.9
 
 
 @dataclass
@@ -18,6 +29,30 @@ class MacroBlock:
     key: str = field(default_factory=lambda: MacroBlock._generate_key())
     condition_type: Optional[ConditionType] = None
     inverted: bool = False
+    # 이미지 조건: 시도할 템플릿 배율 목록 (None 이면 1.0 만)
+    match_scales: Optional[List[float]] = None
+    # 이미지 조건: 매칭 방식 (None 이면 컬러)
+    match_mode: Optional[str] = None
+    # 이미지 조건: 일치 기준 (None 이면 DEFAULT_MATCH_THRESHOLD)
+    match_threshold: Optional[float] = None
+    # 이미지 조건: 기준 이상인 위치를 모두 찾음 (자식의 @parent 클릭이 모든 위치에 적용)
+    find_all: bool = False
+    # 이미지 조건: 최근 찾은 위치 주변을 먼저 탐색하고, 없으면 전체 범위를 탐색
+    adaptive_region: bool = False
+    # 반복 블록: 반복 횟수 (0 이면 종료 이미지 조건이 맞을 때까지 무제한)
+    repeat_count: Optional[int] = None
+    # 필드가 바뀔 때마다 증가하는 버전. 표시 문자열 등 파생값 캐시의 무효화 기준
+    _version: int = field(default=0, init=False, repr=False, compare=False)
+    _display_cache: Optional[tuple[int, str]] = field(default=None, init=False, repr=False, compare=False)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        object.__setattr__(self, name, value)
+        if not name.startswith("_"):
+            object.__setattr__(self, "_version", getattr(self, "_version", 0) + 1)
+
+    @property
+    def version(self) -> int:
+        return self._version
 
     @staticmethod
     def _generate_key() -> str:
@@ -39,6 +74,24 @@ class MacroBlock:
         if self.inverted:
             result["inverted"] = True
 
+        if self.match_scales:
+            result["match_scales"] = list(self.match_scales)
+
+        if self.match_mode and self.match_mode != MATCH_MODE_COLOR:
+            result["match_mode"] = self.match_mode
+
+        if self.match_threshold is not None:
+            result["match_threshold"] = self.match_threshold
+
+        if self.find_all:
+            result["find_all"] = True
+
+        if self.adaptive_region:
+            result["adaptive_region"] = True
+
+        if self.repeat_count is not None:
+            result["repeat_count"] = self.repeat_count
+
         if self.macro_blocks:
             result["macro_blocks"] = [block.to_dict() for block in self.macro_blocks]
 
@@ -60,7 +113,13 @@ class MacroBlock:
             macro_blocks=macro_blocks,
             key=key,
             condition_type=condition_type,
-            inverted=data.get("inverted", False)
+            inverted=data.get("inverted", False),
+            match_scales=data.get("match_scales"),
+            match_mode=data.get("match_mode"),
+            match_threshold=data.get("match_threshold"),
+            find_all=data.get("find_all", False),
+            adaptive_region=data.get("adaptive_region", False),
+            repeat_count=data.get("repeat_count")
         )
 
     def to_json(self) -> str:
@@ -71,8 +130,16 @@ class MacroBlock:
         return cls.from_dict(json.loads(json_str))
 
     def get_display_text(self) -> str:
+        cache = self._display_cache
+        if cache is not None and cache[0] == self._version:
+            return cache[1]
+        text = self._build_display_text()
+        self._display_cache = (self._version, text)
+        return text
+
+    def _build_display_text(self) -> str:
         if self.event_type == EventType.KEYBOARD:
-            action_text = {"press": "누르기", "down": "누르고있기", "up": "떼기"}.get(self.action, self.action)
+            action_text = KEYBOARD_ACTION_LABELS.get(self.action, self.action)
             return f"⌨️ 키보드 {self.event_data} ({action_text})"
         elif self.event_type == EventType.MOUSE:
             position_display = self.position
@@ -81,6 +148,12 @@ class MacroBlock:
             return f"🖱️ 마우스 {self.event_data} {self.action} @{position_display}"
         elif self.event_type == EventType.DELAY:
             return f"⏱️ 대기 {self.action}초"
+        elif self.event_type == EventType.TYPE_TEXT:
+            text = (self.event_data or "").replace("\n", "⏎")
+            if len(text) > 30:
+                text = text[:30] + "…"
+            interval = f" (글자마다 {self.action}초)" if self.action else ""
+            return f"⌨️ 텍스트 입력 \"{text}\"{interval}"
         elif self.event_type == EventType.IF:
             if self.condition_type == ConditionType.RGB_MATCH:
                 position_display = self.position
@@ -90,16 +163,67 @@ class MacroBlock:
                 return f"🔻 {label} {position_display}"
             elif self.condition_type == ConditionType.IMAGE_MATCH:
                 label = "이미지 없음" if self.inverted else "이미지 있음"
-                return f"🔻 {label} @{self.event_data}"
+                options = self._image_match_options_text()
+                return f"🔻 {label} @{self.event_data}{options}"
+            elif self.condition_type == ConditionType.FOREACH_MATCH:
+                options = self._image_match_options_text()
+                return f"🔁 찾은 위치마다 @{self.event_data}{options}"
             elif self.condition_type == ConditionType.COORDINATE_CONDITION:
                 return f"🔻 좌표 조건 @{self.position}"
+            elif self.condition_type == ConditionType.EXPRESSION:
+                return f"🔻 조건식 {self.action}"
             else:
                 return f"🔻 {self.event_data} @{self.position}"
+        elif self.event_type == EventType.REPEAT:
+            count = int(self.repeat_count or 0)
+            if self.has_template():
+                until = "사라질 때까지" if self.inverted else "보일 때까지"
+                limit = f" (최대 {count}회)" if count > 0 else ""
+                return f"🔁 반복 @{self.event_data} {until}{limit}"
+            return f"🔁 반복 {count}회"
+        elif self.event_type == EventType.CALL:
+            return f"📞 서브루틴 호출 {self.event_data}"
+        elif self.event_type == EventType.SET_VAR:
+            return f"🔣 변수 {self.event_data} = {self.action}"
+        elif self.event_type == EventType.INCREMENT:
+            amount = self.action if self.action is not None else 1
+            return f"🔣 변수 {self.event_data} += {amount}"
         elif self.event_type == EventType.EXIT:
             return f"⏹️ 매크로 중지"
         else:
             return f"❓ {self.event_type.value}: {self.event_data}"
 
+    def _image_match_options_text(self) -> str:
+        options = []
+        if self.find_all:
+            options.append("모두")
+        if self.adaptive_region:
+            options.append("자동 범위")
+        if self.match_threshold is not None:
+            options.append(f"기준 {self.match_threshold:g}")
+        if self.match_mode and self.match_mode != MATCH_MODE_COLOR:
+            options.append(MATCH_MODE_LABELS.get(self.match_mode, self.match_mode))
+        if self.match_scales and len(self.match_scales) > 1:
+            options.append(f"배율 {min(self.match_scales):g}~{max(self.match_scales):g}")
+        return f" ({', '.join(options)})" if options else ""
+
+    def is_container(self) -> bool:
+        """Blocks whose children are edited and run as a nested list."""
+        return self.event_type in (EventType.IF, EventType.REPEAT)
+
+    def has_template(self) -> bool:
+        """Blocks whose action is a template image (image conditions, repeat-until-image)."""
+        return (self.event_type in (EventType.IF, EventType.REPEAT) and self.condition_type in IMAGE_CONDITION_TYPES
+                and isinstance(self.action, str) and bool(self.action))
+
+    def is_image_condition(self) -> bool:
+        """IF blocks driven by a template image (image match or for-each-match)."""
+        return self.event_type == EventType.IF and self.condition_type in IMAGE_CONDITION_TYPES
+
+    @property
+    def threshold(self) -> float:
+        return DEFAULT_MATCH_THRESHOLD if self.match_threshold is None else float(self.match_threshold)
+
     def parse_position(self) -> Optional[tuple[int, int]]:
         if not self.position:
             return None
@@ -119,6 +243,26 @@ class MacroBlock:
         if self.has_reference_position():
             self.position = "0,0"
 
+    def snapshot(self) -> 'MacroBlock':
+        """Structural copy that keeps keys, for handing the tree to another thread."""
+        return MacroBlock(
+            event_type=self.event_type,
+            event_data=self.event_data,
+            action=self.action,
+            position=self.position,
+            description=self.description,
+            macro_blocks=[block.snapshot() for block in self.macro_blocks],
+            key=self.key,
+            condition_type=self.condition_type,
+            inverted=self.inverted,
+            match_scales=self.match_scales,
+            match_mode=self.match_mode,
+            match_threshold=self.match_threshold,
+            find_all=self.find_all,
+            adaptive_region=self.adaptive_region,
+            repeat_count=self.repeat_count
+        )
+
     def copy(self) -> 'MacroBlock':
         copied_nested_blocks = [block.copy() for block in self.macro_blocks]
         return MacroBlock(
@@ -130,5 +274,11 @@ class MacroBlock:
             macro_blocks=copied_nested_blocks,
             key=MacroBlock._generate_key(),
             condition_type=self.condition_type,
-            inverted=self.inverted
+            inverted=self.inverted,
+            match_scales=self.match_scales,
+            match_mode=self.match_mode,
+            match_threshold=self.match_threshold,
+            find_all=self.find_all,
+            adaptive_region=self.adaptive_region,
+            repeat_count=self.repeat_count
         )
\ No newline at end of file
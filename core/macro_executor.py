@@ -1,25 +1,29 @@
 # core/macro_executor.py
 from __future__ import annotations
+import os
 import time
-from typing import List, Optional, Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Callable
 
 from core.macro_block import MacroBlock
 from core.event_types import EventType, ConditionType
-from core.state import GlobalState
+from core.execution_context import ExecutionContext
+from core.input_driver import (
+    InputDriver, InputEvent, KEY_DOWN, KEY_UP, MOUSE_MOVE, MOUSE_DOWN, MOUSE_UP,
+    key_press_events, click_events, text_events, get_input_driver
+)
 from core.keyboard_hotkey import normalize_key_for_keyboard
+from core.subroutines import CompiledSubroutines, MAX_CALL_DEPTH
+from core.expressions import compile_expression
+from core.trace import TraceBuffer, OUTCOME_OK, OUTCOME_STOPPED, OUTCOME_FAILED, OUTCOME_ERROR, OUTCOME_EXIT
+
+_NAN = float("nan")
 
 # Lazy imports for faster startup
-_mouse = None
 _screen = None
 _image_matcher = None
-_keyboard = None
-
-def _get_mouse():
-    global _mouse
-    if _mouse is None:
-        from core import mouse as m
-        _mouse = m
-    return _mouse
+_match_history = None
+_condition_pool = None
 
 def _get_screen():
     global _screen
@@ -35,26 +39,65 @@ def _get_image_matcher():
         _image_matcher = ImageMatcher
     return _image_matcher
 
-def _get_keyboard():
-    global _keyboard
-    if _keyboard is None:
-        import keyboard as kb
-        _keyboard = kb
-    return _keyboard
+def _get_match_history():
+    global _match_history
+    if _match_history is None:
+        from core.match_history import get_match_history
+        _match_history = get_match_history()
+    return _match_history
+
+def _get_condition_pool() -> ThreadPoolExecutor:
+    global _condition_pool
+    if _condition_pool is None:
+        _condition_pool = ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1),
+                                             thread_name_prefix="clikey-condition")
+    return _condition_pool
 
 
 class MacroExecutor:
     def __init__(self, stop_callback: Optional[Callable[[], bool]] = None,
-                 highlight_callback: Optional[Callable[[int], None]] = None):
+                 highlight_callback: Optional[Callable[[int], None]] = None,
+                 context: Optional[ExecutionContext] = None,
+                 input_driver: Optional[InputDriver] = None):
         self.stop_callback = stop_callback
         self.highlight_callback = highlight_callback
+        # 이 실행의 매치 결과/@parent 스택 (다른 실행과 공유하지 않음)
+        self.context = context or ExecutionContext()
+        self._input_driver = input_driver
+        # flat_blocks 의 블록 키 -> 인덱스 (하이라이트용, 목록이 바뀔 때만 다시 만듦)
+        self._flat_index_source: Optional[List] = None
+        self._flat_index: Dict[str, int] = {}
         self.step_delay = 0.0
         self.current_block_index = 0
+        # 연속된 형제 이미지/RGB 조건을 한 화면에서 동시에 판정 (설정 parallel_conditions)
+        self.parallel_conditions = False
+        # CALL 블록이 실행할 서브루틴 본문 (SubroutineLibrary.compile 결과, 모든 CALL 이 공유)
+        self.subroutines: Optional[CompiledSubroutines] = None
+        self._call_depth = 0
+        # EXIT 블록으로 실행을 끝냈는지 (False 반환이 실패가 아님을 알림)
+        self.exited = False
+        # 실행 기록용: 마지막으로 삼킨 예외, 블록 키 -> 이미지 탐색 최고 점수
+        self._last_error: Optional[BaseException] = None
+        # 실패가 부모 블록으로 전파되는 중 (실패 수는 가장 안쪽 블록에서 한 번만 셈)
+        self._failing = False
+        self._scores: Dict[str, float] = {}
+
+    @property
+    def input_driver(self) -> InputDriver:
+        if self._input_driver is None:
+            self._input_driver = get_input_driver()
+        return self._input_driver
 
     def should_stop(self) -> bool:
         return self.stop_callback() if self.stop_callback else False
 
     def execute_macro_blocks(self, macro_blocks: List[MacroBlock], flat_blocks: Optional[List] = None, base_index: int = 0) -> bool:
+        evaluations: Dict[int, object] = {}  # 인덱스 -> 미리 판정한 조건 결과
+        # 간격이 0 이면 연속된 입력 블록의 이벤트를 모아서 한 번에 주입
+        batching = self.step_delay <= 0
+        batch: List[InputEvent] = []
+        batch_blocks: List[MacroBlock] = []
+        trace = self.context.trace
         for i, macro_block in enumerate(macro_blocks):
             if self.should_stop():
                 return False
@@ -64,14 +107,117 @@ class MacroExecutor:
                 if current_flat_index >= 0 and self.highlight_callback:
                     self.highlight_callback(current_flat_index)
 
-            if not self._execute_single_block(macro_block, flat_blocks, base_index):
+            if batching and self._is_input_block(macro_block):
+                start = time.perf_counter()
+                try:
+                    batch.extend(self._input_events(macro_block))
+                except Exception as e:
+                    if trace is not None:
+                        trace.record(macro_block, start, time.perf_counter(), OUTCOME_ERROR, _NAN, e)
+                    return False
+                batch_blocks.append(macro_block)
+                continue
+            if batch:
+                if not self._flush_batch(batch, batch_blocks, trace):
+                    return False
+                batch = []
+                batch_blocks = []
+
+            if self.parallel_conditions and i not in evaluations:
+                evaluations = self._evaluate_condition_group(macro_blocks, i)
+
+            if i in evaluations:
+                evaluation = evaluations.pop(i)
+                if self._condition_runs_children(macro_block, evaluation) and macro_block.macro_blocks:
+                    # 자식이 화면을 바꿀 수 있으므로 남은 형제는 다시 판정
+                    evaluations = {}
+                start = time.perf_counter()
+                ok = self._execute_evaluated_condition(macro_block, evaluation, flat_blocks, base_index)
+            else:
+                if evaluations:
+                    evaluations = {}
+                start = time.perf_counter()
+                ok = self._execute_single_block(macro_block, flat_blocks, base_index)
+            if trace is not None:
+                self._trace_step(trace, macro_block, start, ok)
+            if not ok:
                 return False
 
             if self.step_delay > 0 and i < len(macro_blocks) - 1 and not self.should_stop():
                 time.sleep(self.step_delay)
 
+        if batch:
+            return not self.should_stop() and self._flush_batch(batch, batch_blocks, trace)
         return True
 
+    # ---------- 실행 기록 ----------
+    def _trace_step(self, trace: TraceBuffer, macro_block: MacroBlock, start: float, ok: bool) -> None:
+        error, self._last_error = self._last_error, None
+        if ok:
+            outcome = OUTCOME_OK
+            self._failing = False
+        elif error is not None:
+            outcome = OUTCOME_ERROR
+        elif self.exited:
+            # EXIT 블록이 끝낸 실행은 실패가 아님
+            outcome = OUTCOME_EXIT
+        elif self.should_stop():
+            outcome = OUTCOME_STOPPED
+        else:
+            outcome = OUTCOME_FAILED
+        metrics = self.context.metrics
+        if metrics is not None and (error is not None or outcome == OUTCOME_FAILED) and not self._failing:
+            metrics.block_failed()
+            self._failing = not ok
+        score = self._scores.pop(macro_block.key, _NAN) if self._scores else _NAN
+        trace.record(macro_block, start, time.perf_counter(), outcome, score, error)
+
+    def _image_checked(self, macro_block: MacroBlock, start: float, found: bool) -> None:
+        """Record the score, duration and hit/miss of the image search that began at start."""
+        context = self.context
+        if context.trace is not None:
+            self._scores[macro_block.key] = _get_image_matcher().last_score()
+        if context.metrics is not None:
+            context.metrics.image_checked(time.perf_counter() - start, found)
+
+    # ---------- 입력 주입 ----------
+    def _flush_batch(self, batch: List[InputEvent], batch_blocks: List[MacroBlock],
+                     trace: Optional[TraceBuffer]) -> bool:
+        start = time.perf_counter()
+        ok = self._send_input(batch)
+        if not ok and all(block.event_type == EventType.KEYBOARD for block in batch_blocks):
+            # 하나씩 보낼 때(_execute_keyboard)처럼 키보드 주입 실패는 기록만 하고 계속.
+            # 마우스/텍스트가 섞여 있으면 하나씩 보낼 때처럼 실행을 멈춤
+            ok = True
+        if trace is not None:
+            # 모아 보낸 블록은 한 번의 주입 시간을 함께 기록
+            for macro_block in batch_blocks:
+                self._trace_step(trace, macro_block, start, ok)
+        return ok
+
+    def _is_input_block(self, macro_block: MacroBlock) -> bool:
+        if macro_block.event_type == EventType.TYPE_TEXT:
+            return not self._type_interval(macro_block)
+        return macro_block.event_type in (EventType.KEYBOARD, EventType.MOUSE)
+
+    def _input_events(self, macro_block: MacroBlock) -> List[InputEvent]:
+        if macro_block.event_type == EventType.KEYBOARD:
+            return self._keyboard_events(macro_block)
+        if macro_block.event_type == EventType.TYPE_TEXT:
+            return text_events(macro_block.event_data or "")
+        events = []
+        for point_events in self._mouse_events(macro_block):
+            events.extend(point_events)
+        return events
+
+    def _send_input(self, events: List[InputEvent]) -> bool:
+        try:
+            self.input_driver.send(events)
+            return True
+        except Exception as e:
+            self._last_error = e
+            return False
+
     def _execute_single_block(self, macro_block: MacroBlock, flat_blocks: Optional[List] = None, base_index: int = 0) -> bool:
         if self.should_stop():
             return False
@@ -92,49 +238,208 @@ class MacroExecutor:
             elif macro_block.event_type == EventType.EXIT:
                 return self._execute_exit(macro_block)
 
-        except Exception:
+            elif macro_block.event_type == EventType.TYPE_TEXT:
+                self._execute_type_text(macro_block)
+
+            elif macro_block.event_type == EventType.REPEAT:
+                return self._execute_repeat(macro_block, flat_blocks, base_index)
+
+            elif macro_block.event_type == EventType.CALL:
+                return self._execute_call(macro_block)
+
+            elif macro_block.event_type == EventType.SET_VAR:
+                self._execute_set_var(macro_block)
+
+            elif macro_block.event_type == EventType.INCREMENT:
+                self._execute_increment(macro_block)
+
+        except Exception as e:
+            self._last_error = e
             return False
 
         return True
 
-    def _execute_keyboard(self, macro_block: MacroBlock):
+    # ---------- 형제 조건 병렬 판정 ----------
+    def _is_parallel_condition(self, macro_block: MacroBlock) -> bool:
+        return (macro_block.event_type == EventType.IF and bool(macro_block.action) and
+                macro_block.condition_type in (ConditionType.IMAGE_MATCH, ConditionType.RGB_MATCH))
+
+    def _evaluate_condition_group(self, macro_blocks: List[MacroBlock], start: int) -> Dict[int, object]:
+        """Evaluate the run of independent sibling conditions starting at start on one frame.
+
+        Returns {index: evaluation}; empty when the run is too short to be
+        worth a full-screen capture. A condition whose evaluation fails is
+        left out and runs the normal sequential way when its turn comes.
+        """
+        end = start
+        while end < len(macro_blocks) and self._is_parallel_condition(macro_blocks[end]):
+            end += 1
+        group = macro_blocks[start:end]
+        if len(group) < 2 or not any(block.condition_type == ConditionType.IMAGE_MATCH for block in group):
+            return {}
+
+        try:
+            frame = self.context.shared_frame() or _get_image_matcher().capture_frame()
+        except Exception:
+            return {}
+
+        pool = _get_condition_pool()
+        futures = {start + offset: pool.submit(self._evaluate_parallel_condition, block, frame)
+                   for offset, block in enumerate(group)}
+        evaluations = {}
+        for index, future in futures.items():
+            try:
+                evaluations[index] = future.result()
+            except Exception:
+                pass
+        return evaluations
+
+    def _evaluate_parallel_condition(self, macro_block: MacroBlock, frame):
+        if macro_block.condition_type == ConditionType.IMAGE_MATCH:
+            return self._evaluate_image_match(macro_block, frame)
+        return self._evaluate_rgb_match(macro_block, frame)
+
+    def _condition_runs_children(self, macro_block: MacroBlock, evaluation) -> bool:
+        if macro_block.condition_type == ConditionType.IMAGE_MATCH:
+            return bool(evaluation[0]) != macro_block.inverted
+        return bool(evaluation)
+
+    def _execute_evaluated_condition(self, macro_block: MacroBlock, evaluation, flat_blocks: Optional[List] = None, base_index: int = 0) -> bool:
+        if self.should_stop():
+            return False
+        try:
+            if macro_block.condition_type == ConditionType.IMAGE_MATCH:
+                return self._execute_image_match_condition(macro_block, flat_blocks, base_index, evaluation)
+            return self._execute_rgb_match_condition(macro_block, flat_blocks, base_index, evaluation)
+        except Exception as e:
+            self._last_error = e
+            return False
+
+    def _keyboard_events(self, macro_block: MacroBlock) -> List[InputEvent]:
         if not macro_block.event_data:
-            return
+            return []
 
         normalized_key = normalize_key_for_keyboard(macro_block.event_data)
         if not normalized_key:
-            return
+            return []
 
         action = macro_block.action or "press"
-        kb = _get_keyboard()
-        try:
-            if action == "press":
-                kb.press_and_release(normalized_key)
-            elif action == "down":
-                kb.press(normalized_key)
-            elif action == "up":
-                kb.release(normalized_key)
-        except Exception:
-            pass
+        if action == "press":
+            return key_press_events(normalized_key)
+        elif action == "down":
+            return [InputEvent(KEY_DOWN, key=normalized_key)]
+        elif action == "up":
+            return [InputEvent(KEY_UP, key=normalized_key)]
+        return []
 
-    def _execute_mouse(self, macro_block: MacroBlock):
+    def _mouse_events(self, macro_block: MacroBlock) -> List[List[InputEvent]]:
+        """Events per target point ('모두 찾기' parents give several points)."""
         button = macro_block.event_data or "left"
         action = macro_block.action or "click"
-        mouse = _get_mouse()
 
         if action == "down":
-            mouse.mouse_down_at_current(button)
+            return [[InputEvent(MOUSE_DOWN, button=button)]]
         elif action == "up":
-            mouse.mouse_up_at_current(button)
+            return [[InputEvent(MOUSE_UP, button=button)]]
+
+        if macro_block.position and macro_block.position.strip() == "@parent":
+            points = self._get_parent_match_points()
         else:
-            x, y = self._resolve_mouse_position(macro_block)
-            if x is None or y is None:
-                return
+            points = [self._resolve_mouse_position(macro_block)]
 
+        per_point = []
+        for x, y in points:
+            if x is None or y is None:
+                continue
             if action == "click":
-                mouse.mouse_move_click(x, y, button)
+                per_point.append(click_events(x, y, button))
             elif action == "move":
-                mouse.mouse_move_only(x, y)
+                per_point.append([InputEvent(MOUSE_MOVE, x=x, y=y)])
+        return per_point
+
+    def _execute_keyboard(self, macro_block: MacroBlock):
+        try:
+            self.input_driver.send(self._keyboard_events(macro_block))
+        except Exception as e:
+            self._last_error = e
+
+    def _execute_mouse(self, macro_block: MacroBlock):
+        for i, events in enumerate(self._mouse_events(macro_block)):
+            if i > 0:
+                # '모두 찾기' 부모: 찾은 위치마다 반복
+                if self.should_stop():
+                    return
+                if self.step_delay > 0:
+                    time.sleep(self.step_delay)
+            self.input_driver.send(events)
+
+    def _type_interval(self, macro_block: MacroBlock) -> float:
+        try:
+            return max(0.0, float(macro_block.action or 0))
+        except (TypeError, ValueError):
+            return 0.0
+
+    def _execute_type_text(self, macro_block: MacroBlock):
+        text = macro_block.event_data or ""
+        interval = self._type_interval(macro_block)
+        if not interval:
+            self.input_driver.send(text_events(text))
+            return
+
+        for i, char in enumerate(text):
+            if i > 0:
+                if self.should_stop():
+                    return
+                time.sleep(interval)
+            self.input_driver.send(text_events(char))
+
+    def _execute_repeat(self, macro_block: MacroBlock, flat_blocks: Optional[List] = None, base_index: int = 0) -> bool:
+        """Run the children repeat_count times, or until the image condition holds (checked before each pass)."""
+        count = int(macro_block.repeat_count or 0)
+        until_image = macro_block.has_template()
+        if count <= 0 and not until_image:
+            return True
+
+        done = 0
+        while count <= 0 or done < count:
+            if self.should_stop():
+                return False
+            if until_image:
+                found = self._find_image(macro_block, self._parse_search_region(macro_block.position),
+                                         self.context.shared_frame()) is not None
+                if found != macro_block.inverted:
+                    break
+            if not self._execute_nested_blocks(macro_block, flat_blocks, base_index):
+                return False
+            done += 1
+            if self.step_delay > 0 and (count <= 0 or done < count) and not self.should_stop():
+                time.sleep(self.step_delay)
+
+        return True
+
+    def _execute_call(self, macro_block: MacroBlock) -> bool:
+        """Run the named subroutine body. An undefined name or runaway recursion stops the macro."""
+        body = self.subroutines.get(macro_block.event_data) if self.subroutines else None
+        if body is None or self._call_depth >= MAX_CALL_DEPTH:
+            return False
+
+        # 본문은 편집 목록에 없으므로 하이라이트 없이 실행 (CALL 블록이 하이라이트된 상태 유지)
+        self._call_depth += 1
+        try:
+            return self.execute_macro_blocks(body)
+        finally:
+            self._call_depth -= 1
+
+    def _execute_set_var(self, macro_block: MacroBlock):
+        evaluate = compile_expression(str(macro_block.action if macro_block.action is not None else 0))
+        self.context.variables[macro_block.event_data] = evaluate(self.context.lookup)
+
+    def _execute_increment(self, macro_block: MacroBlock):
+        amount = macro_block.action if macro_block.action is not None else 1
+        if isinstance(amount, str):
+            amount = float(amount)
+        name = macro_block.event_data
+        self.context.variables[name] = self.context.lookup(name) + amount
 
     def _execute_delay(self, macro_block: MacroBlock):
         delay_time = float(macro_block.action or 0)
@@ -153,7 +458,11 @@ class MacroExecutor:
         return True
 
     def _execute_exit(self, macro_block: MacroBlock) -> bool:
-        return not bool(macro_block.action)
+        if not macro_block.action:
+            return True
+        # 의도한 종료: 실행 중단은 같지만 실패와 구분할 수 있게 표시
+        self.exited = True
+        return False
 
     def _execute_nested_blocks(self, macro_block: MacroBlock, flat_blocks: Optional[List] = None, base_index: int = 0) -> bool:
         if not macro_block.macro_blocks:
@@ -169,20 +478,43 @@ class MacroExecutor:
     def _execute_condition(self, macro_block: MacroBlock, flat_blocks: Optional[List] = None, base_index: int = 0) -> bool:
         if macro_block.condition_type == ConditionType.IMAGE_MATCH:
             return self._execute_image_match_condition(macro_block, flat_blocks, base_index)
+        elif macro_block.condition_type == ConditionType.FOREACH_MATCH:
+            return self._execute_foreach_match(macro_block, flat_blocks, base_index)
         elif macro_block.condition_type == ConditionType.RGB_MATCH:
             return self._execute_rgb_match_condition(macro_block, flat_blocks, base_index)
         elif macro_block.condition_type == ConditionType.COORDINATE_CONDITION:
             return self._execute_coordinate_condition(macro_block, flat_blocks, base_index)
+        elif macro_block.condition_type == ConditionType.EXPRESSION:
+            return self._execute_expression_condition(macro_block, flat_blocks, base_index)
         else:
             return self._execute_if(macro_block, flat_blocks, base_index)
 
-    def _execute_image_match_condition(self, macro_block: MacroBlock, flat_blocks: Optional[List] = None, base_index: int = 0) -> bool:
+    def _evaluate_image_match(self, macro_block: MacroBlock, frame=None) -> tuple:
+        """(first match or None, all matches when find_all else None)."""
+        ImageMatcher = _get_image_matcher()
+        if frame is None:
+            frame = self.context.shared_frame()
+        search_region = self._parse_search_region(macro_block.position)
+        matches = None
+        if macro_block.find_all and not macro_block.inverted:
+            start = time.perf_counter()
+            # 한 번 캡처한 화면에서 모든 위치를 찾아 자식 블록에 넘김
+            matches = ImageMatcher.find_all_on_screen(
+                macro_block.action, threshold=macro_block.threshold, search_region=search_region,
+                scales=macro_block.match_scales, mode=macro_block.match_mode, frame=frame
+            )
+            result = matches[0] if matches else None
+            self._image_checked(macro_block, start, result is not None)
+        else:
+            result = self._find_image(macro_block, search_region, frame)
+        return result, matches
+
+    def _execute_image_match_condition(self, macro_block: MacroBlock, flat_blocks: Optional[List] = None, base_index: int = 0,
+                                       evaluation: Optional[tuple] = None) -> bool:
         if not macro_block.action:
             return True
 
-        ImageMatcher = _get_image_matcher()
-        search_region = self._parse_search_region(macro_block.position)
-        result = ImageMatcher.find_image_on_screen(macro_block.action, search_region=search_region)
+        result, matches = evaluation if evaluation is not None else self._evaluate_image_match(macro_block)
 
         if macro_block.inverted:
             # 불일치 모드: 매치 실패 시 자식 실행 (좌표 정보 없으므로 stack/store 생략)
@@ -191,19 +523,78 @@ class MacroExecutor:
             return True
 
         if result:
-            self._store_image_match_result(macro_block.action, result, macro_block.event_data)
+            slot = self._store_image_match_result(macro_block.action, result, macro_block.event_data, matches)
 
             # Push current image match to stack before executing nested blocks
-            if not hasattr(GlobalState, 'image_match_stack'):
-                GlobalState.image_match_stack = []
-            GlobalState.image_match_stack.append(macro_block.event_data)
+            stack = self.context.image_match_stack
+            stack.append(slot)
 
             try:
                 return self._execute_nested_blocks(macro_block, flat_blocks, base_index)
             finally:
                 # Pop from stack after nested blocks complete
-                if GlobalState.image_match_stack:
-                    GlobalState.image_match_stack.pop()
+                if stack:
+                    stack.pop()
+
+        return True
+
+    def _find_image(self, macro_block: MacroBlock, search_region: Optional[tuple[int, int, int, int]],
+                    frame=None) -> Optional[tuple[int, int]]:
+        """Single-match search, recorded in the match history.
+
+        adaptive_region blocks first search a padded window around their
+        recent hits and fall back to search_region only on a miss.
+        """
+        ImageMatcher = _get_image_matcher()
+
+        def search(region):
+            return ImageMatcher.find_image_on_screen(
+                macro_block.action, threshold=macro_block.threshold, search_region=region,
+                scales=macro_block.match_scales, mode=macro_block.match_mode, frame=frame
+            )
+
+        start = time.perf_counter()
+        history = _get_match_history()
+        window = history.window(macro_block.key, search_region) if macro_block.adaptive_region else None
+        window_hit = None
+        result = None
+        if window is not None:
+            result = search(window)
+            window_hit = result is not None
+        if result is None:
+            # 주변 창에서 못 찾으면 원래 범위 전체를 탐색
+            result = search(search_region)
+        self._image_checked(macro_block, start, result is not None)
+        size = ImageMatcher.template_size(macro_block.action, macro_block.match_scales) if result else None
+        history.record(macro_block.key, macro_block.get_display_text(), result, size, window_hit)
+        return result
+
+    def _execute_foreach_match(self, macro_block: MacroBlock, flat_blocks: Optional[List] = None, base_index: int = 0) -> bool:
+        """Run the children once per match; @parent is the current match."""
+        if not macro_block.action:
+            return True
+
+        ImageMatcher = _get_image_matcher()
+        start = time.perf_counter()
+        matches = ImageMatcher.find_all_on_screen(
+            macro_block.action, threshold=macro_block.threshold,
+            search_region=self._parse_search_region(macro_block.position),
+            scales=macro_block.match_scales, mode=macro_block.match_mode,
+            frame=self.context.shared_frame()
+        )
+        self._image_checked(macro_block, start, bool(matches))
+
+        stack = self.context.image_match_stack
+        for point in matches:
+            if self.should_stop():
+                return False
+            stack.append(self._store_image_match_result(macro_block.action, point, macro_block.event_data))
+            try:
+                if not self._execute_nested_blocks(macro_block, flat_blocks, base_index):
+                    return False
+            finally:
+                if stack:
+                    stack.pop()
 
         return True
 
@@ -220,48 +611,47 @@ class MacroExecutor:
 
         return None
 
-    def _store_image_match_result(self, template_path: str, result: tuple[int, int], event_data: str):
-        ImageMatcher = _get_image_matcher()
-        context_data = ImageMatcher.create_context_data(template_path, result)
-
-        if not hasattr(GlobalState, 'image_match_results'):
-            GlobalState.image_match_results = {}
-
-        if len(GlobalState.image_match_results) > 100:
-            oldest_key = next(iter(GlobalState.image_match_results))
-            del GlobalState.image_match_results[oldest_key]
+    def _store_image_match_result(self, template_path: str, result: tuple[int, int], event_data: str,
+                                  matches: Optional[List[tuple[int, int]]] = None) -> int:
+        """Store the match under event_data; returns its slot for the @parent stack."""
+        return self.context.matches.store(event_data, result, template_path, matches)
 
-        GlobalState.image_match_results[event_data] = context_data
+    def _evaluate_rgb_match(self, macro_block: MacroBlock, frame=None) -> bool:
+        """Whether the children of an RGB condition should run."""
+        actual_rgb = self._get_rgb_for_condition(macro_block, frame)
+        if actual_rgb is None:
+            # 판단 불가 → 자식 건너뛰기 (inverted 무관)
+            return False
+        return self._compare_rgb(macro_block.action, actual_rgb) != macro_block.inverted
 
-    def _execute_rgb_match_condition(self, macro_block: MacroBlock, flat_blocks: Optional[List] = None, base_index: int = 0) -> bool:
+    def _execute_rgb_match_condition(self, macro_block: MacroBlock, flat_blocks: Optional[List] = None, base_index: int = 0,
+                                     evaluation: Optional[bool] = None) -> bool:
         if not macro_block.action:
             return True
 
         try:
-            actual_rgb = self._get_rgb_for_condition(macro_block)
-            if actual_rgb is None:
-                # 판단 불가 → 자식 건너뛰기 (inverted 무관)
-                return True
-
-            matched = self._compare_rgb(macro_block.action, actual_rgb)
-            if matched != macro_block.inverted:
+            run_children = evaluation if evaluation is not None else self._evaluate_rgb_match(macro_block)
+            if run_children:
                 return self._execute_nested_blocks(macro_block, flat_blocks, base_index)
 
             return True
 
-        except Exception:
+        except Exception as e:
+            self._last_error = e
             return True
 
-    def _get_rgb_for_condition(self, macro_block: MacroBlock) -> Optional[tuple[int, int, int]]:
+    def _get_rgb_for_condition(self, macro_block: MacroBlock, frame=None) -> Optional[tuple[int, int, int]]:
         if macro_block.position and macro_block.position.strip() == "@parent":
-            if hasattr(GlobalState, 'current_coordinate_rgb') and GlobalState.current_coordinate_rgb:
-                return GlobalState.current_coordinate_rgb
+            if self.context.current_coordinate_rgb:
+                return self.context.current_coordinate_rgb
             return None
 
         coords = macro_block.parse_position()
         if not coords:
             return None
 
+        if frame is not None:
+            return frame.rgb_at(*coords)
         screen = _get_screen()
         return screen.grab_rgb_at(*coords)
 
@@ -290,16 +680,25 @@ class MacroExecutor:
             if actual_rgb is None:
                 return True
 
-            GlobalState.current_coordinate_rgb = actual_rgb
+            self.context.current_coordinate_rgb = actual_rgb
 
             try:
                 return self._execute_nested_blocks(macro_block, flat_blocks, base_index)
             finally:
-                GlobalState.current_coordinate_rgb = None
+                self.context.current_coordinate_rgb = None
 
-        except Exception:
+        except Exception as e:
+            self._last_error = e
             return True
 
+    def _execute_expression_condition(self, macro_block: MacroBlock, flat_blocks: Optional[List] = None, base_index: int = 0) -> bool:
+        """Variable-only condition: no screen capture. Evaluation errors stop the macro."""
+        if not macro_block.action:
+            return True
+        if compile_expression(str(macro_block.action))(self.context.lookup):
+            return self._execute_nested_blocks(macro_block, flat_blocks, base_index)
+        return True
+
     def _resolve_mouse_position(self, macro_block: MacroBlock) -> tuple[Optional[int], Optional[int]]:
         if macro_block.position and (macro_block.position.strip() == "@parent" or "." in macro_block.position):
             return self._resolve_position_reference(macro_block.position)
@@ -312,49 +711,37 @@ class MacroExecutor:
             if position_str.strip() == "@parent":
                 return self._get_parent_image_coordinates()
 
-            parts = position_str.split(",")
-            if len(parts) != 2:
-                return None, None
-
-            x = self._resolve_coordinate_part(parts[0].strip(), "x")
-            y = self._resolve_coordinate_part(parts[1].strip(), "y")
-
+            # "이름.x,이름.y": 파싱은 저장소가 한 번만 하고 이후엔 슬롯 인덱스로 조회
+            x, y = self.context.matches.resolve(position_str)
             return (x, y) if x is not None and y is not None else (None, None)
 
         except (ValueError, AttributeError):
             return None, None
 
-    def _resolve_coordinate_part(self, part: str, coord_type: str) -> Optional[int]:
-        if "." not in part:
-            return int(part)
-
-        ref_name, coord = part.split(".", 1)
-        if coord != coord_type or not hasattr(GlobalState, 'image_match_results'):
-            return None
-
-        return GlobalState.image_match_results[ref_name].get(coord_type) if ref_name in GlobalState.image_match_results else None
+    def _get_parent_match_points(self) -> List[tuple[Optional[int], Optional[int]]]:
+        """Every match of the direct parent image condition (one entry unless it used find_all)."""
+        if self.context.image_match_stack:
+            matches = self.context.matches.matches(self.context.image_match_stack[-1])
+            if matches:
+                return [tuple(point) for point in matches]
+        return [self._get_parent_image_coordinates()]
 
     def _get_parent_image_coordinates(self) -> tuple[Optional[int], Optional[int]]:
         # Use stack-based approach to get the direct parent's coordinates
-        if not hasattr(GlobalState, 'image_match_stack') or not GlobalState.image_match_stack:
-            return None, None
-
-        if not hasattr(GlobalState, 'image_match_results') or not GlobalState.image_match_results:
+        if not self.context.image_match_stack:
             return None, None
 
         # Get the most recent parent from stack (last item)
-        parent_name = GlobalState.image_match_stack[-1]
-
-        if parent_name in GlobalState.image_match_results:
-            context_data = GlobalState.image_match_results[parent_name]
-            x, y = context_data.get("x"), context_data.get("y")
-            if x is not None and y is not None:
-                return x, y
+        x, y = self.context.matches.point(self.context.image_match_stack[-1])
+        if x is not None and y is not None:
+            return x, y
 
         return None, None
 
     def _find_block_index_in_flat_list(self, target_block: MacroBlock, flat_blocks: List, base_index: int = 0) -> int:
-        for i, (block, depth) in enumerate(flat_blocks):
-            if block.key == target_block.key:
-                return i
-        return -1
\ No newline at end of file
+        if self._flat_index_source is not flat_blocks:
+            index: Dict[str, int] = {}
+            for i, (block, depth) in enumerate(flat_blocks):
+                index.setdefault(block.key, i)
+            self._flat_index, self._flat_index_source = index, flat_blocks
+        return self._flat_index.get(target_block.key, -1)
\ No newline at end of file
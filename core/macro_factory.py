@@ -1,4 +1,6 @@
 # core/macro_factory.py
+from typing import List, Optional
+
 from core.macro_block import MacroBlock
 from core.event_types import EventType, ConditionType
 
@@ -27,6 +29,76 @@ class MacroFactory:
             description=description
         )
 
+    @staticmethod
+    def create_type_text_block(text: str, interval: float = 0.0, description: str = "") -> MacroBlock:
+        """Create a block that types a whole string (optionally pausing between characters)."""
+        return MacroBlock(
+            event_type=EventType.TYPE_TEXT,
+            event_data=text,
+            action=interval if interval else None,
+            description=description
+        )
+
+    @staticmethod
+    def create_repeat_block(count: int, until_template: Optional[str] = None, until_gone: bool = False,
+                            match_threshold: Optional[float] = None, description: str = "") -> MacroBlock:
+        """Create a container that repeats its children count times, or until an image appears
+        (disappears with until_gone). With a template, count 0 means no limit."""
+        block = MacroBlock(
+            event_type=EventType.REPEAT,
+            repeat_count=int(count),
+            description=description,
+            macro_blocks=[]
+        )
+        if until_template:
+            import os
+            block.event_data = os.path.splitext(os.path.basename(until_template))[0]
+            block.action = until_template
+            block.condition_type = ConditionType.IMAGE_MATCH
+            block.inverted = until_gone
+            block.match_threshold = match_threshold
+        return block
+
+    @staticmethod
+    def create_call_block(name: str, description: str = "") -> MacroBlock:
+        """Create a block that runs the named subroutine."""
+        return MacroBlock(
+            event_type=EventType.CALL,
+            event_data=name,
+            description=description
+        )
+
+    @staticmethod
+    def create_set_variable_block(name: str, expression: str, description: str = "") -> MacroBlock:
+        """Create a block that stores the value of expression in a variable."""
+        return MacroBlock(
+            event_type=EventType.SET_VAR,
+            event_data=name,
+            action=expression,
+            description=description
+        )
+
+    @staticmethod
+    def create_increment_block(name: str, amount: float = 1, description: str = "") -> MacroBlock:
+        """Create a block that adds amount to a variable (undefined variables start at 0)."""
+        return MacroBlock(
+            event_type=EventType.INCREMENT,
+            event_data=name,
+            action=amount,
+            description=description
+        )
+
+    @staticmethod
+    def create_expression_condition_block(expression: str, description: str = "") -> MacroBlock:
+        """Create a condition that runs its children when the variable expression is true."""
+        return MacroBlock(
+            event_type=EventType.IF,
+            condition_type=ConditionType.EXPRESSION,
+            action=expression,
+            description=description,
+            macro_blocks=[]
+        )
+
     @staticmethod
     def create_delay_block(seconds: float, description: str = "") -> MacroBlock:
         """Create a delay macro block."""
@@ -47,7 +119,12 @@ class MacroFactory:
         )
 
     @staticmethod
-    def create_image_match_block(template_path: str, description: str = "", inverted: bool = False) -> MacroBlock:
+    def create_image_match_block(template_path: str, description: str = "", inverted: bool = False,
+                                 match_scales: Optional[List[float]] = None,
+                                 match_mode: Optional[str] = None,
+                                 match_threshold: Optional[float] = None,
+                                 find_all: bool = False,
+                                 adaptive_region: bool = False) -> MacroBlock:
         """Create an image match conditional block using IF event type."""
         import os
         filename = os.path.basename(template_path)
@@ -60,8 +137,26 @@ class MacroFactory:
             condition_type=ConditionType.IMAGE_MATCH,
             description=description,
             macro_blocks=[],  # 조건 충족 시 실행할 블록들을 위한 컨테이너
-            inverted=inverted
+            inverted=inverted,
+            match_scales=match_scales,
+            match_mode=match_mode,
+            match_threshold=match_threshold,
+            find_all=find_all,
+            adaptive_region=adaptive_region
+        )
+
+    @staticmethod
+    def create_foreach_match_block(template_path: str, description: str = "",
+                                   match_scales: Optional[List[float]] = None,
+                                   match_mode: Optional[str] = None,
+                                   match_threshold: Optional[float] = None) -> MacroBlock:
+        """Create a container that runs its children once per match of the template."""
+        block = MacroFactory.create_image_match_block(
+            template_path, description, match_scales=match_scales,
+            match_mode=match_mode, match_threshold=match_threshold
         )
+        block.condition_type = ConditionType.FOREACH_MATCH
+        return block
 
     @staticmethod
     def create_rgb_match_block(x: int, y: int, expected_rgb: str, description: str = "", inverted: bool = False) -> MacroBlock:
@@ -0,0 +1,423 @@
+# core/macro_package.py
+"""단일 파일 매크로 패키지(.ckp).
+
+레이아웃 (리틀 엔디언):
+    header   : magic "CLKP", u16 format version, u16 flags, u32 image count,
+               u64 blocks offset, u64 blocks length
+    images   : image count x (32B sha256, u64 offset, u64 length)
+    blobs    : 템플릿 이미지 원본 바이트 (내용 해시로 중복 제거)
+    blocks   : MessagePack 호환 인코딩의 매크로 문서 (version/macro_blocks/settings/hotkeys)
+
+이미지 조건의 action 은 ``clikey-image:<sha256>/<파일명>`` 참조로 저장되고,
+불러올 때 파일을 mmap 해 ImageMatcher 가 메모리에서 바로 디코딩한다.
+
+열린 패키지는 파일 경로마다 사용자 수를 센다. load_macro_package 와
+save_macro_package(keep_open=True) 가 하나씩 늘리고, 다른 파일을 열 때 등
+release_macro_package 로 줄여 0 이 되면 mmap 을 닫는다 (Windows 에서 파일을
+바꾸거나 지울 수 있도록).
+"""
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Tuple
+import mmap
+import os
+import struct
+import threading
+
+from core.macro_block import MacroBlock
+from core.subroutines import SubroutineLibrary
+from core.event_types import IMAGE_CONDITION_TYPES
+from core.persistence import MACRO_FILE_VERSION, _export_settings, _export_hotkeys, atomic_write
+from core import template_store
+
+PACKAGE_EXTENSION = ".ckp"
+PACKAGE_MAGIC = b"CLKP"
+PACKAGE_FORMAT_VERSION = 1
+
+_IMAGE_CONDITION_VALUES = {condition_type.value for condition_type in IMAGE_CONDITION_TYPES}
+
+_HEADER = struct.Struct("<4sHHIQQ")
+_IMAGE_ENTRY = struct.Struct("<32sQQ")
+
+
+# ---------- MessagePack 부분 구현 (nil/bool/int/float/str/array/map) ----------
+_U16 = struct.Struct(">H")
+_U32 = struct.Struct(">I")
+_I64 = struct.Struct(">q")
+_F64 = struct.Struct(">d")
+
+
+def _pack_into(obj: Any, out: bytearray) -> None:
+    if obj is None:
+        out.append(0xC0)
+    elif obj is True:
+        out.append(0xC3)
+    elif obj is False:
+        out.append(0xC2)
+    elif isinstance(obj, int):
+        if 0 <= obj < 0x80:
+            out.append(obj)
+        elif -32 <= obj < 0:
+            out.append(obj & 0xFF)
+        else:
+            out.append(0xD3)
+            out += _I64.pack(obj)
+    elif isinstance(obj, float):
+        out.append(0xCB)
+        out += _F64.pack(obj)
+    elif isinstance(obj, str):
+        data = obj.encode("utf-8")
+        n = len(data)
+        if n < 32:
+            out.append(0xA0 | n)
+        elif n < 0x100:
+            out += bytes((0xD9, n))
+        elif n < 0x10000:
+            out.append(0xDA)
+            out += _U16.pack(n)
+        else:
+            out.append(0xDB)
+            out += _U32.pack(n)
+        out += data
+    elif isinstance(obj, (list, tuple)):
+        _pack_container_header(len(obj), 0x90, 0xDC, 0xDD, out)
+        for item in obj:
+            _pack_into(item, out)
+    elif isinstance(obj, dict):
+        _pack_container_header(len(obj), 0x80, 0xDE, 0xDF, out)
+        for key, value in obj.items():
+            _pack_into(key, out)
+            _pack_into(value, out)
+    else:
+        raise TypeError(f"cannot pack {type(obj).__name__}")
+
+
+def _pack_container_header(n: int, fix: int, c16: int, c32: int, out: bytearray) -> None:
+    if n < 16:
+        out.append(fix | n)
+    elif n < 0x10000:
+        out.append(c16)
+        out += _U16.pack(n)
+    else:
+        out.append(c32)
+        out += _U32.pack(n)
+
+
+def packb(obj: Any) -> bytes:
+    out = bytearray()
+    _pack_into(obj, out)
+    return bytes(out)
+
+
+def _unpack_from(buf, pos: int) -> Tuple[Any, int]:
+    b = buf[pos]
+    pos += 1
+    if b < 0x80:
+        return b, pos
+    if b >= 0xE0:
+        return b - 0x100, pos
+    if 0xA0 <= b <= 0xBF:
+        n = b & 0x1F
+        return str(buf[pos:pos + n], "utf-8"), pos + n
+    if 0x90 <= b <= 0x9F:
+        return _unpack_array(buf, pos, b & 0x0F)
+    if 0x80 <= b <= 0x8F:
+        return _unpack_map(buf, pos, b & 0x0F)
+    if b == 0xC0:
+        return None, pos
+    if b == 0xC2:
+        return False, pos
+    if b == 0xC3:
+        return True, pos
+    if b == 0xD3:
+        return _I64.unpack_from(buf, pos)[0], pos + 8
+    if b == 0xCB:
+        return _F64.unpack_from(buf, pos)[0], pos + 8
+    if b in (0xD9, 0xDA, 0xDB):
+        if b == 0xD9:
+            n, pos = buf[pos], pos + 1
+        elif b == 0xDA:
+            n, pos = _U16.unpack_from(buf, pos)[0], pos + 2
+        else:
+            n, pos = _U32.unpack_from(buf, pos)[0], pos + 4
+        return str(buf[pos:pos + n], "utf-8"), pos + n
+    if b == 0xDC:
+        return _unpack_array(buf, pos + 2, _U16.unpack_from(buf, pos)[0])
+    if b == 0xDD:
+        return _unpack_array(buf, pos + 4, _U32.unpack_from(buf, pos)[0])
+    if b == 0xDE:
+        return _unpack_map(buf, pos + 2, _U16.unpack_from(buf, pos)[0])
+    if b == 0xDF:
+        return _unpack_map(buf, pos + 4, _U32.unpack_from(buf, pos)[0])
+    raise ValueError(f"unsupported type byte 0x{b:02x} at {pos - 1}")
+
+
+def _unpack_array(buf, pos: int, n: int) -> Tuple[List[Any], int]:
+    items = []
+    for _ in range(n):
+        item, pos = _unpack_from(buf, pos)
+        items.append(item)
+    return items, pos
+
+
+def _unpack_map(buf, pos: int, n: int) -> Tuple[Dict[Any, Any], int]:
+    result = {}
+    for _ in range(n):
+        key, pos = _unpack_from(buf, pos)
+        result[key], pos = _unpack_from(buf, pos)
+    return result, pos
+
+
+def unpackb(buf) -> Any:
+    obj, _ = _unpack_from(buf, 0)
+    return obj
+
+
+# ---------- 패키지 읽기 ----------
+class MacroPackage:
+    """Read-only, memory-mapped view of a .ckp file."""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self._file = open(file_path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        try:
+            magic, version, _flags, image_count, blocks_offset, blocks_length = _HEADER.unpack_from(self._mmap, 0)
+            if magic != PACKAGE_MAGIC:
+                raise ValueError("not a Clikey package")
+            if version > PACKAGE_FORMAT_VERSION:
+                raise ValueError(f"unsupported package version {version}")
+            self._images: Dict[str, Tuple[int, int]] = {}
+            pos = _HEADER.size
+            for _ in range(image_count):
+                digest, offset, length = _IMAGE_ENTRY.unpack_from(self._mmap, pos)
+                self._images[digest.hex()] = (offset, length)
+                pos += _IMAGE_ENTRY.size
+            self._blocks_range = (blocks_offset, blocks_length)
+        except Exception:
+            self.close()
+            raise
+
+    @property
+    def digests(self) -> List[str]:
+        return list(self._images)
+
+    def template_bytes(self, digest: str) -> memoryview:
+        offset, length = self._images[digest]
+        return memoryview(self._mmap)[offset:offset + length]
+
+    def document(self) -> Dict[str, Any]:
+        offset, length = self._blocks_range
+        with memoryview(self._mmap)[offset:offset + length] as view:
+            return unpackb(view)
+
+    def close(self) -> None:
+        """Unmap and close the file.
+
+        Raises BufferError (leaving the package open) while a template_bytes()
+        view is still alive, so the file is never replaced under a live map.
+        """
+        self._mmap.close()
+        self._file.close()
+
+
+_open_packages: Dict[str, MacroPackage] = {}
+_package_users: Dict[str, int] = {}  # 정규화한 경로 -> 열어 둔 쪽의 수
+_packages_lock = threading.RLock()  # 자동 저장 스레드와 UI 스레드가 함께 사용
+
+
+def _norm(path: str) -> str:
+    return os.path.normcase(os.path.abspath(path))
+
+
+def load_macro_package(file_path: str) -> Tuple[List[MacroBlock], Dict[str, Any]]:
+    """Open a package, register its templates and return (blocks, header).
+
+    header["subroutines"] is the raw dict; use SubroutineLibrary.from_dict.
+    """
+    package = MacroPackage(file_path)
+    try:
+        document = package.document()
+        blocks = [MacroBlock.from_dict(data) for data in document.get("macro_blocks", [])]
+    except Exception:
+        package.close()
+        raise
+    with _packages_lock:
+        try:
+            _replace_open_package(file_path, package)
+        except BufferError:
+            package.close()
+            raise
+        key = _norm(file_path)
+        _package_users[key] = _package_users.get(key, 0) + 1
+    header = {k: v for k, v in document.items() if k != "macro_blocks"}
+    return blocks, header
+
+
+def release_macro_package(file_path: Optional[str]) -> None:
+    """Drop one user of an open package (from load_macro_package or a keep_open save); unmap it at zero."""
+    if not file_path:
+        return
+    key = _norm(file_path)
+    with _packages_lock:
+        users = _package_users.get(key, 0) - 1
+        if users > 0:
+            _package_users[key] = users
+            return
+        _package_users.pop(key, None)
+        _replace_open_package(file_path, None)
+
+
+def _replace_open_package(file_path: str, package) -> None:
+    key = _norm(file_path)
+    previous = _open_packages.pop(key, None)
+    if previous is not None:
+        template_store.release(previous)
+        try:
+            previous.close()
+        except BufferError:
+            # 아직 읽는 중인 뷰가 있음: 열린 채로 되돌리고 알림
+            _open_packages[key] = previous
+            template_store.register(previous, previous.digests)
+            raise
+    if package is not None:
+        _open_packages[key] = package
+        template_store.register(package, package.digests)
+
+
+# ---------- 패키지 쓰기 ----------
+def _collect_templates(block_dicts: List[Dict[str, Any]], images: Dict[str, bytes]) -> None:
+    for data in block_dicts:
+        action = data.get("action")
+        if data.get("condition_type") in _IMAGE_CONDITION_VALUES and isinstance(action, str) and action:
+            raw = template_store.read_bytes(action)
+            if raw is not None:
+                raw = bytes(raw)
+                digest = template_store.content_digest(raw)
+                images.setdefault(digest, raw)
+                name = action.split("/", 1)[1] if template_store.parse_ref(action) else os.path.basename(action)
+                data["action"] = template_store.make_ref(digest, name)
+        if data.get("macro_blocks"):
+            _collect_templates(data["macro_blocks"], images)
+
+
+def encode_macro_package(macro_blocks: List[MacroBlock], settings: Dict[str, Any], hotkeys: Dict[str, Any],
+                         subroutines: Optional[SubroutineLibrary] = None) -> bytes:
+    block_dicts = [block.to_dict() for block in macro_blocks]
+    images: Dict[str, bytes] = {}
+    _collect_templates(block_dicts, images)
+    document = {
+        "version": MACRO_FILE_VERSION,
+        "macro_blocks": block_dicts,
+    }
+    if subroutines:
+        subroutine_dicts = subroutines.to_dict()
+        for body in subroutine_dicts.values():
+            _collect_templates(body, images)
+        document["subroutines"] = subroutine_dicts
+    document["settings"] = _export_settings(settings)
+    document["hotkeys"] = _export_hotkeys(hotkeys)
+    document = packb(document)
+
+    table_size = _IMAGE_ENTRY.size * len(images)
+    offset = _HEADER.size + table_size
+    table = bytearray()
+    for digest, raw in images.items():
+        table += _IMAGE_ENTRY.pack(bytes.fromhex(digest), offset, len(raw))
+        offset += len(raw)
+    header = _HEADER.pack(PACKAGE_MAGIC, PACKAGE_FORMAT_VERSION, 0, len(images), offset, len(document))
+    return b"".join([header, bytes(table), *images.values(), document])
+
+
+def save_macro_package(file_path: str, macro_blocks: List[MacroBlock], settings: Dict[str, Any], hotkeys: Dict[str, Any],
+                       keep_open: bool = True, subroutines: Optional[SubroutineLibrary] = None) -> None:
+    """Atomically write a package.
+
+    With keep_open the new file is mapped and registered so references in
+    macro_blocks keep resolving, and the caller becomes one of its users
+    (see release_macro_package). Raises BufferError without writing if the
+    open package can't be unmapped yet.
+    """
+    data = encode_macro_package(macro_blocks, settings, hotkeys, subroutines)
+    key = _norm(file_path)
+    with _packages_lock:
+        # 같은 파일이 mmap 으로 열려 있으면 (Windows) 교체할 수 없으므로 먼저 닫는다.
+        # 이미지 바이트는 이미 data 에 복사되어 있다.
+        _replace_open_package(file_path, None)
+        written = False
+        try:
+            with atomic_write(file_path, "wb") as f:
+                f.write(data)
+            written = True
+        finally:
+            users = _package_users.get(key, 0) + (1 if keep_open and written else 0)
+            if users and os.path.exists(file_path):
+                _replace_open_package(file_path, MacroPackage(file_path))
+                _package_users[key] = users
+
+
+def is_package_path(file_path: str) -> bool:
+    return file_path.lower().endswith(PACKAGE_EXTENSION)
+
+
+# ---------- 벤치마크: python -m core.macro_package <macro.json> ----------
+def _benchmark(json_path: str, rounds: int = 5) -> None:
+    import tempfile
+    import time
+    from core.persistence import MacroFileReader, write_macro_file
+
+    with MacroFileReader(json_path) as reader:
+        blocks = list(reader)
+        settings, hotkeys = reader.settings, reader.hotkeys
+
+    def best_of(fn) -> float:
+        times = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_out = os.path.join(tmp, "bench.json")
+        ckp_out = os.path.join(tmp, "bench" + PACKAGE_EXTENSION)
+
+        def save_json():
+            with open(json_out, "w", encoding="utf-8") as f:
+                write_macro_file(f, blocks, settings, hotkeys)
+
+        def load_json():
+            with MacroFileReader(json_out) as r:
+                list(r)
+
+        def save_ckp():
+            save_macro_package(ckp_out, blocks, settings, hotkeys)
+
+        def load_ckp():
+            load_macro_package(ckp_out)
+
+        results = [
+            ("json", best_of(save_json), best_of(load_json), os.path.getsize(json_out)),
+            ("ckp", best_of(save_ckp), best_of(load_ckp), os.path.getsize(ckp_out)),
+        ]
+        # save_ckp 와 load_ckp 가 늘린 사용자 수만큼 놓아 파일을 닫음
+        with _packages_lock:
+            _package_users.pop(_norm(ckp_out), None)
+            _replace_open_package(ckp_out, None)
+
+    print(f"{len(blocks)} top-level blocks, best of {rounds}")
+    print(f"{'format':<6} {'save ms':>10} {'load ms':>10} {'bytes':>12}")
+    for name, save_s, load_s, size in results:
+        print(f"{name:<6} {save_s * 1000:>10.2f} {load_s * 1000:>10.2f} {size:>12}")
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 2:
+        print("usage: python -m core.macro_package <macro.json> [rounds]")
+        sys.exit(1)
+    _benchmark(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 5)
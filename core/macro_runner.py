@@ -0,0 +1,214 @@
+# core/macro_runner.py
+"""매크로 한 번 실행 (시작 지연 + 반복 루프) 을 자체 스레드에서 돌린다.
+
+실행마다 ExecutionContext 를 따로 가지므로 여러 MacroRunner 를 동시에 돌릴 수 있다
+(예: 빠른 감시 루프 + 메인 루틴). 전체 화면 캡처는 FrameSource 로 공유한다.
+블록 단위 실행 기록은 항상 켜져 있고, 중지/실패로 끝나면 TRACE_DIR 에 자동 덤프된다.
+"""
+from __future__ import annotations
+from typing import Callable, List, Optional
+import threading
+import time
+
+from core.macro_block import MacroBlock
+from core.macro_executor import MacroExecutor
+from core.macro_tree import flatten_blocks
+from core.execution_context import ExecutionContext, FrameSource, get_frame_source
+from core.subroutines import SubroutineLibrary
+from core.match_store import reference_names
+from core.trace import TraceBuffer
+from core.run_metrics import RunMetrics
+from core import metrics_exporter
+
+# 실행이 끝난 이유 (MacroRunner.result)
+RESULT_COMPLETED = "completed"  # 설정한 반복 횟수를 모두 마침
+RESULT_EXITED = "exited"  # 매크로 중지(EXIT) 블록으로 정상 종료
+RESULT_STOPPED = "stopped"  # 사용자/제어 API 의 중지 요청
+RESULT_FAILED = "failed"  # 블록이 실패를 반환했거나 예외로 끝남
+
+# 지금 실행 중인 MacroRunner (제어 API 의 전체 중지/상태 조회용)
+_active: "set[MacroRunner]" = set()
+_active_lock = threading.Lock()
+
+
+def active_runners() -> List[MacroRunner]:
+    with _active_lock:
+        return list(_active)
+
+
+class MacroRunner:
+    """One macro run on a worker thread.
+
+    ``highlight_callback(flat_index)`` and ``on_finish(completed)`` are
+    called from the worker thread; UI code should marshal them. ``result``
+    holds the termination reason (RESULT_*) once the run has finished;
+    ``completed`` is true for RESULT_COMPLETED and RESULT_EXITED.
+    """
+
+    def __init__(self, macro_blocks: List[MacroBlock], settings: dict,
+                 frame_source: Optional[FrameSource] = None,
+                 highlight_callback: Optional[Callable[[int], None]] = None,
+                 on_finish: Optional[Callable[[bool], None]] = None,
+                 name: str = "macro",
+                 subroutines: Optional[SubroutineLibrary] = None):
+        self.macro_blocks = macro_blocks
+        self.subroutines = subroutines
+        self.settings = dict(settings)
+        self.frame_source = frame_source or get_frame_source()
+        self.highlight_callback = highlight_callback
+        self.on_finish = on_finish
+        self.name = name
+        self.trace = TraceBuffer()
+        self.metrics = RunMetrics()
+        self.context = ExecutionContext(frame_source=self.frame_source, trace=self.trace, metrics=self.metrics)
+        # 마지막 자동 덤프 경로 (완료되면 None)
+        self.trace_path: Optional[str] = None
+        self.executor: Optional[MacroExecutor] = None
+        self.flat_blocks: list = []
+        self.result: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def completed(self) -> bool:
+        return self.result in (RESULT_COMPLETED, RESULT_EXITED)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> bool:
+        if self.running or not self.macro_blocks:
+            return False
+        self._stop.clear()
+        self.result = None
+        self.trace_path = None
+        self.trace.clear()
+        # 변수는 한 실행 동안만 유지 (같은 러너를 다시 시작하면 처음부터)
+        self.context.variables.clear()
+        # 내보내기가 꺼져 있으면 series 는 None (실행 중 추가 비용 없음)
+        registry = metrics_exporter.get_registry()
+        self.metrics = self.context.metrics = RunMetrics(series=registry.series(self.name) if registry else None)
+        self._thread = threading.Thread(target=self._run, name=f"clikey-run-{self.name}", daemon=True)
+        with _active_lock:
+            _active.add(self)
+        self._thread.start()
+        return True
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def should_stop(self) -> bool:
+        return self._stop.is_set()
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return not self.running
+
+    def status(self) -> dict:
+        """JSON-friendly summary of this run (safe to call from any thread)."""
+        return {
+            "name": self.name,
+            "running": self.running,
+            "completed": self.completed,
+            "result": self.result,
+            "loops": self.metrics.loops,
+            "steps": self.trace.total,
+            "block_failures": self.metrics.block_failures,
+            "trace_path": self.trace_path,
+        }
+
+    def sample_metrics(self) -> dict:
+        """Current RunMetrics sample (call at a fixed low rate, e.g. from a UI timer)."""
+        return self.metrics.sample(self.trace.total)
+
+    def dump_trace(self, path: Optional[str] = None, reason: str = "manual") -> Optional[str]:
+        """Write the execution trace to path (default: TRACE_DIR). Returns the path, or None."""
+        meta = {"name": self.name, "completed": self.completed}
+        if path is None:
+            return self.trace.dump_auto(self.name, reason, meta)
+        try:
+            return self.trace.dump(path, reason, meta)
+        except OSError:
+            return None
+
+    def _run(self) -> None:
+        self.frame_source.acquire()
+        result = None
+        try:
+            # Create flat list for highlighting
+            self.flat_blocks = flatten_blocks(self.macro_blocks)
+
+            # Initial delay
+            delay_sec = max(0, float(self.settings.get("start_delay", 0)))
+            if self._stop.wait(delay_sec):
+                return
+
+            # Setup repeat and step delay
+            repeat = int(self.settings.get("repeat", 1))
+            step_delay = float(self.settings.get("step_delay", 0.001))
+            loop_inf = (repeat == 0)
+            loops = 0
+
+            self.executor = MacroExecutor(
+                stop_callback=self.should_stop,
+                highlight_callback=self.highlight_callback,
+                context=self.context
+            )
+            self.executor.step_delay = step_delay
+            self.executor.parallel_conditions = bool(self.settings.get("parallel_conditions", False))
+            # 서브루틴 본문 표는 실행마다 한 번만 만들어 모든 CALL 이 공유
+            if self.subroutines:
+                self.executor.subroutines = self.subroutines.compile()
+
+            # 매크로에 나오는 매치 이름마다 결과 슬롯을 미리 배정
+            self.context.matches.prepare(reference_names(self.macro_blocks))
+            if self.subroutines:
+                self.context.matches.prepare(reference_names(self.subroutines.all_blocks()))
+
+            self.context.started_at = time.perf_counter()
+            while (loop_inf or loops < repeat) and not self.should_stop():
+                # Clear image match state at the start of each cycle
+                self.context.reset()
+                self.context.loop_index = loops + 1
+
+                loop_start = time.perf_counter()
+                if not self.executor.execute_macro_blocks(self.macro_blocks, self.flat_blocks):
+                    # 반복 횟수가 아니라 실행기가 알려 준 이유로 구분
+                    if self.executor.exited:
+                        result = RESULT_EXITED
+                    elif not self.should_stop():
+                        result = RESULT_FAILED
+                    break
+                self.metrics.loop_done(time.perf_counter() - loop_start)
+
+                if self.should_stop():
+                    break
+                loops += 1
+
+                # Add step delay between loops
+                if step_delay > 0 and (loop_inf or loops < repeat):
+                    if self._stop.wait(step_delay):
+                        break
+
+            if result is None and not loop_inf and loops >= repeat:
+                result = RESULT_COMPLETED
+        finally:
+            self.frame_source.release()
+            if result is None:
+                # 중지 요청으로 빠져나왔거나 예상치 못한 예외
+                result = RESULT_STOPPED if self.should_stop() else RESULT_FAILED
+            self.result = result
+            # 정상 종료(완료/EXIT)는 덤프하지 않음
+            if result in (RESULT_STOPPED, RESULT_FAILED):
+                self.trace_path = self.dump_trace(reason=result)
+            if self.metrics.series is not None:
+                self.metrics.series.run_finished(result)
+            with _active_lock:
+                _active.discard(self)
+            if self.on_finish:
+                try:
+                    self.on_finish(self.completed)
+                except Exception:
+                    pass
@@ -0,0 +1,255 @@
+# core/macro_tree.py
+from __future__ import annotations
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import json
+
+from core.macro_block import MacroBlock
+
+
+def flatten_blocks(blocks: Iterable[MacroBlock], depth: int = 0) -> List[Tuple[MacroBlock, int]]:
+    """Depth-first (block, depth) list of blocks and all their descendants."""
+    flat: List[Tuple[MacroBlock, int]] = []
+    stack = [(block, depth) for block in reversed(list(blocks))]
+    while stack:
+        block, block_depth = stack.pop()
+        flat.append((block, block_depth))
+        if block.macro_blocks:
+            stack.extend((child, block_depth + 1) for child in reversed(block.macro_blocks))
+    return flat
+
+
+class MacroTree:
+    """MacroBlock tree with parent pointers and a key -> block index.
+
+    Every structural mutation goes through this class so the index stays in
+    sync. Parent/root lookups then walk parent pointers (O(depth)) instead of
+    scanning the whole tree. Sibling positions are cached and renumbered per
+    sibling list only when a lookup finds them stale, so after an edit the
+    first index_in_parent on that list is O(siblings) and the rest are O(1).
+    Removing one block is O(siblings) (list deletion); use remove_many to
+    delete a multi-selection in one pass per sibling list.
+    """
+
+    def __init__(self, roots: Optional[Iterable[MacroBlock]] = None):
+        self.roots: List[MacroBlock] = []
+        self._nodes: Dict[str, MacroBlock] = {}
+        self._parents: Dict[str, Optional[MacroBlock]] = {}
+        # 키 -> 형제 리스트 안 위치 (편집 후에는 틀릴 수 있어 조회 때 확인하고 다시 매김)
+        self._positions: Dict[str, int] = {}
+        if roots is not None:
+            self.load(roots)
+
+    # ---------- 인덱스 관리 ----------
+    def load(self, roots: Iterable[MacroBlock]) -> None:
+        # roots 리스트 객체는 유지 (GlobalState.current_macro 등이 참조)
+        self.roots[:] = list(roots)
+        self._nodes.clear()
+        self._parents.clear()
+        self._positions.clear()
+        for block in self.roots:
+            self._index(block, None)
+
+    def clear(self) -> None:
+        self.roots.clear()
+        self._nodes.clear()
+        self._parents.clear()
+        self._positions.clear()
+
+    def _index(self, block: MacroBlock, parent: Optional[MacroBlock]) -> None:
+        existing = self._nodes.get(block.key)
+        if existing is not None and existing is not block:
+            # 파일을 직접 편집하는 등으로 키가 중복된 경우 새 키 발급
+            block.key = MacroBlock._generate_key()
+        self._nodes[block.key] = block
+        self._parents[block.key] = parent
+        for child in block.macro_blocks:
+            self._index(child, block)
+
+    def _unindex(self, block: MacroBlock) -> None:
+        if self._nodes.get(block.key) is block:
+            del self._nodes[block.key]
+            del self._parents[block.key]
+            self._positions.pop(block.key, None)
+        for child in block.macro_blocks:
+            self._unindex(child)
+
+    # ---------- 조회 ----------
+    def __contains__(self, block: MacroBlock) -> bool:
+        return self._nodes.get(block.key) is block
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def get(self, key: str) -> Optional[MacroBlock]:
+        return self._nodes.get(key)
+
+    def parent_of(self, block: MacroBlock) -> Optional[MacroBlock]:
+        return self._parents.get(block.key)
+
+    def children_of(self, parent: Optional[MacroBlock]) -> List[MacroBlock]:
+        return self.roots if parent is None else parent.macro_blocks
+
+    def ancestors_of(self, block: MacroBlock) -> Iterator[MacroBlock]:
+        parent = self._parents.get(block.key)
+        while parent is not None:
+            yield parent
+            parent = self._parents.get(parent.key)
+
+    def depth_of(self, block: MacroBlock) -> int:
+        return sum(1 for _ in self.ancestors_of(block))
+
+    def root_of(self, block: MacroBlock) -> MacroBlock:
+        root = block
+        for root in self.ancestors_of(block):
+            pass
+        return root
+
+    def index_in_parent(self, block: MacroBlock) -> int:
+        """Position of block among its siblings (identity based)."""
+        siblings = self.children_of(self.parent_of(block))
+        position = self._positions.get(block.key)
+        if position is not None and position < len(siblings) and siblings[position] is block:
+            return position
+        self._renumber(siblings)
+        position = self._positions.get(block.key)
+        if position is None or siblings[position] is not block:
+            raise ValueError(f"block {block.key} is not in the tree")
+        return position
+
+    def _renumber(self, siblings: List[MacroBlock]) -> None:
+        positions = self._positions
+        for i, sibling in enumerate(siblings):
+            positions[sibling.key] = i
+
+    def root_index(self, block: MacroBlock) -> int:
+        return self.index_in_parent(self.root_of(block))
+
+    def flatten(self) -> List[Tuple[MacroBlock, int]]:
+        """Depth-first (block, depth) list, matching the list widget rows."""
+        return flatten_blocks(self.roots)
+
+    # ---------- 변경 ----------
+    def insert(self, block: MacroBlock, parent: Optional[MacroBlock] = None, index: Optional[int] = None) -> None:
+        siblings = self.children_of(parent)
+        if index is None:
+            siblings.append(block)
+        else:
+            siblings.insert(index, block)
+        self._index(block, parent)
+        if index is None:
+            self._positions[block.key] = len(siblings) - 1
+
+    def insert_after(self, block: MacroBlock, anchor: MacroBlock) -> None:
+        self.insert(block, self.parent_of(anchor), self.index_in_parent(anchor) + 1)
+
+    def remove(self, block: MacroBlock) -> bool:
+        """Detach block (and its subtree). Returns False if it is not in the tree."""
+        if block not in self:
+            return False
+        siblings = self.children_of(self.parent_of(block))
+        del siblings[self.index_in_parent(block)]
+        self._unindex(block)
+        return True
+
+    def remove_many(self, blocks: Iterable[MacroBlock]) -> int:
+        """Detach several blocks with one pass over each affected sibling list.
+
+        Blocks not in the tree, or inside another removed block's subtree,
+        are skipped. Returns the number of subtrees detached.
+        """
+        keys = {block.key for block in blocks if block in self}
+        removed: Dict[int, Tuple[List[MacroBlock], List[MacroBlock]]] = {}
+        for key in keys:
+            block = self._nodes[key]
+            if any(ancestor.key in keys for ancestor in self.ancestors_of(block)):
+                continue
+            siblings = self.children_of(self.parent_of(block))
+            removed.setdefault(id(siblings), (siblings, []))[1].append(block)
+        count = 0
+        for siblings, detached in removed.values():
+            detached_ids = {id(block) for block in detached}
+            siblings[:] = [sibling for sibling in siblings if id(sibling) not in detached_ids]
+            for block in detached:
+                self._unindex(block)
+            count += len(detached)
+        return count
+
+    def replace(self, old_block: MacroBlock, new_block: MacroBlock) -> bool:
+        if old_block not in self:
+            return False
+        parent = self.parent_of(old_block)
+        siblings = self.children_of(parent)
+        position = self.index_in_parent(old_block)
+        siblings[position] = new_block
+        self._unindex(old_block)
+        self._index(new_block, parent)
+        self._positions[new_block.key] = position
+        return True
+
+    def move(self, block: MacroBlock, parent: Optional[MacroBlock], index: Optional[int] = None) -> None:
+        self.remove(block)
+        self.insert(block, parent, index)
+
+
+# collapse_repeats 가 찾는 반복 구간의 최대 길이 (블록 수)
+MAX_REPEAT_PERIOD = 16
+
+
+def _signature(block: MacroBlock) -> str:
+    """Block content without keys, so identical copies compare equal."""
+    def strip(data):
+        data.pop("key", None)
+        for child in data.get("macro_blocks", ()):
+            strip(child)
+        return data
+    return json.dumps(strip(block.to_dict()), sort_keys=True, ensure_ascii=False)
+
+
+def _best_run(signatures: List[str], start: int) -> Tuple[int, int]:
+    """(period, repeats) of the run at start that removes the most blocks; (0, 0) if none."""
+    best, best_saving = (0, 0), 0
+    remaining = len(signatures) - start
+    for period in range(1, min(MAX_REPEAT_PERIOD, remaining // 2) + 1):
+        unit = signatures[start:start + period]
+        repeats = 1
+        while signatures[start + repeats * period:start + (repeats + 1) * period] == unit:
+            repeats += 1
+        # REPEAT 블록 하나가 추가되므로 period * (repeats - 1) - 1 개가 줄어듦
+        saving = period * (repeats - 1) - 1
+        if repeats >= 2 and saving > best_saving:
+            best, best_saving = (period, repeats), saving
+    return best
+
+
+def collapse_repeats(blocks: List[MacroBlock]) -> Tuple[List[MacroBlock], int]:
+    """Replace identical consecutive runs with REPEAT blocks, innermost lists first.
+
+    The first copy of each run becomes the REPEAT body (keeping its keys);
+    the other copies are dropped. Returns (new block list, number of REPEAT
+    blocks created). Blocks are modified in place.
+    """
+    from core.macro_factory import MacroFactory
+
+    created = 0
+    for block in blocks:
+        if block.macro_blocks:
+            children, count = collapse_repeats(block.macro_blocks)
+            if count:
+                block.macro_blocks = children
+                created += count
+
+    signatures = [_signature(block) for block in blocks]
+    result: List[MacroBlock] = []
+    i = 0
+    while i < len(blocks):
+        period, repeats = _best_run(signatures, i)
+        if not period:
+            result.append(blocks[i])
+            i += 1
+            continue
+        repeat_block = MacroFactory.create_repeat_block(repeats)
+        repeat_block.macro_blocks = list(blocks[i:i + period])
+        result.append(repeat_block)
+        created += 1
+        i += period * repeats
+    return result, created
@@ -0,0 +1,117 @@
+# core/match_history.py
+"""이미지 조건별 매치 기록.
+
+adaptive_region 이 켜진 블록은 최근에 찾은 위치들을 감싸는 창(여백 포함)을
+먼저 탐색하고, 그 창에서 못 찾았을 때만 원래 범위(position 또는 전체 화면)를
+탐색한다. 기록은 블록 키별로 프로세스가 살아있는 동안만 유지된다.
+"""
+from __future__ import annotations
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, Tuple
+import threading
+
+Region = Tuple[int, int, int, int]
+
+# 창을 계산할 때 쓰는 최근 적중 수
+RECENT_HITS = 8
+# 최근 적중 위치를 감싼 뒤 사방으로 더하는 여백 (px)
+WINDOW_MARGIN = 48
+
+
+@dataclass
+class BlockMatchStats:
+    label: str = ""
+    searches: int = 0
+    hits: int = 0
+    window_searches: int = 0
+    window_hits: int = 0
+    # 최근 적중한 템플릿 영역 (x1, y1, x2, y2)
+    recent: Deque[Region] = field(default_factory=lambda: deque(maxlen=RECENT_HITS))
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.searches if self.searches else 0.0
+
+    @property
+    def window_hit_rate(self) -> float:
+        return self.window_hits / self.window_searches if self.window_searches else 0.0
+
+
+class MatchHistory:
+    """Recent hit boxes and hit counters per block key."""
+
+    def __init__(self, margin: int = WINDOW_MARGIN):
+        self.margin = margin
+        self._stats: Dict[str, BlockMatchStats] = {}
+        self._lock = threading.Lock()
+
+    def window(self, key: str, bounds: Optional[Region] = None) -> Optional[Region]:
+        """Padded box around recent hits, clipped to bounds; None when there is nothing to narrow."""
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None or not stats.recent:
+                return None
+            boxes = list(stats.recent)
+        x1 = min(b[0] for b in boxes) - self.margin
+        y1 = min(b[1] for b in boxes) - self.margin
+        x2 = max(b[2] for b in boxes) + self.margin
+        y2 = max(b[3] for b in boxes) + self.margin
+        if bounds is not None:
+            if x1 <= bounds[0] and y1 <= bounds[1] and x2 >= bounds[2] and y2 >= bounds[3]:
+                return None  # 원래 범위보다 좁아지지 않음
+            x1, y1 = max(x1, bounds[0]), max(y1, bounds[1])
+            x2, y2 = min(x2, bounds[2]), min(y2, bounds[3])
+            if x2 <= x1 or y2 <= y1:
+                return None
+        return x1, y1, x2, y2
+
+    def record(self, key: str, label: str, center: Optional[Tuple[int, int]],
+               size: Optional[Tuple[int, int]], window_hit: Optional[bool] = None) -> None:
+        """Count one search. window_hit is None when no narrowed window was tried."""
+        with self._lock:
+            stats = self._stats.setdefault(key, BlockMatchStats())
+            stats.label = label
+            stats.searches += 1
+            if window_hit is not None:
+                stats.window_searches += 1
+                stats.window_hits += int(window_hit)
+            if center is None:
+                return
+            stats.hits += 1
+            half_w, half_h = ((size[0] + 1) // 2, (size[1] + 1) // 2) if size else (0, 0)
+            stats.recent.append((center[0] - half_w, center[1] - half_h, center[0] + half_w, center[1] + half_h))
+
+    def stats(self) -> Dict[str, BlockMatchStats]:
+        with self._lock:
+            return {key: BlockMatchStats(s.label, s.searches, s.hits, s.window_searches, s.window_hits, deque(s.recent, maxlen=RECENT_HITS))
+                    for key, s in self._stats.items()}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+
+def format_report(stats: Dict[str, BlockMatchStats], labels: Optional[Dict[str, str]] = None) -> List[str]:
+    """Report lines, lowest hit rate first. labels maps block keys to current display text."""
+    labels = labels or {}
+    lines = []
+    for key, s in sorted(stats.items(), key=lambda kv: (kv[1].hit_rate, kv[0])):
+        line = f"{labels.get(key, s.label)}\n    적중 {s.hits}/{s.searches} ({s.hit_rate:.0%})"
+        if s.window_searches:
+            line += f", 주변 창 적중 {s.window_hits}/{s.window_searches} ({s.window_hit_rate:.0%})"
+        lines.append(line)
+    return lines
+
+
+_history: Optional[MatchHistory] = None
+_history_lock = threading.Lock()
+
+
+def get_match_history() -> MatchHistory:
+    global _history
+    if _history is None:
+        with _history_lock:
+            if _history is None:
+                _history = MatchHistory()
+    return _history
@@ -0,0 +1,198 @@
+# core/match_store.py
+"""실행 단위 이미지 매치 결과 저장소.
+
+이미지 조건이 찾은 좌표를 이름(event_data)별 슬롯에 둔다. 매크로에 나오는 이름은
+실행 전에 prepare() 로 슬롯을 미리 배정하므로, 실행 중 저장/조회는 리스트 인덱스
+접근이다. 반복 회차가 바뀌면 세대(generation)만 올리고 배열은 그대로 재사용한다.
+슬롯의 세대가 현재 세대와 다르면 비어 있는 것으로 본다.
+
+미리 배정되지 않은 이름(동적 이름)은 LRU 로 MAX_MATCH_RESULTS 개까지만 유지하고,
+밀려난 슬롯 번호는 다시 쓴다.
+
+마우스 좌표 참조 문자열("버튼.x,버튼.y")은 한 번만 파싱해 (슬롯, 축) 표로 캐시한다.
+"""
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from core.macro_block import MacroBlock
+from core.event_types import EventType
+
+# 미리 배정되지 않은 이름의 결과를 보관하는 최대 수 (오래된 것부터 버림)
+MAX_MATCH_RESULTS = 100
+
+Point = Tuple[Optional[int], Optional[int]]
+# 좌표 참조 한 축: (슬롯, 0=x/1=y) 또는 (None, 상수)
+_Part = Tuple[Optional[int], int]
+
+
+def reference_names(blocks: Iterable[MacroBlock]) -> Iterator[str]:
+    """Names stored by image conditions and names read by mouse position references."""
+    from core.macro_tree import flatten_blocks
+
+    for block, _ in flatten_blocks(blocks):
+        if block.is_image_condition() and block.event_data:
+            yield block.event_data
+        elif block.event_type == EventType.MOUSE and block.position and "." in block.position:
+            for part in block.position.split(","):
+                if "." in part:
+                    yield part.strip().split(".", 1)[0]
+
+
+class MatchResultStore:
+    """Slot-per-name match results with a generation counter instead of per-cycle clearing."""
+
+    def __init__(self, capacity: int = MAX_MATCH_RESULTS):
+        self.capacity = capacity
+        self.generation = 1
+        self._slots: Dict[str, int] = {}
+        # prepare() 로 배정되지 않은 이름 -> 슬롯 (LRU 순서)
+        self._dynamic: "OrderedDict[str, int]" = OrderedDict()
+        self._free: List[int] = []
+        self._names: List[Optional[str]] = []
+        self._gen: List[int] = []
+        self._x: List[Optional[int]] = []
+        self._y: List[Optional[int]] = []
+        self._template: List[Optional[str]] = []
+        self._matches: List[Optional[List[Tuple[int, int]]]] = []
+        self._references: Dict[str, Tuple[_Part, _Part]] = {}
+        # 이름 없는 이미지 조건의 결과 슬롯 (@parent 로만 읽음, 처음 쓸 때 배정)
+        self._anonymous: Optional[int] = None
+
+    # ---------- 슬롯 ----------
+    def prepare(self, names: Iterable[str]) -> None:
+        """Reserve a permanent slot for every name (call before the run)."""
+        for name in names:
+            if name in self._dynamic:
+                # 이미 동적으로 쓰던 이름은 고정 슬롯으로 승격
+                del self._dynamic[name]
+            elif name not in self._slots:
+                self._slots[name] = self._allocate(name)
+
+    def _allocate(self, name: str) -> int:
+        if self._free:
+            slot = self._free.pop()
+            self._names[slot] = name
+            self._gen[slot] = 0
+            return slot
+        self._names.append(name)
+        self._gen.append(0)
+        self._x.append(None)
+        self._y.append(None)
+        self._template.append(None)
+        self._matches.append(None)
+        return len(self._names) - 1
+
+    def slot(self, name: Optional[str], create: bool = False) -> Optional[int]:
+        if name is None:
+            return None
+        slot = self._slots.get(name)
+        if slot is not None:
+            if name in self._dynamic:
+                self._dynamic.move_to_end(name)
+            return slot
+        if not create:
+            return None
+        slot = self._allocate(name)
+        self._slots[name] = slot
+        self._dynamic[name] = slot
+        while len(self._dynamic) > self.capacity:
+            old_name, old_slot = self._dynamic.popitem(last=False)
+            del self._slots[old_name]
+            self._names[old_slot] = None
+            self._gen[old_slot] = 0
+            self._free.append(old_slot)
+        return slot
+
+    # ---------- 저장/조회 ----------
+    def new_generation(self) -> None:
+        """Forget every result (O(1); slots are reused)."""
+        self.generation += 1
+
+    def store(self, name: Optional[str], point: Tuple[int, int], template_path: Optional[str] = None,
+              matches: Optional[List[Tuple[int, int]]] = None) -> int:
+        """Save a result under name and return its slot.
+
+        Conditions without a name share one slot that no name resolves to,
+        so their children can still use @parent (as with the old dict store).
+        """
+        if name is None:
+            if self._anonymous is None:
+                self._anonymous = self._allocate(None)
+            slot = self._anonymous
+        else:
+            slot = self.slot(name, create=True)
+        self._gen[slot] = self.generation
+        self._x[slot], self._y[slot] = point[0], point[1]
+        self._template[slot] = template_path
+        self._matches[slot] = list(matches) if matches is not None else None
+        return slot
+
+    def valid(self, slot: Optional[int]) -> bool:
+        return slot is not None and self._gen[slot] == self.generation
+
+    def point(self, slot: Optional[int]) -> Point:
+        if not self.valid(slot):
+            return None, None
+        return self._x[slot], self._y[slot]
+
+    def matches(self, slot: Optional[int]) -> Optional[List[Tuple[int, int]]]:
+        return self._matches[slot] if self.valid(slot) else None
+
+    def get(self, name: str) -> Optional[Dict[str, object]]:
+        """Result for name as a dict (x, y, template_path[, matches]), or None."""
+        slot = self._slots.get(name)
+        if not self.valid(slot):
+            return None
+        data = {"x": self._x[slot], "y": self._y[slot], "template_path": self._template[slot]}
+        if self._matches[slot] is not None:
+            data["matches"] = list(self._matches[slot])
+        return data
+
+    def __len__(self) -> int:
+        return sum(1 for gen in self._gen if gen == self.generation)
+
+    # ---------- 좌표 참조 ----------
+    def resolve(self, position: str) -> Point:
+        """Coordinates for "name.x,name.y" style positions (parts may be numbers)."""
+        reference = self._references.get(position)
+        if reference is None:
+            reference, cacheable = self._compile_reference(position)
+            if reference is None:
+                return None, None
+            if cacheable:
+                self._references[position] = reference
+        values = []
+        for slot, value in reference:
+            if slot is None:
+                values.append(value)
+                continue
+            if self._gen[slot] != self.generation:
+                return None, None
+            values.append(self._x[slot] if value == 0 else self._y[slot])
+        return values[0], values[1]
+
+    def _compile_reference(self, position: str) -> Tuple[Optional[Tuple[_Part, _Part]], bool]:
+        """(parsed reference, whether it may be cached). Only fixed slots are cached,
+        since an LRU slot can be reassigned to another name."""
+        parts = position.split(",")
+        if len(parts) != 2:
+            return None, False
+        compiled = []
+        cacheable = True
+        for axis, part in enumerate(parts):
+            part = part.strip()
+            if "." not in part:
+                try:
+                    compiled.append((None, int(part)))
+                except ValueError:
+                    return None, False
+                continue
+            name, coord = part.split(".", 1)
+            slot = self._slots.get(name)
+            if coord != ("x", "y")[axis] or slot is None:
+                return None, False
+            if name in self._dynamic:
+                cacheable = False
+            compiled.append((slot, axis))
+        return (compiled[0], compiled[1]), cacheable
@@ -0,0 +1,274 @@
+# core/metrics_exporter.py
+"""매크로별 누적 지표를 Prometheus 텍스트 형식으로 내보낸다 (선택 기능).
+
+켜지 않으면 레지스트리가 없고 (get_registry() 가 None), 실행기는 실행 시작 때
+한 번 확인한 뒤 아무것도 하지 않는다. 켜는 방법은 두 가지다.
+
+- "http": 127.0.0.1 의 작은 HTTP 서버가 GET /metrics 에 응답
+- "file": 주기적으로 .prom 파일을 atomic_write (node_exporter textfile collector 용)
+
+설정은 앱 상태(~/.clikey/app_state.json)의 "metrics_exporter" 키에 둔다. 예:
+    {"mode": "http", "port": 9464}
+    {"mode": "file", "path": "C:/metrics/clikey.prom", "interval": 15}
+"""
+from __future__ import annotations
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Tuple
+import threading
+
+# 이미지 확인/반복 시간 히스토그램 경계 (초)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+DEFAULT_PORT = 9464
+DEFAULT_INTERVAL = 15.0
+
+# MacroRunner.result 값 (exited 는 EXIT 블록으로 끝난 정상 종료)
+RUN_RESULTS = ("completed", "exited", "stopped", "failed")
+
+
+class Histogram:
+    """Cumulative-on-render histogram (one count per bucket, plus sum)."""
+
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+
+class MacroSeries:
+    """Counters of one macro name, updated by its runs."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.runs = {result: 0 for result in RUN_RESULTS}
+        self.iterations = 0
+        self.block_failures = 0
+        self.image_hits = 0
+        self.image_misses = 0
+        self.loop_seconds = Histogram()
+        self.image_seconds = Histogram()
+
+    def run_finished(self, result: str) -> None:
+        with self._lock:
+            self.runs[result] = self.runs.get(result, 0) + 1
+
+    def loop_done(self, seconds: float) -> None:
+        with self._lock:
+            self.iterations += 1
+            self.loop_seconds.observe(seconds)
+
+    def image_checked(self, seconds: float, found: bool) -> None:
+        with self._lock:
+            if found:
+                self.image_hits += 1
+            else:
+                self.image_misses += 1
+            self.image_seconds.observe(seconds)
+
+    def block_failed(self) -> None:
+        with self._lock:
+            self.block_failures += 1
+
+
+def _label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """Per-macro series and their Prometheus text rendering."""
+
+    def __init__(self):
+        self._series: Dict[str, MacroSeries] = {}
+        self._lock = threading.Lock()
+
+    def series(self, macro: str) -> MacroSeries:
+        with self._lock:
+            series = self._series.get(macro)
+            if series is None:
+                series = self._series[macro] = MacroSeries()
+            return series
+
+    def render(self) -> str:
+        with self._lock:
+            items = sorted(self._series.items())
+        # 매크로마다 잠금을 잡고 값만 복사한 뒤 문자열을 만든다
+        snapshots = []
+        for macro, series in items:
+            with series._lock:
+                snapshots.append((_label(macro), dict(series.runs), series.iterations, series.block_failures,
+                                  series.image_hits, series.image_misses,
+                                  _copy_histogram(series.loop_seconds), _copy_histogram(series.image_seconds)))
+
+        lines: List[str] = []
+
+        def header(name: str, kind: str, text: str) -> None:
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        header("clikey_runs_total", "counter", "Finished macro runs by result.")
+        for macro, runs, *_ in snapshots:
+            for result, count in runs.items():
+                lines.append(f'clikey_runs_total{{macro="{macro}",result="{result}"}} {count}')
+        header("clikey_iterations_total", "counter", "Completed repeat cycles.")
+        for macro, _, iterations, *_ in snapshots:
+            lines.append(f'clikey_iterations_total{{macro="{macro}"}} {iterations}')
+        header("clikey_block_failures_total", "counter", "Blocks that stopped the run or raised an error.")
+        for macro, _, _, failures, *_ in snapshots:
+            lines.append(f'clikey_block_failures_total{{macro="{macro}"}} {failures}')
+        header("clikey_image_checks_total", "counter", "Image searches by result.")
+        for macro, _, _, _, hits, misses, *_ in snapshots:
+            lines.append(f'clikey_image_checks_total{{macro="{macro}",result="hit"}} {hits}')
+            lines.append(f'clikey_image_checks_total{{macro="{macro}",result="miss"}} {misses}')
+        for index, name, text in ((6, "clikey_loop_seconds", "Duration of one repeat cycle."),
+                                  (7, "clikey_image_check_seconds", "Duration of one image search.")):
+            header(name, "histogram", text)
+            for snapshot in snapshots:
+                _render_histogram(lines, name, snapshot[0], snapshot[index])
+        return "\n".join(lines) + "\n"
+
+
+def _copy_histogram(histogram: Histogram) -> Tuple[List[int], float, int]:
+    return list(histogram.counts), histogram.total, histogram.count
+
+
+def _render_histogram(lines: List[str], name: str, macro: str, histogram: Tuple[List[int], float, int]) -> None:
+    counts, total, count = histogram
+    cumulative = 0
+    for bound, bucket in zip(LATENCY_BUCKETS, counts):
+        cumulative += bucket
+        lines.append(f'{name}_bucket{{macro="{macro}",le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{macro="{macro}",le="+Inf"}} {count}')
+    lines.append(f'{name}_sum{{macro="{macro}"}} {_number(total)}')
+    lines.append(f'{name}_count{{macro="{macro}"}} {count}')
+
+
+# ---------- 내보내기 ----------
+class HttpExporter:
+    """GET /metrics on a localhost-only HTTP server."""
+
+    def __init__(self, registry: MetricsRegistry, port: int = DEFAULT_PORT, host: str = "127.0.0.1"):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="clikey-metrics-http", daemon=True)
+        self._thread.start()
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self._server.server_address[:2]
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class TextFileExporter:
+    """Rewrites a Prometheus text file every interval seconds (and on close)."""
+
+    def __init__(self, registry: MetricsRegistry, path: str, interval: float = DEFAULT_INTERVAL):
+        self.registry = registry
+        self.path = path
+        self.interval = max(1.0, float(interval))
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="clikey-metrics-file", daemon=True)
+        self._thread.start()
+
+    def write(self) -> bool:
+        from core.persistence import atomic_write
+        try:
+            with atomic_write(self.path) as f:
+                f.write(self.registry.render())
+            return True
+        except OSError:
+            return False
+
+    def _loop(self) -> None:
+        self.write()
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def close(self) -> None:
+        self._stop.set()
+        self._thread.join(timeout=2.0)
+        self.write()
+
+
+_registry: Optional[MetricsRegistry] = None
+_exporter = None
+_lock = threading.Lock()
+
+
+def get_registry() -> Optional[MetricsRegistry]:
+    """The active registry, or None when exporting is disabled."""
+    return _registry
+
+
+def enable(mode: str = "http", port: int = DEFAULT_PORT, path: Optional[str] = None,
+           interval: float = DEFAULT_INTERVAL, host: str = "127.0.0.1"):
+    """Start exporting (replacing any active exporter). Returns the exporter.
+
+    Raises OSError if the port is taken or ValueError for an unknown mode.
+    Counters survive re-enabling.
+    """
+    global _registry, _exporter
+    with _lock:
+        registry = _registry or MetricsRegistry()
+        if mode == "http":
+            exporter = HttpExporter(registry, int(port), host)
+        elif mode == "file":
+            if not path:
+                raise ValueError("file 모드에는 path 가 필요합니다.")
+            exporter = TextFileExporter(registry, path, interval)
+        else:
+            raise ValueError(f"알 수 없는 모드: {mode}")
+        if _exporter is not None:
+            _exporter.close()
+        _registry, _exporter = registry, exporter
+        return exporter
+
+
+def disable() -> None:
+    global _registry, _exporter
+    with _lock:
+        if _exporter is not None:
+            _exporter.close()
+        _registry = _exporter = None
+
+
+def configure(config: Optional[Dict[str, Any]]) -> bool:
+    """Enable from an app-state dict ({"mode", "port", "path", "interval"}); False if off or failed."""
+    if not config or not config.get("mode"):
+        return False
+    try:
+        enable(config["mode"], port=config.get("port", DEFAULT_PORT), path=config.get("path"),
+               interval=config.get("interval", DEFAULT_INTERVAL))
+        return True
+    except (OSError, ValueError, TypeError):
+        return False
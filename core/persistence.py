@@ -1,53 +1,259 @@
 # core/persistence.py
 from __future__ import annotations
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterable, Iterator, List, Optional, TextIO
 import os, json
+import contextlib
+import tempfile
 
 from core.macro_block import MacroBlock
+from core.subroutines import SubroutineLibrary
 
 
-def export_data(macro_blocks: List[MacroBlock], settings: Dict[str, Any], hotkeys: Dict[str, Any]) -> Dict[str, Any]:
-    """Export data using MacroBlock format."""
+MACRO_FILE_VERSION = 1
+
+
+def _export_settings(settings: Dict[str, Any]) -> Dict[str, Any]:
     return {
-        "version": 1,
+        "repeat": int(settings.get("repeat", 1)),
+        "start_delay": float(settings.get("start_delay", 3)),
+        "step_delay": float(settings.get("step_delay", 0.001)),
+        "beep_on_finish": int(settings.get("beep_on_finish", False)),
+        "parallel_conditions": int(settings.get("parallel_conditions", False)),
+    }
+
+
+def _export_hotkeys(hotkeys: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "start": hotkeys.get("start"),
+        "stop": hotkeys.get("stop"),
+    }
+
+
+def export_data(macro_blocks: List[MacroBlock], settings: Dict[str, Any], hotkeys: Dict[str, Any],
+                subroutines: Optional[SubroutineLibrary] = None) -> Dict[str, Any]:
+    """Export data using MacroBlock format."""
+    data = {
+        "version": MACRO_FILE_VERSION,
         "macro_blocks": [block.to_dict() for block in macro_blocks],
-        "settings": {
-            "repeat": int(settings.get("repeat", 1)),
-            "start_delay": float(settings.get("start_delay", 3)),
-            "step_delay": float(settings.get("step_delay", 0.001)),
-            "beep_on_finish": int(settings.get("beep_on_finish", False)),
-        },
-        "hotkeys": {
-            "start": hotkeys.get("start"),
-            "stop": hotkeys.get("stop"),
-        },
     }
+    # 서브루틴이 없으면 키를 쓰지 않는다 (기존 파일과 동일한 형식)
+    if subroutines:
+        data["subroutines"] = subroutines.to_dict()
+    data["settings"] = _export_settings(settings)
+    data["hotkeys"] = _export_hotkeys(hotkeys)
+    return data
 
 
-# --- 앱 상태 저장/복원: 최근 파일 경로 등 ---
-def _app_state_path() -> str:
-    base = os.path.join(os.path.expanduser("~"), ".clikey")
-    os.makedirs(base, exist_ok=True)
-    return os.path.join(base, "app_state.json")
+# --- 스트리밍 저장/불러오기: 최상위 블록 단위로 직렬화/파싱 ---
+def _dumps_indented(value: Any, prefix: str) -> str:
+    text = json.dumps(value, ensure_ascii=False, indent=2)
+    return text.replace("\n", "\n" + prefix)
 
-def load_app_state() -> dict:
-    path = _app_state_path()
+
+def write_macro_file(fp: TextIO, macro_blocks: Iterable[MacroBlock], settings: Dict[str, Any], hotkeys: Dict[str, Any],
+                     subroutines: Optional[SubroutineLibrary] = None) -> None:
+    """Stream macro data to fp one top-level block at a time.
+
+    The output is the same document json.dump(export_data(...), indent=2,
+    ensure_ascii=False) would produce, but only one block's dict is alive at
+    any moment.
+    """
+    fp.write('{\n  "version": %d,\n  "macro_blocks": [' % MACRO_FILE_VERSION)
+    count = 0
+    for block in macro_blocks:
+        fp.write(",\n    " if count else "\n    ")
+        fp.write(_dumps_indented(block.to_dict(), "    "))
+        count += 1
+    fp.write("\n  ]" if count else "]")
+    if subroutines:
+        fp.write(',\n  "subroutines": {')
+        for i, (name, body) in enumerate(subroutines.items()):
+            fp.write(",\n    " if i else "\n    ")
+            fp.write(json.dumps(name, ensure_ascii=False) + ": ")
+            fp.write(_dumps_indented([block.to_dict() for block in body], "    "))
+        fp.write("\n  }")
+    fp.write(',\n  "settings": ' + _dumps_indented(_export_settings(settings), "  "))
+    fp.write(',\n  "hotkeys": ' + _dumps_indented(_export_hotkeys(hotkeys), "  "))
+    fp.write("\n}")
+
+
+@contextlib.contextmanager
+def atomic_write(file_path: str, mode: str = "w", encoding: Optional[str] = "utf-8"):
+    """Open a temp file next to file_path and rename it over file_path on success.
+
+    A crash or error mid-write leaves the original file untouched.
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, tmp_path = tempfile.mkstemp(prefix="." + os.path.basename(file_path) + ".", suffix=".tmp", dir=directory)
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return {}
+        with os.fdopen(fd, mode, encoding=None if "b" in mode else encoding) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def save_macro_file(file_path: str, macro_blocks: Iterable[MacroBlock], settings: Dict[str, Any], hotkeys: Dict[str, Any],
+                    subroutines: Optional[SubroutineLibrary] = None) -> None:
+    with atomic_write(file_path) as f:
+        write_macro_file(f, macro_blocks, settings, hotkeys, subroutines)
+
+
+class MacroFileReader:
+    """Incremental macro file reader.
+
+    Iterating yields top-level MacroBlocks as soon as each one is parsed, so
+    the UI can show the first rows before the whole file is read. The other
+    top-level keys (version, settings, hotkeys, ...) are collected in
+    ``header`` and are complete once iteration finishes.
+    """
+
+    def __init__(self, file_path: str, chunk_size: int = 64 * 1024):
+        self.file_path = file_path
+        self.chunk_size = chunk_size
+        self.header: Dict[str, Any] = {}
+        self.block_count = 0
+        self.finished = False
+        self._fp: Optional[TextIO] = None
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def __enter__(self) -> MacroFileReader:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+
+    @property
+    def settings(self) -> Dict[str, Any]:
+        return self.header.get("settings") or {}
+
+    @property
+    def hotkeys(self) -> Dict[str, Any]:
+        return self.header.get("hotkeys") or {}
+
+    @property
+    def subroutines(self) -> SubroutineLibrary:
+        return SubroutineLibrary.from_dict(self.header.get("subroutines"))
+
+    def __iter__(self) -> Iterator[MacroBlock]:
+        self._fp = open(self.file_path, "r", encoding="utf-8")
+        try:
+            yield from self._parse_document()
+        finally:
+            self.close()
+
+    # ---------- 버퍼 ----------
+    def _fill(self, min_size: int = 0) -> bool:
+        if self._eof:
+            return False
+        if self._pos:
+            self._buf = self._buf[self._pos:]
+            self._pos = 0
+        chunk = self._fp.read(max(self.chunk_size, min_size))
+        if not chunk:
+            self._eof = True
+            return False
+        self._buf += chunk
+        return True
+
+    def _next_char(self) -> str:
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in " \t\r\n":
+                self._pos += 1
+            if self._pos < len(self._buf):
+                ch = self._buf[self._pos]
+                self._pos += 1
+                return ch
+            if not self._fill():
+                raise ValueError("unexpected end of macro file")
+
+    def _peek_char(self) -> str:
+        ch = self._next_char()
+        self._pos -= 1
+        return ch
+
+    def _expect(self, expected: str) -> None:
+        ch = self._next_char()
+        if ch != expected:
+            raise ValueError(f"expected {expected!r} but found {ch!r}")
+
+    def _decode_value(self) -> Any:
+        self._peek_char()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                # 값이 청크 경계에 걸친 경우: 버퍼를 두 배씩 키워 다시 시도
+                if not self._fill(len(self._buf)):
+                    raise
+                continue
+            # 숫자처럼 끝이 모호한 값은 뒤에 문자가 더 올 수 있으므로 확인
+            if end == len(self._buf) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    # ---------- 문서 구조 ----------
+    def _parse_document(self) -> Iterator[MacroBlock]:
+        self._expect("{")
+        seen_blocks = False
+        if self._peek_char() == "}":
+            self._next_char()
+        else:
+            while True:
+                key = self._decode_value()
+                self._expect(":")
+                if key == "macro_blocks":
+                    seen_blocks = True
+                    yield from self._parse_blocks()
+                else:
+                    self.header[key] = self._decode_value()
+                ch = self._next_char()
+                if ch == "}":
+                    break
+                if ch != ",":
+                    raise ValueError(f"expected ',' or '}}' but found {ch!r}")
+        if not seen_blocks:
+            raise KeyError("macro_blocks")
+        self.finished = True
+
+    def _parse_blocks(self) -> Iterator[MacroBlock]:
+        self._expect("[")
+        if self._peek_char() == "]":
+            self._next_char()
+            return
+        while True:
+            yield MacroBlock.from_dict(self._decode_value())
+            self.block_count += 1
+            ch = self._next_char()
+            if ch == "]":
+                return
+            if ch != ",":
+                raise ValueError(f"expected ',' or ']' but found {ch!r}")
+
+
+# --- 앱 상태 저장/복원: core.app_state 의 전역 저장소를 사용하는 호환용 래퍼 ---
+def load_app_state() -> dict:
+    from core.app_state import get_app_state
+    return get_app_state().snapshot()
 
 def save_app_state(state: dict) -> None:
-    path = _app_state_path()
-    try:
-        # 기존 상태와 merge
-        existing = load_app_state()
-        existing.update(state or {})
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(existing, f, ensure_ascii=False, indent=2)
-    except Exception:
-        pass
+    from core.app_state import get_app_state
+    get_app_state().update(state or {})
 
 def load_macro_data(file_path: str) -> Dict[str, Any]:
     """Load macro data from file."""
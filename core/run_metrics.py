@@ -0,0 +1,129 @@
+# core/run_metrics.py
+"""실행 중 성능 지표 (반복 속도, 반복/이미지 확인 시간, 캡처 FPS, 캐시 적중률).
+
+실행기는 반복 한 번, 이미지 확인 한 번, 블록 실패가 있을 때만 값을 넣는다 (성공한
+블록마다 하는 일은 없다). 화면 쪽은 일정 간격으로 sample() 을 불러 직전 샘플 이후의
+속도와 최근 LATENCY_SAMPLES 개의 평균/95% 값을 받는다. 내보내기가 켜져 있으면
+(core.metrics_exporter) 같은 값을 매크로별 series 에도 넘긴다.
+"""
+from __future__ import annotations
+from collections import deque
+from typing import Dict, List, Optional
+import threading
+import time
+
+# 평균/95% 를 계산할 최근 측정 수
+LATENCY_SAMPLES = 256
+
+
+def _mean_p95_ms(samples: List[float]) -> tuple:
+    if not samples:
+        return 0.0, 0.0
+    samples.sort()
+    return sum(samples) / len(samples) * 1000, samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000
+
+
+def _image_stats() -> Optional[Dict[str, int]]:
+    # 이미지 엔진을 아직 쓰지 않았다면 import 하지 않음
+    import sys
+    module = sys.modules.get("core.image_matcher")
+    return module.ImageMatcher.stats() if module is not None else None
+
+
+class RunMetrics:
+    """Counters for one run, written by the worker and sampled by the UI."""
+
+    def __init__(self, samples: int = LATENCY_SAMPLES, series=None):
+        self.started_at = time.perf_counter()
+        self.loops = 0
+        self.image_checks = 0
+        self.image_hits = 0
+        self.block_failures = 0
+        # metrics_exporter.MacroSeries (내보내기가 꺼져 있으면 None)
+        self.series = series
+        self._loop_times: deque = deque(maxlen=samples)
+        self._image_times: deque = deque(maxlen=samples)
+        self._lock = threading.Lock()
+        self._image_base = _image_stats()
+        # 직전 sample() 의 (시각, 반복 수, 단계 수, 캡처 수)
+        self._last = (self.started_at, 0, 0, self._captures())
+
+    def _captures(self) -> int:
+        stats = _image_stats()
+        return stats["captures"] if stats else 0
+
+    # ---------- 실행기 쪽 ----------
+    def loop_done(self, seconds: float) -> None:
+        with self._lock:
+            self.loops += 1
+            self._loop_times.append(seconds)
+        if self.series is not None:
+            self.series.loop_done(seconds)
+
+    def image_checked(self, seconds: float, found: bool = False) -> None:
+        with self._lock:
+            self.image_checks += 1
+            self.image_hits += found
+            self._image_times.append(seconds)
+        if self.series is not None:
+            self.series.image_checked(seconds, found)
+
+    def block_failed(self) -> None:
+        self.block_failures += 1
+        if self.series is not None:
+            self.series.block_failed()
+
+    # ---------- 화면 쪽 ----------
+    def sample(self, steps: int = 0) -> Dict[str, float]:
+        """Rates since the previous sample and recent latencies (ms).
+
+        steps is the run's total executed block count (e.g. TraceBuffer.total).
+        """
+        now = time.perf_counter()
+        with self._lock:
+            loops = self.loops
+            loop_times = list(self._loop_times)
+            image_times = list(self._image_times)
+            image_checks = self.image_checks
+            image_hits = self.image_hits
+        stats = _image_stats()
+        if stats is not None and self._image_base is None:
+            # 실행 도중 이미지 엔진이 처음 로드됨: 그때까지는 0 이었음
+            self._image_base = {key: 0 for key in stats}
+        captures = stats["captures"] if stats else 0
+
+        last_time, last_loops, last_steps, last_captures = self._last
+        self._last = (now, loops, steps, captures)
+        elapsed = max(now - last_time, 1e-9)
+
+        loop_mean, loop_p95 = _mean_p95_ms(loop_times)
+        image_mean, image_p95 = _mean_p95_ms(image_times)
+        cache_rate = 0.0
+        if stats is not None:
+            hits = stats["cache_hits"] - self._image_base["cache_hits"]
+            misses = stats["cache_misses"] - self._image_base["cache_misses"]
+            if hits + misses:
+                cache_rate = hits / (hits + misses)
+        return {
+            "loops": loops,
+            "loops_per_sec": (loops - last_loops) / elapsed,
+            "steps_per_sec": (steps - last_steps) / elapsed,
+            "loop_mean_ms": loop_mean,
+            "loop_p95_ms": loop_p95,
+            "image_checks": image_checks,
+            "image_hit_rate": image_hits / image_checks if image_checks else 0.0,
+            "block_failures": self.block_failures,
+            "image_mean_ms": image_mean,
+            "image_p95_ms": image_p95,
+            "capture_fps": (captures - last_captures) / elapsed,
+            "template_cache_hit_rate": cache_rate,
+        }
+
+
+def format_metrics(sample: Dict[str, float]) -> str:
+    return (
+        f"반복 {sample['loops']}회 · {sample['loops_per_sec']:.1f}/s · 단계 {sample['steps_per_sec']:.0f}/s\n"
+        f"반복 시간 평균 {sample['loop_mean_ms']:.1f}ms · 95% {sample['loop_p95_ms']:.1f}ms\n"
+        f"이미지 확인 평균 {sample['image_mean_ms']:.1f}ms · 95% {sample['image_p95_ms']:.1f}ms\n"
+        f"캡처 {sample['capture_fps']:.1f}fps · 템플릿 캐시 {sample['template_cache_hit_rate'] * 100:.0f}%"
+    )
@@ -5,7 +5,8 @@ def default_settings():
         "repeat": 1,
         "start_delay": 1,
         "step_delay": 0.03,
-        "beep_on_finish": False
+        "beep_on_finish": False,
+        "parallel_conditions": False
     }
 
 
@@ -14,6 +15,5 @@ def default_hotkeys():
 
 
 class GlobalState:
+    # 편집 중인 매크로. 실행 상태(매치 결과, @parent 스택)는 core.execution_context.ExecutionContext 에 있음
     current_macro = None
-    image_match_results = {}
-    image_match_stack = []  # Stack to track parent-child relationships of image conditions
@@ -0,0 +1,137 @@
+# core/subroutines.py
+"""이름 붙인 서브루틴 (매크로 파일에 한 번만 저장되는 블록 목록).
+
+CALL 블록은 이름만 갖고, 본문은 SubroutineLibrary 에 있다. 본문 목록은 한 번
+정의되면 바꾸지 않고 (다시 정의하면 새 목록으로 교체) 모든 CALL 이 같은 목록을
+공유하므로, CALL 블록의 복사/붙여넣기는 블록 하나 복사로 끝난다.
+
+실행 전에 compile() 이 본문을 이름 -> 튜플 표로 한 번 만들고, 없는 이름을
+부르는 CALL 을 미리 찾아 둔다. 표는 라이브러리가 바뀔 때까지 재사용된다.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from core.macro_block import MacroBlock
+from core.event_types import EventType
+
+# 서브루틴 안에서 다시 서브루틴을 부를 수 있는 최대 깊이 (재귀 폭주 방지)
+MAX_CALL_DEPTH = 32
+
+
+def iter_call_names(blocks: Iterable[MacroBlock]) -> Iterator[str]:
+    """Names referenced by CALL blocks anywhere in the tree."""
+    stack = list(blocks)
+    while stack:
+        block = stack.pop()
+        if block.event_type == EventType.CALL and block.event_data:
+            yield block.event_data
+        if block.macro_blocks:
+            stack.extend(block.macro_blocks)
+
+
+@dataclass(frozen=True)
+class CompiledSubroutines:
+    """Name -> shared body tuple, plus the names CALL blocks use that are not defined."""
+    bodies: Dict[str, Tuple[MacroBlock, ...]]
+    missing: Tuple[str, ...] = ()
+
+    def get(self, name: Optional[str]) -> Optional[Tuple[MacroBlock, ...]]:
+        return self.bodies.get(name) if name else None
+
+
+class SubroutineLibrary:
+    """Named block lists stored once per macro file.
+
+    Bodies are replaced, never edited in place, so copy() only copies the
+    name table and undo snapshots stay cheap.
+    """
+
+    def __init__(self, bodies: Optional[Dict[str, List[MacroBlock]]] = None):
+        self._bodies: Dict[str, List[MacroBlock]] = dict(bodies or {})
+        self._version = 0
+        self._compiled: Optional[Tuple[int, CompiledSubroutines]] = None
+
+    # ---------- 조회 ----------
+    def __contains__(self, name: str) -> bool:
+        return name in self._bodies
+
+    def __len__(self) -> int:
+        return len(self._bodies)
+
+    def __bool__(self) -> bool:
+        return bool(self._bodies)
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def names(self) -> List[str]:
+        return list(self._bodies)
+
+    def get(self, name: str) -> Optional[List[MacroBlock]]:
+        return self._bodies.get(name)
+
+    def items(self) -> Iterator[Tuple[str, List[MacroBlock]]]:
+        return iter(self._bodies.items())
+
+    def all_blocks(self) -> List[MacroBlock]:
+        """Top-level blocks of every body (for template scans such as warmup)."""
+        return [block for body in self._bodies.values() for block in body]
+
+    def unique_name(self, base: str = "서브루틴") -> str:
+        if base not in self._bodies:
+            return base
+        n = 2
+        while f"{base} {n}" in self._bodies:
+            n += 1
+        return f"{base} {n}"
+
+    # ---------- 변경 ----------
+    def define(self, name: str, blocks: Iterable[MacroBlock]) -> None:
+        self._bodies[name] = list(blocks)
+        self._version += 1
+
+    def remove(self, name: str) -> bool:
+        if self._bodies.pop(name, None) is None:
+            return False
+        self._version += 1
+        return True
+
+    def copy(self) -> SubroutineLibrary:
+        return SubroutineLibrary(self._bodies)
+
+    def snapshot(self) -> SubroutineLibrary:
+        """Structural copy that keeps keys, for handing the bodies to another thread."""
+        return SubroutineLibrary({name: [block.snapshot() for block in body] for name, body in self._bodies.items()})
+
+    # ---------- 실행 준비 ----------
+    def compile(self, roots: Iterable[MacroBlock] = ()) -> CompiledSubroutines:
+        """Shared body table for a run; cached until the library changes.
+
+        ``missing`` lists names called from roots or from any body that are
+        not defined (only computed when roots are given or on a cache miss).
+        """
+        cached = self._compiled
+        if cached is None or cached[0] != self._version:
+            bodies = {name: tuple(body) for name, body in self._bodies.items()}
+            called = set(iter_call_names(block for body in bodies.values() for block in body))
+            cached = (self._version, CompiledSubroutines(bodies, tuple(sorted(called - bodies.keys()))))
+            self._compiled = cached
+        compiled = cached[1]
+        roots = list(roots)
+        if roots:
+            missing = set(compiled.missing) | (set(iter_call_names(roots)) - compiled.bodies.keys())
+            if missing != set(compiled.missing):
+                return CompiledSubroutines(compiled.bodies, tuple(sorted(missing)))
+        return compiled
+
+    # ---------- 직렬화 ----------
+    def to_dict(self) -> Dict[str, List[Dict[str, Any]]]:
+        return {name: [block.to_dict() for block in body] for name, body in self._bodies.items()}
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> SubroutineLibrary:
+        if not data:
+            return cls()
+        return cls({str(name): [MacroBlock.from_dict(block) for block in body or []] for name, body in data.items()})
@@ -0,0 +1,114 @@
+# core/template_store.py
+"""템플릿 이미지 참조 해석.
+
+이미지 조건의 action 은 일반 파일 경로이거나, 패키지(.ckp)에 묶인 이미지를
+가리키는 ``clikey-image:<sha256>/<원래 파일명>`` 참조이다. 참조는 열려 있는
+패키지의 메모리 맵에서 바로 읽으므로 임시 파일이 생기지 않는다.
+"""
+from __future__ import annotations
+from typing import Dict, Iterable, Optional, Union
+import hashlib
+import io
+import os
+import threading
+
+
+TEMPLATE_REF_PREFIX = "clikey-image:"
+
+BytesLike = Union[bytes, memoryview]
+
+_lock = threading.Lock()
+_providers: Dict[str, object] = {}  # digest hex -> package (template_bytes(digest) 제공)
+
+
+def make_ref(digest: str, name: str) -> str:
+    return f"{TEMPLATE_REF_PREFIX}{digest}/{name}"
+
+
+def parse_ref(template_path: str) -> Optional[str]:
+    """Return the sha256 hex digest of a package reference, or None for plain paths."""
+    if not isinstance(template_path, str) or not template_path.startswith(TEMPLATE_REF_PREFIX):
+        return None
+    return template_path[len(TEMPLATE_REF_PREFIX):].split("/", 1)[0]
+
+
+def content_digest(data: BytesLike) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def is_template_block(block) -> bool:
+    """Blocks whose action holds a template image path."""
+    return block.has_template()
+
+
+def register(package, digests: Iterable[str]) -> None:
+    with _lock:
+        for digest in digests:
+            _providers[digest] = package
+
+
+def release(package) -> None:
+    with _lock:
+        for digest in [d for d, p in _providers.items() if p is package]:
+            del _providers[digest]
+
+
+def exists(template_path: str) -> bool:
+    digest = parse_ref(template_path)
+    if digest is None:
+        return os.path.exists(template_path)
+    with _lock:
+        return digest in _providers
+
+
+def read_bytes(template_path: str) -> Optional[BytesLike]:
+    """Raw encoded image bytes; a zero-copy memoryview for package references."""
+    digest = parse_ref(template_path)
+    if digest is None:
+        try:
+            with open(template_path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+    with _lock:
+        package = _providers.get(digest)
+    return package.template_bytes(digest) if package is not None else None
+
+
+def open_template(template_path: str):
+    """Binary file object for PIL previews and the like."""
+    if parse_ref(template_path) is None:
+        return open(template_path, "rb")
+    data = read_bytes(template_path)
+    if data is None:
+        raise FileNotFoundError(template_path)
+    return io.BytesIO(data)
+
+
+def materialize_refs(blocks: Iterable, images_dir: str) -> int:
+    """Write package-referenced templates out as files and point blocks at them.
+
+    Used before saving to plain JSON, which cannot carry the image bundle.
+    Returns the number of blocks that were rewritten.
+    """
+    from core.macro_tree import flatten_blocks
+
+    count = 0
+    for block, _ in flatten_blocks(blocks):
+        if not is_template_block(block):
+            continue
+        digest = parse_ref(block.action)
+        if digest is None:
+            continue
+        data = read_bytes(block.action)
+        if data is None:
+            continue
+        name = block.action.split("/", 1)[1] if "/" in block.action else f"{digest[:16]}.png"
+        os.makedirs(images_dir, exist_ok=True)
+        path = os.path.join(images_dir, f"{digest[:16]}_{name}")
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(data)
+        block.action = path
+        count += 1
+    return count
@@ -0,0 +1,267 @@
+# core/trace.py
+"""실행 기록 (항상 켜진 고정 크기 링 버퍼).
+
+실행기는 블록 하나를 끝낼 때마다 32바이트 레코드 하나를 미리 잡아 둔 bytearray 에
+struct.pack_into 로 덮어쓴다 (단계당 1µs 미만). 버퍼가 차면 가장 오래된 기록부터
+덮어쓰므로 몇 시간짜리 실행도 메모리가 늘지 않는다.
+
+레코드: 블록 번호(u32), 시작/끝 perf_counter(f64), 결과(u8), 오류 코드(u8),
+이미지 점수(f32, 없으면 NaN), 예외 순번(u32). 블록 번호는 버퍼의 블록 표
+(키, 표시 문자열)의 인덱스이므로 덤프 파일만으로 어떤 블록인지 알 수 있다.
+
+덤프 파일 (.cktrace, 리틀 엔디언):
+    magic "CKTR", u16 version, u16 record size, u32 record count, u32 header length,
+    header JSON (blocks, errors, meta), records (오래된 것부터)
+
+보기: python -m core.trace <file.cktrace> [--errors] [--last N]
+"""
+from __future__ import annotations
+from collections import deque
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+import json
+import os
+import struct
+import sys
+import time
+
+RECORD = struct.Struct("<IddBBfIxx")  # 32 bytes
+_RECORD_SIZE = RECORD.size
+_FILE_HEADER = struct.Struct("<4sHHII")
+TRACE_MAGIC = b"CKTR"
+TRACE_VERSION = 1
+TRACE_EXTENSION = ".cktrace"
+
+DEFAULT_CAPACITY = 65536  # 2MB
+
+# 결과
+OUTCOME_OK = 0
+OUTCOME_STOPPED = 1  # 중지 요청으로 끝남
+OUTCOME_FAILED = 2  # 블록이 실행 중단을 반환 (정의 안 된 서브루틴, 입력 주입 실패 등)
+OUTCOME_ERROR = 3  # 예외
+OUTCOME_EXIT = 4  # 매크로 중지(EXIT) 블록으로 정상 종료 (그 블록과 감싸는 부모 블록)
+OUTCOME_LABELS = {OUTCOME_OK: "ok", OUTCOME_STOPPED: "stopped", OUTCOME_FAILED: "failed", OUTCOME_ERROR: "error",
+                  OUTCOME_EXIT: "exit"}
+
+# 예외 종류 -> 오류 코드 (목록에 없으면 ERROR_OTHER)
+ERROR_NONE = 0
+ERROR_OTHER = 255
+ERROR_CODES = {
+    "OSError": 1,
+    "ValueError": 2,
+    "TypeError": 3,
+    "KeyError": 4,
+    "IndexError": 5,
+    "AttributeError": 6,
+    "ZeroDivisionError": 7,
+    "RuntimeError": 8,
+    "MemoryError": 9,
+    "ExpressionError": 10,
+}
+ERROR_NAMES = {code: name for name, code in ERROR_CODES.items()}
+
+# 예외 메시지는 최근 것만 보관
+MAX_ERROR_MESSAGES = 64
+
+# 자동 덤프 보관 위치와 개수
+TRACE_DIR = os.path.join(os.path.expanduser("~"), ".clikey", "traces")
+MAX_TRACE_FILES = 20
+
+
+def error_code(error: BaseException) -> int:
+    for cls in type(error).__mro__:
+        code = ERROR_CODES.get(cls.__name__)
+        if code is not None:
+            return code
+    return ERROR_OTHER
+
+
+class TraceEntry(NamedTuple):
+    block: int
+    start: float
+    end: float
+    outcome: int
+    error: int
+    score: float
+    error_seq: int
+
+
+class TraceBuffer:
+    """Fixed-size binary ring of per-block execution records.
+
+    Written by one run's worker thread only (no locking); dump() may be
+    called from another thread and copies the buffer first.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = max(1, int(capacity))
+        self._buf = bytearray(self.capacity * RECORD.size)
+        self._pack = RECORD.pack_into
+        self._count = 0  # 지금까지 기록한 총 수 (덮어쓴 것 포함)
+        self._block_ids: Dict[str, int] = {}
+        self._blocks: List[Tuple[str, str]] = []
+        self._errors: deque = deque(maxlen=MAX_ERROR_MESSAGES)
+        self._error_seq = 0
+        self.created_at = time.time()
+        self.origin = time.perf_counter()
+
+    def __len__(self) -> int:
+        return min(self._count, self.capacity)
+
+    @property
+    def total(self) -> int:
+        return self._count
+
+    def block_id(self, block) -> int:
+        """Id of block in the block table, registered on first use."""
+        block_id = self._block_ids.get(block.key)
+        if block_id is None:
+            block_id = len(self._blocks)
+            self._block_ids[block.key] = block_id
+            self._blocks.append((block.key, block.get_display_text()))
+        return block_id
+
+    def record(self, block, start: float, end: float, outcome: int,
+               score: float = float("nan"), error: Optional[BaseException] = None) -> None:
+        block_id = self._block_ids.get(block.key)
+        if block_id is None:
+            block_id = self.block_id(block)
+        if error is None:
+            code = error_seq = 0
+        else:
+            code = error_code(error)
+            self._error_seq += 1
+            error_seq = self._error_seq
+            self._errors.append((error_seq, type(error).__name__, str(error)))
+        count = self._count
+        self._pack(self._buf, count % self.capacity * _RECORD_SIZE,
+                   block_id, start, end, outcome, code, score, error_seq)
+        self._count = count + 1
+
+    def clear(self) -> None:
+        self._count = 0
+        self._errors.clear()
+
+    # ---------- 덤프 ----------
+    def _ordered_bytes(self, buf: bytes, count: int) -> bytes:
+        if count <= self.capacity:
+            return buf[:count * RECORD.size]
+        split = (count % self.capacity) * RECORD.size
+        return buf[split:] + buf[:split]
+
+    def dump(self, path: str, reason: str = "", meta: Optional[Dict[str, Any]] = None) -> str:
+        count = self._count
+        data = self._ordered_bytes(bytes(self._buf), count)
+        header = json.dumps({
+            "blocks": list(self._blocks),
+            "errors": list(self._errors),
+            "meta": dict(meta or {}, reason=reason, created_at=self.created_at, origin=self.origin,
+                         total=count, capacity=self.capacity),
+        }, ensure_ascii=False).encode("utf-8")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        from core.persistence import atomic_write
+        with atomic_write(path, "wb") as f:
+            f.write(_FILE_HEADER.pack(TRACE_MAGIC, TRACE_VERSION, RECORD.size, len(data) // RECORD.size, len(header)))
+            f.write(header)
+            f.write(data)
+        return path
+
+    def dump_auto(self, name: str, reason: str, meta: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """Dump to TRACE_DIR (keeping the newest MAX_TRACE_FILES). Returns the path, or None on error."""
+        if not self._count:
+            return None
+        safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in name) or "macro"
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(TRACE_DIR, f"{safe}-{stamp}-{reason}{TRACE_EXTENSION}")
+        try:
+            self.dump(path, reason, meta)
+            _prune(TRACE_DIR, MAX_TRACE_FILES)
+        except OSError:
+            return None
+        return path
+
+
+def _prune(directory: str, keep: int) -> None:
+    try:
+        files = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(TRACE_EXTENSION)]
+    except OSError:
+        return
+    files.sort(key=os.path.getmtime, reverse=True)
+    for path in files[keep:]:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+# ---------- 읽기/보기 ----------
+def load_trace(path: str) -> Tuple[Dict[str, Any], List[TraceEntry]]:
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, version, record_size, count, header_len = _FILE_HEADER.unpack_from(data, 0)
+    if magic != TRACE_MAGIC:
+        raise ValueError("not a Clikey trace file")
+    if version > TRACE_VERSION or record_size != RECORD.size:
+        raise ValueError(f"unsupported trace version {version}")
+    pos = _FILE_HEADER.size
+    header = json.loads(data[pos:pos + header_len].decode("utf-8"))
+    pos += header_len
+    entries = [TraceEntry(*RECORD.unpack_from(data, pos + i * RECORD.size)) for i in range(count)]
+    return header, entries
+
+
+def format_entries(header: Dict[str, Any], entries: List[TraceEntry], errors_only: bool = False) -> Iterator[str]:
+    blocks = header.get("blocks", [])
+    errors = {seq: (name, message) for seq, name, message in header.get("errors", [])}
+    origin = header.get("meta", {}).get("origin", entries[0].start if entries else 0.0)
+    yield f"{'#':>7} {'start s':>10} {'ms':>9} {'result':<8} {'score':>6}  block"
+    for i, entry in enumerate(entries):
+        if errors_only and entry.outcome == OUTCOME_OK:
+            continue
+        label = blocks[entry.block][1] if entry.block < len(blocks) else f"block {entry.block}"
+        score = f"{entry.score:.3f}" if entry.score == entry.score else "-"
+        line = (f"{i:>7} {entry.start - origin:>10.3f} {(entry.end - entry.start) * 1000:>9.2f} "
+                f"{OUTCOME_LABELS.get(entry.outcome, entry.outcome):<8} {score:>6}  {label}")
+        if entry.error:
+            name, message = errors.get(entry.error_seq, (ERROR_NAMES.get(entry.error, f"code {entry.error}"), ""))
+            line += f"  [{name}: {message}]" if message else f"  [{name}]"
+        yield line
+
+
+def _main(argv: List[str]) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m core.trace", description="Clikey 실행 기록 보기")
+    parser.add_argument("path", nargs="?", help="덤프 파일 (생략하면 가장 최근 자동 덤프)")
+    parser.add_argument("--errors", action="store_true", help="실패/오류 단계만 표시")
+    parser.add_argument("--last", type=int, default=0, help="마지막 N개만 표시")
+    args = parser.parse_args(argv)
+
+    path = args.path
+    if path is None:
+        try:
+            candidates = [os.path.join(TRACE_DIR, n) for n in os.listdir(TRACE_DIR) if n.endswith(TRACE_EXTENSION)]
+        except OSError:
+            candidates = []
+        if not candidates:
+            print("no trace files in " + TRACE_DIR)
+            return 1
+        path = max(candidates, key=os.path.getmtime)
+
+    header, entries = load_trace(path)
+    meta = header.get("meta", {})
+    print(f"{path}")
+    print(f"reason={meta.get('reason', '')} steps={meta.get('total', len(entries))} kept={len(entries)} "
+          f"macro={meta.get('name', '')}")
+    lines = list(format_entries(header, entries, args.errors))
+    body = lines[1:]
+    if args.last and len(body) > args.last:
+        print(f"({len(body) - args.last} earlier entries not shown)")
+        body = body[-args.last:]
+    print(lines[0])
+    for line in body:
+        print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
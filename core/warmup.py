@@ -0,0 +1,80 @@
+# core/warmup.py
+"""첫 실행 지연 줄이기.
+
+창이 뜬 뒤 백그라운드 스레드에서 cv2/numpy 를 import 하고, 현재 매크로가
+참조하는 템플릿을 ImageMatcher 캐시에 디코딩해 두고, 더미 matchTemplate 을
+한 번 돌려 OpenCV 내부 초기화를 미리 끝낸다.
+"""
+from __future__ import annotations
+from typing import Callable, Iterable, List, Optional
+import threading
+import time
+
+from core.macro_block import MacroBlock
+from core.macro_tree import flatten_blocks
+from core import template_store
+
+WARMUP_PENDING = "pending"
+WARMUP_RUNNING = "running"
+WARMUP_READY = "ready"
+WARMUP_FAILED = "failed"
+
+
+def template_paths(macro_blocks: Iterable[MacroBlock]) -> List[str]:
+    """Distinct template paths referenced anywhere in the tree, in order."""
+    seen = {}
+    for block, _ in flatten_blocks(macro_blocks):
+        if template_store.is_template_block(block):
+            seen.setdefault(block.action, None)
+    return list(seen)
+
+
+class Warmup:
+    """Runs ImageMatcher.warmup on a daemon thread.
+
+    ``on_status(state, detail)`` is called from the worker thread; UI code
+    should marshal it (e.g. root.after). Calling start() again while a
+    warmup is running queues the new paths for one more pass.
+    """
+
+    def __init__(self, on_status: Optional[Callable[[str, str], None]] = None):
+        self.on_status = on_status
+        self.state = WARMUP_PENDING
+        self.error: Optional[Exception] = None
+        self._lock = threading.Lock()
+        self._queued: Optional[List[str]] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, paths: Iterable[str] = ()) -> None:
+        with self._lock:
+            self._queued = list(paths)
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="clikey-warmup", daemon=True)
+            self._thread.start()
+
+    def _report(self, state: str, detail: str = "") -> None:
+        self.state = state
+        if self.on_status is not None:
+            try:
+                self.on_status(state, detail)
+            except Exception:
+                pass
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                paths, self._queued = self._queued, None
+                if paths is None:
+                    self._thread = None
+                    return
+            self._report(WARMUP_RUNNING)
+            start = time.perf_counter()
+            try:
+                from core.macro_executor import _get_image_matcher
+                loaded = _get_image_matcher().warmup(paths)
+            except Exception as e:
+                self.error = e
+                self._report(WARMUP_FAILED, str(e))
+                continue
+            self._report(WARMUP_READY, f"템플릿 {loaded}개, {time.perf_counter() - start:.2f}s")
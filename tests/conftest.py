@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 저장소 루트를 import 경로에 추가 (core, ui 패키지)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,110 @@
+import os
+import threading
+
+import pytest
+
+from core import autosave
+from core.autosave import AutoSaver, SaveJob
+from core.persistence import atomic_write
+
+
+class FakeScheduler:
+    """Tk-style after/after_cancel; fire() runs the pending callbacks."""
+
+    def __init__(self):
+        self.pending = {}
+        self._next = 0
+
+    def after(self, delay_ms, callback):
+        self._next += 1
+        self.pending[self._next] = callback
+        return self._next
+
+    def after_cancel(self, timer):
+        self.pending.pop(timer, None)
+
+    def fire(self):
+        callbacks, self.pending = list(self.pending.values()), {}
+        for callback in callbacks:
+            callback()
+
+
+@pytest.fixture
+def written(monkeypatch):
+    """Jobs handed to write_job, in order; a job whose settings has "fail" raises."""
+    jobs = []
+
+    def write_job(job):
+        if job.settings.get("fail"):
+            raise OSError(28, "No space left on device")
+        jobs.append(job)
+
+    monkeypatch.setattr(autosave, "write_job", write_job)
+    return jobs
+
+
+def _job(path, **settings):
+    return SaveJob(path, [], settings, {})
+
+
+def test_atomic_write_failure_keeps_original(tmp_path):
+    path = tmp_path / "macro.json"
+    path.write_text("original", encoding="utf-8")
+    with pytest.raises(RuntimeError):
+        with atomic_write(str(path)) as f:
+            f.write("half of the new conte")
+            raise RuntimeError("disk gone")
+    assert path.read_text(encoding="utf-8") == "original"
+    assert os.listdir(tmp_path) == ["macro.json"]
+
+
+def test_touch_is_debounced(written):
+    scheduler = FakeScheduler()
+    snapshots = []
+    saver = AutoSaver(scheduler, lambda: snapshots.append(1) or _job("recovery.json"))
+    try:
+        for _ in range(3):
+            saver.touch()
+        assert len(scheduler.pending) == 1
+        scheduler.fire()
+        assert saver.flush(5)
+        assert len(snapshots) == 1 and [job.path for job in written] == ["recovery.json"]
+    finally:
+        saver.shutdown()
+
+
+def test_superseded_autosave_is_dropped_and_order_kept(written):
+    saver = AutoSaver(FakeScheduler(), lambda: None)
+    release = threading.Event()
+    try:
+        # 첫 작업의 on_done 에서 작업 스레드를 붙잡아 두고 큐를 채움
+        blocker = _job("macro.json")
+        blocker.on_done = lambda error: release.wait(5)
+        saver.submit(blocker)
+        saver.submit(_job("recovery.json", version=1))
+        saver.submit(_job("other.json"))
+        saver.submit(_job("recovery.json", version=2))
+        release.set()
+        assert saver.flush(5)
+    finally:
+        saver.shutdown()
+    assert [(job.path, job.settings.get("version")) for job in written] == [
+        ("macro.json", None), ("other.json", None), ("recovery.json", 2)]
+
+
+@pytest.mark.parametrize("fail", [False, True])
+def test_recovery_file_is_discarded_only_after_a_successful_save(written, tmp_path, fail):
+    recovery = tmp_path / "recovery.json"
+    recovery.write_text("{}", encoding="utf-8")
+    errors = []
+    saver = AutoSaver(FakeScheduler(), lambda: None)
+    try:
+        job = _job(str(tmp_path / "macro.json"), fail=fail)
+        job.discard_on_success = str(recovery)
+        job.on_done = errors.append
+        saver.submit(job)
+        assert saver.flush(5)
+    finally:
+        saver.shutdown()
+    assert recovery.exists() == fail
+    assert (errors[0] is not None) == fail
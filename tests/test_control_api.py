@@ -0,0 +1,102 @@
+import json
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from core.control_api import ControlServer, MacroController
+
+TOKEN = "test-token"
+
+
+@pytest.fixture
+def server(monkeypatch, tmp_path):
+    from core import trace
+    monkeypatch.setattr(trace, "TRACE_DIR", str(tmp_path / "traces"))
+    server = ControlServer(MacroController(), TOKEN, port=0)
+    yield server
+    server.close()
+    server.controller.close(wait=5)
+
+
+def _request(server, method, path, body=None, headers=None):
+    """(status, JSON reply) of one request; headers default to a valid token and JSON body."""
+    port = server.address[1]
+    merged = {"X-Clikey-Token": TOKEN, "Content-Type": "application/json"}
+    merged.update(headers or {})
+    data = None if body is None else (body if isinstance(body, bytes) else json.dumps(body).encode("utf-8"))
+    request = urllib.request.Request(f"http://127.0.0.1:{port}{path}", data=data, method=method,
+                                     headers={key: value for key, value in merged.items() if value is not None})
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as error:
+        return error.code, json.loads(error.read())
+
+
+def test_token_is_required():
+    with pytest.raises(ValueError):
+        ControlServer(MacroController(), "", port=0)
+
+
+@pytest.mark.parametrize("headers", [{"X-Clikey-Token": None}, {"X-Clikey-Token": "wrong"}])
+def test_missing_or_wrong_token_is_rejected(server, headers):
+    assert _request(server, "GET", "/status", headers=headers)[0] == 403
+
+
+def test_browser_requests_are_rejected(server):
+    assert _request(server, "GET", "/status", headers={"Origin": "http://127.0.0.1"})[0] == 403
+    assert _request(server, "GET", "/status", headers={"Host": "evil.example:9465"})[0] == 403
+    assert _request(server, "GET", "/status", headers={"Host": f"localhost:{server.address[1]}"})[0] == 200
+
+
+def test_post_body_must_be_json(server):
+    assert _request(server, "POST", "/stop", b'{"wait": 0}', {"Content-Type": "text/plain"})[0] == 415
+    assert _request(server, "POST", "/stop", headers={"Content-Type": None})[0] == 415
+
+
+def test_bad_wait_is_a_client_error(server):
+    status, reply = _request(server, "POST", "/stop", {"wait": "soon"})
+    assert status == 400 and "wait" in reply["error"]
+
+
+def test_load_start_status(server, tmp_path):
+    from core.macro_factory import MacroFactory
+    from core.persistence import save_macro_file
+
+    path = str(tmp_path / "farm.json")
+    save_macro_file(path, [MacroFactory.create_delay_block(0), MacroFactory.create_exit_block()], {}, {})
+
+    status, reply = _request(server, "POST", "/load", {"path": path})
+    assert status == 200 and reply == {"name": "farm", "blocks": 2, "subroutines": 0}
+    status, reply = _request(server, "POST", "/start", {"settings": {"repeat": 1, "start_delay": 0}})
+    assert status == 200 and reply["name"] == "farm"
+    deadline = time.monotonic() + 5
+    while True:
+        status, reply = _request(server, "GET", "/status")
+        if not reply["runs"][0]["running"] or time.monotonic() > deadline:
+            break
+        time.sleep(0.01)
+    assert status == 200 and reply["loaded"]["farm"]["blocks"] == 2
+    assert [run["result"] for run in reply["runs"]] == ["exited"]
+
+
+def test_reloading_a_package_keeps_one_use(server, tmp_path):
+    import os
+    from core import macro_package
+    from core.macro_factory import MacroFactory
+
+    sample = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sample.png")
+    path = str(tmp_path / "farm.ckp")
+    macro_package.save_macro_package(path, [MacroFactory.create_image_match_block(sample)], {}, {},
+                                     keep_open=False)
+    key = macro_package._norm(path)
+
+    for _ in range(2):
+        assert _request(server, "POST", "/load", {"path": path})[0] == 200
+    assert macro_package._package_users[key] == 1
+
+    server.controller.close()
+    assert key not in macro_package._package_users
+    assert key not in macro_package._open_packages
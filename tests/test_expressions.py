@@ -0,0 +1,81 @@
+import pytest
+
+from core.execution_context import ExecutionContext
+from core.expressions import ExpressionError, compile_expression, evaluate, is_valid_variable_name
+from core.macro_executor import MacroExecutor
+from core.macro_factory import MacroFactory
+from core.macro_runner import MacroRunner
+
+
+def _lookup(**variables):
+    return lambda name: variables.get(name, 0)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("1 + 2 * 3", 7),
+    ("7 // 2 + 7 % 2", 4),
+    ("-x + +x", 0),
+    ("1 < x <= 3", True),
+    ("x > 5 or not x", False),
+    ("'a' if x == 2 else 'b'", "a"),
+    ("'ab' + 'c'", "abc"),
+    ("max(x, 10) - abs(-1) + round(2.6)", 12),
+])
+def test_supported_syntax(text, expected):
+    assert evaluate(text, _lookup(x=2)) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "x.__class__",  # 속성
+    "__import__('os')",  # 허용되지 않은 함수 호출
+    "(lambda: 1)()",
+    "open('f')",
+    "min(x, key=abs)",  # 키워드 인자
+    "x ** 2",  # 거듭제곱
+    "x[0]",  # 첨자
+    "[1, 2]",
+    "x is 1",
+    "b'bytes'",
+    "",
+    "x = 1",
+    "1 + " * 200 + "1",
+])
+def test_rejected_syntax(text):
+    with pytest.raises(ExpressionError):
+        compile_expression(text)
+
+
+@pytest.mark.parametrize("text", ["'a' * 10", "3 * 'a'", "s * n"])
+def test_string_repetition_is_rejected(text):
+    with pytest.raises(TypeError):
+        evaluate(text, _lookup(s="a", n=1000000000))
+
+
+def test_unknown_names_are_zero_and_builtins_are_reserved():
+    context = ExecutionContext()
+    assert evaluate("missing + 1", context.lookup) == 1
+    context.loop_index = 3
+    assert evaluate("loop * 2", context.lookup) == 6
+    assert not is_valid_variable_name("loop")
+    assert not is_valid_variable_name("max")
+    assert not is_valid_variable_name("if")
+    assert is_valid_variable_name("count")
+
+
+def test_set_and_increment_blocks_use_the_context():
+    executor = MacroExecutor()
+    executor.context.loop_index = 4
+    blocks = [MacroFactory.create_set_variable_block("total", "loop * 10"),
+              MacroFactory.create_increment_block("total", 2.5),
+              MacroFactory.create_increment_block("fresh"),
+              MacroFactory.create_set_variable_block("label", "'n=' + 'x' if total > 40 else 'small'")]
+    assert executor.execute_macro_blocks(blocks)
+    assert executor.context.variables == {"total": 42.5, "fresh": 1, "label": "n=x"}
+
+
+def test_variables_start_empty_on_each_run():
+    runner = MacroRunner([MacroFactory.create_increment_block("runs")], {"start_delay": 0, "repeat": 1}, name="vars")
+    for _ in range(2):
+        assert runner.start()
+        assert runner.join(5)
+        assert runner.context.variables == {"runs": 1}
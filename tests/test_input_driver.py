@@ -0,0 +1,100 @@
+import ctypes
+
+import pytest
+
+from core.input_driver import (
+    InputEvent, RecordingDriver, SendInputDriver, KEY_DOWN, KEY_UP, MOUSE_DOWN, MOUSE_MOVE, MOUSE_UP, TEXT_CHAR,
+)
+from core.macro_executor import MacroExecutor
+from core.macro_factory import MacroFactory
+
+
+def _run(blocks, driver, step_delay=0.0):
+    executor = MacroExecutor(input_driver=driver)
+    executor.step_delay = step_delay
+    return executor.execute_macro_blocks(blocks)
+
+
+def _blocks():
+    return [MacroFactory.create_keyboard_block("a"),
+            MacroFactory.create_mouse_block("left", "click", 10, 20),
+            MacroFactory.create_type_text_block("hi\n")]
+
+
+def test_input_blocks_are_sent_as_one_batch():
+    driver = RecordingDriver()
+    assert _run(_blocks(), driver)
+    assert driver.batches == [[
+        InputEvent(KEY_DOWN, key="a"), InputEvent(KEY_UP, key="a"),
+        InputEvent(MOUSE_MOVE, x=10, y=20), InputEvent(MOUSE_DOWN), InputEvent(MOUSE_UP),
+        InputEvent(TEXT_CHAR, key="h"), InputEvent(TEXT_CHAR, key="i"),
+        InputEvent(KEY_DOWN, key="enter"), InputEvent(KEY_UP, key="enter"),
+    ]]
+
+
+def test_step_delay_sends_each_block_separately():
+    batched, separate = RecordingDriver(), RecordingDriver()
+    _run(_blocks(), batched)
+    _run(_blocks(), separate, step_delay=0.001)
+    assert len(separate.batches) == 3
+    assert separate.events == batched.events
+
+
+class FailingDriver(RecordingDriver):
+    def _send(self, events):
+        super()._send(events)
+        raise OSError(5, "SendInput was blocked")
+
+
+@pytest.mark.parametrize("step_delay", [0.0, 0.001])
+def test_keyboard_injection_failure_does_not_stop_the_run(step_delay):
+    blocks = [MacroFactory.create_keyboard_block("a"), MacroFactory.create_keyboard_block("b")]
+    assert _run(blocks, FailingDriver(), step_delay)
+
+
+@pytest.mark.parametrize("step_delay", [0.0, 0.001])
+def test_mouse_injection_failure_stops_the_run(step_delay):
+    blocks = [MacroFactory.create_mouse_block("left", "click", 1, 2), MacroFactory.create_delay_block(0),
+              MacroFactory.create_keyboard_block("a")]
+    driver = FailingDriver()
+    assert not _run(blocks, driver, step_delay)
+    assert InputEvent(KEY_DOWN, key="a") not in driver.events
+
+
+class FakeFunction:
+    """Stands in for a ctypes foreign function (accepts argtypes/restype)."""
+
+    def __init__(self, function):
+        self.function = function
+
+    def __call__(self, *args):
+        return self.function(*args)
+
+
+class FakeUser32:
+    """VkKeyScanW for a US layout subset; SendInput records (vk, flags)."""
+
+    LAYOUT = {"a": 0x0041, "1": 0x0031, "!": 0x0131, ":": 0x01BA}
+
+    def __init__(self):
+        self.sent = []
+        self.SendInput = FakeFunction(self._send_input)
+        self.VkKeyScanW = FakeFunction(lambda char: self.LAYOUT.get(char, -1))
+
+    def _send_input(self, count, array, size):
+        self.sent.extend((array[i].ki.wVk, array[i].ki.dwFlags) for i in range(count))
+        return count
+
+
+@pytest.fixture
+def send_input_driver(monkeypatch):
+    user32 = FakeUser32()
+    monkeypatch.setattr(ctypes, "WinDLL", lambda name, use_last_error=False: user32, raising=False)
+    return SendInputDriver(), user32
+
+
+def test_shifted_characters_hold_shift(send_input_driver):
+    driver, user32 = send_input_driver
+    driver.send([InputEvent(KEY_DOWN, key="!"), InputEvent(KEY_UP, key="!"),
+                 InputEvent(KEY_DOWN, key="1"), InputEvent(KEY_UP, key="1")])
+    assert user32.sent == [(0x10, 0), (0x31, 0), (0x31, 2), (0x10, 2), (0x31, 0), (0x31, 2)]
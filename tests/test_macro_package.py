@@ -0,0 +1,69 @@
+import os
+
+import pytest
+
+from core import macro_package, template_store
+from core.macro_factory import MacroFactory
+from core.macro_package import load_macro_package, release_macro_package, save_macro_package
+
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sample.png")
+
+
+@pytest.fixture
+def packages(tmp_path):
+    """Two saved packages with the sample template; every package is closed afterwards."""
+    paths = []
+    for name in ("a.ckp", "b.ckp"):
+        path = str(tmp_path / name)
+        save_macro_package(path, [MacroFactory.create_image_match_block(SAMPLE)], {}, {}, keep_open=False)
+        paths.append(path)
+    yield paths
+    with macro_package._packages_lock:
+        for path in list(macro_package._open_packages):
+            macro_package._package_users.pop(path, None)
+            macro_package._replace_open_package(path, None)
+
+
+def _is_open(path):
+    return macro_package._norm(path) in macro_package._open_packages
+
+
+def test_save_without_keep_open_leaves_nothing_mapped(packages):
+    assert not any(_is_open(path) for path in packages)
+
+
+def test_released_package_is_unmapped(packages):
+    a, b = packages
+    blocks, _ = load_macro_package(a)
+    assert _is_open(a) and template_store.exists(blocks[0].action)
+
+    load_macro_package(b)
+    release_macro_package(a)
+    assert not _is_open(a) and _is_open(b)
+    os.replace(b, a)  # 닫힌 파일은 바꿀 수 있음
+
+
+def test_package_stays_open_while_another_user_holds_it(packages):
+    a, _ = packages
+    load_macro_package(a)
+    load_macro_package(a)
+    release_macro_package(a)
+    assert _is_open(a)
+    release_macro_package(a)
+    assert not _is_open(a)
+
+
+def test_save_refuses_to_replace_a_package_with_live_views(packages):
+    a, _ = packages
+    blocks, _ = load_macro_package(a)
+    before = open(a, "rb").read()
+    view = template_store.read_bytes(blocks[0].action)
+    try:
+        with pytest.raises(BufferError):
+            save_macro_package(a, [], {}, {})
+        assert _is_open(a) and template_store.exists(blocks[0].action)
+        assert open(a, "rb").read() == before
+    finally:
+        view.release()
+    save_macro_package(a, [], {}, {})
+    assert load_macro_package(a)[0] == []
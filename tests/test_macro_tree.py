@@ -0,0 +1,38 @@
+from core.macro_factory import MacroFactory
+from core.macro_tree import MacroTree
+
+
+def _delays(count):
+    return [MacroFactory.create_delay_block(i) for i in range(count)]
+
+
+def test_index_in_parent_follows_edits():
+    blocks = _delays(5)
+    tree = MacroTree(blocks)
+    assert [tree.index_in_parent(block) for block in blocks] == [0, 1, 2, 3, 4]
+
+    tree.remove(blocks[1])
+    extra = MacroFactory.create_delay_block(9)
+    tree.insert(extra, None, 0)
+    assert [tree.index_in_parent(block) for block in tree.roots] == [0, 1, 2, 3, 4]
+    assert tree.roots == [extra, blocks[0], blocks[2], blocks[3], blocks[4]]
+
+    replacement = MacroFactory.create_delay_block(7)
+    tree.replace(blocks[3], replacement)
+    assert tree.index_in_parent(replacement) == 3
+
+
+def test_remove_many_skips_descendants_of_removed_blocks():
+    repeat = MacroFactory.create_repeat_block(2)
+    children = _delays(3)
+    top = _delays(4)
+    tree = MacroTree([top[0], repeat, top[1], top[2], top[3]])
+    for child in children:
+        tree.insert(child, repeat)
+
+    removed = tree.remove_many([top[1], repeat, children[0], top[3], MacroFactory.create_delay_block(0)])
+    assert removed == 3
+    assert tree.roots == [top[0], top[2]]
+    assert repeat.macro_blocks == children  # 떼어 낸 부분 트리는 그대로
+    assert len(tree) == 2 and children[1] not in tree
+    assert [tree.index_in_parent(block) for block in tree.roots] == [0, 1]
@@ -0,0 +1,39 @@
+from core.execution_context import ExecutionContext
+from core.match_store import MatchResultStore
+
+
+def test_reset_invalidates_results_from_the_previous_generation():
+    context = ExecutionContext()
+    context.matches.prepare(["button"])
+    slot = context.matches.store("button", (10, 20), "button.png", [(10, 20), (30, 40)])
+    dynamic = context.matches.store("dynamic", (1, 2))
+    assert context.matches.resolve("button.x,button.y") == (10, 20)
+    assert len(context.matches) == 2
+
+    context.reset()
+
+    assert context.matches.get("button") is None
+    assert context.matches.get("dynamic") is None
+    assert context.matches.point(slot) == (None, None)
+    assert context.matches.matches(slot) is None
+    assert not context.matches.valid(dynamic)
+    # 캐시된 좌표 참조도 이전 세대 값을 돌려주면 안 됨
+    assert context.matches.resolve("button.x,button.y") == (None, None)
+    assert context.matches.resolve("button.x,5") == (None, None)
+    assert len(context.matches) == 0
+
+    # 새 세대에서 다시 저장하면 같은 슬롯이 유효해짐
+    assert context.matches.store("button", (3, 4)) == slot
+    assert context.matches.resolve("button.x,button.y") == (3, 4)
+    assert context.matches.get("button") == {"x": 3, "y": 4, "template_path": None}
+
+
+def test_unnamed_result_is_only_reachable_by_slot():
+    store = MatchResultStore()
+    slot = store.store(None, (5, 6), "a.png")
+    assert store.point(slot) == (5, 6)
+    assert store.get(None) is None
+    # 이름 없는 조건끼리는 같은 슬롯을 덮어씀 (이전 dict 저장소와 같은 동작)
+    assert store.store(None, (7, 8)) == slot
+    assert store.point(slot) == (7, 8)
+    assert store.store("named", (1, 1)) != slot
@@ -0,0 +1,106 @@
+import urllib.error
+import urllib.request
+
+import pytest
+
+from core.metrics_exporter import HttpExporter, LATENCY_BUCKETS, MetricsRegistry
+
+
+def _samples(text):
+    """{(name, labels): value} from Prometheus text format, plus TYPE lines."""
+    samples, types = {}, {}
+    for line in text.splitlines():
+        if line.startswith("# TYPE "):
+            _, _, name, kind = line.split(" ")
+            types[name] = kind
+            continue
+        if not line or line.startswith("#"):
+            continue
+        metric, value = line.rsplit(" ", 1)
+        samples[metric] = float(value)
+    return samples, types
+
+
+@pytest.fixture
+def registry():
+    registry = MetricsRegistry()
+    series = registry.series("farm")
+    for seconds in (0.001, 0.02, 0.02, 0.3, 20.0):
+        series.image_checked(seconds, found=seconds < 1)
+    series.loop_done(0.5)
+    series.block_failed()
+    series.run_finished("completed")
+    series.run_finished("exited")
+    return registry
+
+
+def test_render_exposition_format(registry):
+    text = registry.render()
+    assert text.endswith("\n")
+    samples, types = _samples(text)
+
+    assert types["clikey_runs_total"] == "counter"
+    assert types["clikey_image_check_seconds"] == "histogram"
+    assert samples['clikey_runs_total{macro="farm",result="completed"}'] == 1
+    assert samples['clikey_runs_total{macro="farm",result="exited"}'] == 1
+    assert samples['clikey_runs_total{macro="farm",result="failed"}'] == 0
+    assert samples['clikey_iterations_total{macro="farm"}'] == 1
+    assert samples['clikey_block_failures_total{macro="farm"}'] == 1
+    assert samples['clikey_image_checks_total{macro="farm",result="hit"}'] == 4
+    assert samples['clikey_image_checks_total{macro="farm",result="miss"}'] == 1
+
+
+def test_histogram_buckets_are_cumulative(registry):
+    samples, _ = _samples(registry.render())
+    name = "clikey_image_check_seconds"
+    buckets = [samples[f'{name}_bucket{{macro="farm",le="{bound}"}}'] for bound in LATENCY_BUCKETS]
+    assert buckets == sorted(buckets)
+    assert samples[f'{name}_bucket{{macro="farm",le="0.005"}}'] == 1
+    assert samples[f'{name}_bucket{{macro="farm",le="0.025"}}'] == 3
+    assert samples[f'{name}_bucket{{macro="farm",le="10.0"}}'] == 4
+    assert samples[f'{name}_bucket{{macro="farm",le="+Inf"}}'] == 5
+    assert samples[f'{name}_count{{macro="farm"}}'] == 5
+    assert samples[f'{name}_sum{{macro="farm"}}'] == pytest.approx(20.341)
+
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    registry.series('a "b"\\c').run_finished("completed")
+    assert 'macro="a \\"b\\"\\\\c"' in registry.render()
+
+
+def test_http_exporter_serves_metrics_on_localhost(registry):
+    exporter = HttpExporter(registry, port=0)
+    try:
+        host, port = exporter.address
+        assert host == "127.0.0.1"
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert response.read().decode("utf-8") == registry.render()
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/other", timeout=5)
+        assert error.value.code == 404
+    finally:
+        exporter.close()
+
+
+def test_exit_block_counts_as_normal_termination(monkeypatch, tmp_path):
+    from core import metrics_exporter, trace
+    from core.macro_factory import MacroFactory
+    from core.macro_runner import MacroRunner, RESULT_EXITED
+
+    registry = MetricsRegistry()
+    monkeypatch.setattr(metrics_exporter, "_registry", registry)
+    monkeypatch.setattr(trace, "TRACE_DIR", str(tmp_path))
+
+    runner = MacroRunner([MacroFactory.create_delay_block(0), MacroFactory.create_exit_block()],
+                         {"start_delay": 0, "repeat": 0, "step_delay": 0}, name="farm")
+    assert runner.start()
+    assert runner.join(5)
+
+    assert runner.result == RESULT_EXITED and runner.completed
+    samples, _ = _samples(registry.render())
+    assert samples['clikey_runs_total{macro="farm",result="exited"}'] == 1
+    assert samples['clikey_runs_total{macro="farm",result="failed"}'] == 0
+    assert samples['clikey_block_failures_total{macro="farm"}'] == 0
+    assert list(tmp_path.iterdir()) == []
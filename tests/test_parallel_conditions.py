@@ -0,0 +1,88 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from core import macro_executor
+from core.macro_executor import MacroExecutor
+from core.macro_factory import MacroFactory
+
+# 가짜 화면: 템플릿 -> 찾은 위치, 좌표 -> 색
+SCREEN_MATCHES = {"b.png": (10, 20), "c.png": (30, 40)}
+SCREEN_COLORS = {(1, 1): (0, 0, 255), (2, 2): (0, 255, 0)}
+
+
+class _FakeFrame:
+    def rgb_at(self, x, y):
+        return SCREEN_COLORS.get((x, y))
+
+
+class _FakeMatcher:
+    frames = 0
+    threads = set()
+
+    @staticmethod
+    def capture_frame():
+        _FakeMatcher.frames += 1
+        return _FakeFrame()
+
+    @staticmethod
+    def find_image_on_screen(template_path, threshold=None, search_region=None, scales=None, mode=None, frame=None):
+        _FakeMatcher.threads.add(threading.current_thread().name)
+        return SCREEN_MATCHES.get(template_path)
+
+    @staticmethod
+    def template_size(template_path, scales=None):
+        return 4, 4
+
+    @staticmethod
+    def last_score():
+        return float("nan")
+
+
+@pytest.fixture
+def fake_screen(monkeypatch):
+    _FakeMatcher.frames = 0
+    _FakeMatcher.threads = set()
+    monkeypatch.setattr(macro_executor, "_image_matcher", _FakeMatcher)
+    monkeypatch.setattr(macro_executor, "_screen", SimpleNamespace(grab_rgb_at=lambda x, y: SCREEN_COLORS.get((x, y))))
+    return _FakeMatcher
+
+
+def _branch(condition, label):
+    condition.macro_blocks = [MacroFactory.create_increment_block(label)]
+    return condition
+
+
+def _sibling_group():
+    return [
+        _branch(MacroFactory.create_image_match_block("a.png"), "a"),
+        _branch(MacroFactory.create_rgb_match_block(1, 1, "255,0,0"), "red"),
+        _branch(MacroFactory.create_image_match_block("a.png", inverted=True), "not_a"),
+        _branch(MacroFactory.create_image_match_block("b.png"), "b"),
+        _branch(MacroFactory.create_image_match_block("c.png", inverted=True), "not_c"),
+        _branch(MacroFactory.create_rgb_match_block(2, 2, "0,255,0"), "green"),
+        _branch(MacroFactory.create_image_match_block("c.png"), "c"),
+    ]
+
+
+def _run(parallel):
+    executor = MacroExecutor()
+    executor.parallel_conditions = parallel
+    assert executor.execute_macro_blocks(_sibling_group())
+    return executor.context
+
+
+def test_parallel_and_sequential_evaluation_pick_the_same_branches(fake_screen):
+    sequential = _run(parallel=False)
+    assert fake_screen.frames == 0
+
+    parallel = _run(parallel=True)
+    # 병렬 경로로 판정했는지 확인 (한 화면을 캡처해 풀 스레드에서 탐색)
+    assert fake_screen.frames >= 1
+    assert any(name.startswith("clikey-condition") for name in fake_screen.threads)
+
+    assert sequential.variables == {"not_a": 1, "b": 1, "green": 1, "c": 1}
+    assert parallel.variables == sequential.variables
+    for name in ("b", "c"):
+        assert parallel.matches.get(name) == sequential.matches.get(name)
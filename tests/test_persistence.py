@@ -0,0 +1,79 @@
+import io
+import json
+
+import pytest
+
+from core.macro_factory import MacroFactory
+from core.persistence import MacroFileReader, export_data, save_macro_file, write_macro_file
+from core.subroutines import SubroutineLibrary
+
+SETTINGS = {"repeat": 3, "start_delay": 0.5, "step_delay": 0.001, "parallel_conditions": True}
+HOTKEYS = {"start": "f8", "stop": "f9"}
+
+
+def _blocks():
+    repeat = MacroFactory.create_repeat_block(12, description="반복 \"따옴표\"")
+    repeat.macro_blocks = [MacroFactory.create_delay_block(0.123456789), MacroFactory.create_keyboard_block("a")]
+    return [MacroFactory.create_type_text_block("긴 텍스트 " * 40 + "\n끝"),
+            repeat,
+            MacroFactory.create_mouse_block("left", "click", 1234567, -89)]
+
+
+def _library(*names):
+    library = SubroutineLibrary()
+    for name in names:
+        library.define(name, [] if name == "empty" else [MacroFactory.create_delay_block(1.5)])
+    return library
+
+
+CASES = {
+    "blocks": (_blocks, lambda: None),
+    "no blocks": (list, lambda: None),
+    "subroutines": (_blocks, lambda: _library("준비", "empty")),
+    "empty library": (_blocks, SubroutineLibrary),
+    "only empty subroutine": (list, lambda: _library("empty")),
+}
+
+
+@pytest.mark.parametrize("case", CASES)
+def test_writer_matches_json_dump(case):
+    make_blocks, make_library = CASES[case]
+    blocks, library = make_blocks(), make_library()
+    out = io.StringIO()
+    write_macro_file(out, blocks, SETTINGS, HOTKEYS, library)
+    assert out.getvalue() == json.dumps(export_data(blocks, SETTINGS, HOTKEYS, library), indent=2, ensure_ascii=False)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 64 * 1024])
+@pytest.mark.parametrize("case", CASES)
+def test_reader_round_trip_across_chunk_boundaries(tmp_path, case, chunk_size):
+    make_blocks, make_library = CASES[case]
+    blocks, library = make_blocks(), make_library()
+    path = str(tmp_path / "macro.json")
+    save_macro_file(path, blocks, SETTINGS, HOTKEYS, library)
+    expected = export_data(blocks, SETTINGS, HOTKEYS, library)
+
+    with MacroFileReader(path, chunk_size=chunk_size) as reader:
+        loaded = list(reader)
+        assert reader.finished and reader.block_count == len(blocks)
+    assert [block.to_dict() for block in loaded] == expected["macro_blocks"]
+    assert reader.header == {key: value for key, value in expected.items() if key != "macro_blocks"}
+    assert reader.subroutines.to_dict() == (library.to_dict() if library else {})
+
+
+def test_reader_accepts_compact_json_and_any_key_order(tmp_path):
+    path = tmp_path / "macro.json"
+    block = MacroFactory.create_delay_block(2).to_dict()
+    path.write_text(json.dumps({"settings": {"repeat": 10}, "macro_blocks": [block, block], "version": 1},
+                               separators=(",", ":")), encoding="utf-8")
+    with MacroFileReader(str(path), chunk_size=2) as reader:
+        assert len(list(reader)) == 2
+    assert reader.settings == {"repeat": 10} and reader.header["version"] == 1
+
+
+def test_reader_rejects_truncated_file(tmp_path):
+    path = tmp_path / "macro.json"
+    save_macro_file(str(path), _blocks(), SETTINGS, HOTKEYS)
+    path.write_text(path.read_text(encoding="utf-8")[:-40], encoding="utf-8")
+    with pytest.raises(ValueError):
+        list(MacroFileReader(str(path), chunk_size=5))
@@ -0,0 +1,59 @@
+import pytest
+
+from core import macro_package
+from core.control_api import load_macro
+from core.macro_executor import MacroExecutor
+from core.macro_factory import MacroFactory
+from core.macro_package import save_macro_package
+from core.persistence import save_macro_file
+from core.subroutines import MAX_CALL_DEPTH, SubroutineLibrary
+
+
+def _run(blocks, library):
+    executor = MacroExecutor()
+    executor.subroutines = library.compile(blocks)
+    return executor.execute_macro_blocks(blocks), executor
+
+
+@pytest.mark.parametrize("extension", [".json", ".ckp"])
+def test_subroutine_survives_save_and_load(tmp_path, extension):
+    library = SubroutineLibrary()
+    library.define("count", [MacroFactory.create_increment_block("n", 2)])
+    blocks = [MacroFactory.create_call_block("count"), MacroFactory.create_call_block("count")]
+    path = str(tmp_path / ("macro" + extension))
+    if extension == ".ckp":
+        save_macro_package(path, blocks, {}, {}, keep_open=False, subroutines=library)
+    else:
+        save_macro_file(path, blocks, {}, {}, library)
+
+    try:
+        loaded = load_macro(path)
+    finally:
+        if extension == ".ckp":
+            macro_package.release_macro_package(path)
+    assert loaded.subroutines.names() == ["count"]
+    assert [block.event_data for block in loaded.blocks] == ["count", "count"]
+    assert loaded.subroutines.get("count")[0].to_dict() == library.get("count")[0].to_dict()
+
+    ok, executor = _run(loaded.blocks, loaded.subroutines)
+    assert ok and executor.context.variables["n"] == 4
+
+
+def test_recursion_stops_at_the_depth_cap():
+    library = SubroutineLibrary()
+    library.define("again", [MacroFactory.create_increment_block("depth"), MacroFactory.create_call_block("again")])
+
+    ok, executor = _run([MacroFactory.create_call_block("again")], library)
+    assert not ok
+    assert executor.context.variables["depth"] == MAX_CALL_DEPTH
+    assert executor._call_depth == 0
+
+
+def test_undefined_subroutine_is_refused():
+    blocks = [MacroFactory.create_call_block("missing"), MacroFactory.create_increment_block("after")]
+    library = SubroutineLibrary()
+    assert library.compile(blocks).missing == ("missing",)
+
+    ok, executor = _run(blocks, library)
+    assert not ok
+    assert "after" not in executor.context.variables
@@ -5,8 +5,13 @@ import os
 import tempfile
 from PIL import Image, ImageTk
 
-from core.macro_block import MacroBlock
+from core.macro_block import (
+    MacroBlock, DEFAULT_MATCH_SCALES, MATCH_MODE_COLOR, MATCH_MODE_LABELS, DEFAULT_MATCH_THRESHOLD
+)
+from core.event_types import ConditionType
 from core.macro_factory import MacroFactory
+from core.expressions import compile_expression, ExpressionError
+from core import template_store
 from ui.magnifier import Magnifier
 from utils.dialog_utils import fit_window_height
 
@@ -350,6 +355,43 @@ class ConditionDialog:
         region_label = tk.Label(frm, text="탐색 범위: 전체 화면", fg="gray", wraplength=350, justify="left")
         region_label.pack(pady=(0, 5))
 
+        # 다중 배율 탐색 (DPI/배율이 다른 화면 대응)
+        editing_block = None
+        if self.is_edit_mode_callback and self.is_edit_mode_callback() and self.edit_block:
+            editing_block = self.edit_block
+        edit_scales = editing_block.match_scales if editing_block else None
+        multi_scale_var = tk.BooleanVar(value=bool(edit_scales and len(edit_scales) > 1))
+        scales_var = tk.StringVar(value=", ".join(f"{v:g}" for v in (edit_scales or DEFAULT_MATCH_SCALES)))
+        scale_frame = tk.Frame(frm)
+        scale_frame.pack(pady=(0, 5))
+        tk.Checkbutton(scale_frame, text="여러 배율로 찾기", variable=multi_scale_var).pack(side=tk.LEFT)
+        tk.Entry(scale_frame, textvariable=scales_var, width=26).pack(side=tk.LEFT, padx=(4, 0))
+
+        # 매칭 방식 (아이콘처럼 색이 의미 없는 이미지는 흑백/윤곽선이 더 빠름)
+        match_mode_var = tk.StringVar(value=(editing_block.match_mode if editing_block else None) or MATCH_MODE_COLOR)
+        match_mode_frame = tk.Frame(frm)
+        match_mode_frame.pack(pady=(0, 5))
+        tk.Label(match_mode_frame, text="매칭 방식:").pack(side=tk.LEFT)
+        for value, label in MATCH_MODE_LABELS.items():
+            tk.Radiobutton(match_mode_frame, text=label, variable=match_mode_var, value=value).pack(side=tk.LEFT, padx=4)
+
+        # 일치 기준 / 모두 찾기
+        threshold_var = tk.StringVar(value=f"{editing_block.threshold if editing_block else DEFAULT_MATCH_THRESHOLD:g}")
+        find_all_var = tk.BooleanVar(value=bool(editing_block and editing_block.find_all))
+        adaptive_var = tk.BooleanVar(value=bool(editing_block and editing_block.adaptive_region))
+        foreach_var = tk.BooleanVar(value=bool(editing_block and editing_block.condition_type == ConditionType.FOREACH_MATCH))
+        threshold_frame = tk.Frame(frm)
+        threshold_frame.pack(pady=(0, 5))
+        tk.Label(threshold_frame, text="일치 기준 (0~1):").pack(side=tk.LEFT)
+        tk.Entry(threshold_frame, textvariable=threshold_var, width=6).pack(side=tk.LEFT, padx=(4, 12))
+        tk.Checkbutton(threshold_frame, text="모두 찾기", variable=find_all_var).pack(side=tk.LEFT)
+        # 찾은 위치마다 자식 블록을 한 번씩 실행 (있음/없음, 모두 찾기는 무시)
+        option_frame = tk.Frame(frm)
+        option_frame.pack(pady=(0, 5))
+        tk.Checkbutton(option_frame, text="찾은 위치마다 반복", variable=foreach_var).pack(side=tk.LEFT)
+        # 최근 찾은 위치 주변부터 탐색 (모두 찾기/반복에는 적용되지 않음)
+        tk.Checkbutton(option_frame, text="최근 위치 주변 먼저 찾기", variable=adaptive_var).pack(side=tk.LEFT, padx=(12, 0))
+
         # 이미지 미리보기 프레임
         preview_frame = tk.Frame(frm)
         preview_frame.pack(pady=5)
@@ -407,8 +449,8 @@ class ConditionDialog:
                 from PIL import ImageGrab
                 img = ImageGrab.grabclipboard()
                 if img:
-                    # 프로그램 폴더의 images 디렉토리에 저장
-                    import time
+                    # 프로그램 폴더의 images 디렉토리에 내용 해시 이름으로 저장 (같은 이미지는 한 번만)
+                    import io
                     # 프로그램 루트 디렉토리 찾기
                     current_dir = os.path.dirname(os.path.abspath(__file__))
                     program_root = os.path.dirname(os.path.dirname(current_dir))  # ui/dialogs에서 두 단계 위로
@@ -417,9 +459,14 @@ class ConditionDialog:
                     # images 디렉토리가 없으면 생성
                     os.makedirs(images_dir, exist_ok=True)
 
-                    timestamp = int(time.time() * 1000000)  # 마이크로초까지 포함
-                    temp_path = os.path.join(images_dir, f"clipboard_image_{timestamp}.png")
-                    img.save(temp_path)
+                    buffer = io.BytesIO()
+                    img.save(buffer, format="PNG")
+                    data = buffer.getvalue()
+                    digest = template_store.content_digest(data)
+                    temp_path = os.path.join(images_dir, f"clipboard_image_{digest[:16]}.png")
+                    if not os.path.exists(temp_path):
+                        with open(temp_path, "wb") as f:
+                            f.write(data)
 
                     selected_file["path"] = temp_path
                     file_label.config(text="선택된 파일: 클립보드에서 붙여넣기", fg="green")
@@ -487,8 +534,40 @@ class ConditionDialog:
                 messagebox.showwarning("안내", "먼저 이미지 파일을 선택하거나 클립보드에서 붙여넣으세요.")
                 return
 
+            match_scales = None
+            if multi_scale_var.get():
+                try:
+                    match_scales = sorted({float(v) for v in scales_var.get().replace(" ", "").split(",") if v})
+                except ValueError:
+                    match_scales = []
+                if not match_scales or any(v <= 0 for v in match_scales):
+                    messagebox.showwarning("안내", "배율은 0보다 큰 숫자를 쉼표로 구분해 입력하세요. (예: 0.8, 1.0, 1.25)")
+                    return
+                if match_scales == [1.0]:
+                    match_scales = None
+
             try:
-                macro_block = MacroFactory.create_image_match_block(selected_file["path"], inverted=inverted_var.get())
+                threshold = float(threshold_var.get())
+            except ValueError:
+                threshold = -1.0
+            if not 0 < threshold <= 1:
+                messagebox.showwarning("안내", "일치 기준은 0보다 크고 1 이하인 숫자로 입력하세요. (기본 0.9)")
+                return
+
+            match_mode = None if match_mode_var.get() == MATCH_MODE_COLOR else match_mode_var.get()
+            match_threshold = None if threshold == DEFAULT_MATCH_THRESHOLD else threshold
+            try:
+                if foreach_var.get():
+                    macro_block = MacroFactory.create_foreach_match_block(
+                        selected_file["path"], match_scales=match_scales,
+                        match_mode=match_mode, match_threshold=match_threshold
+                    )
+                else:
+                    macro_block = MacroFactory.create_image_match_block(
+                        selected_file["path"], inverted=inverted_var.get(), match_scales=match_scales,
+                        match_mode=match_mode, match_threshold=match_threshold,
+                        find_all=find_all_var.get(), adaptive_region=adaptive_var.get()
+                    )
 
                 # 탐색 범위가 설정된 경우 position에 저장
                 if selected_region["x1"] is not None:
@@ -545,7 +624,7 @@ class ConditionDialog:
         """이미지 미리보기 표시"""
         try:
             # PIL로 이미지 로드 및 리사이즈
-            with Image.open(image_path) as img:
+            with template_store.open_template(image_path) as f, Image.open(f) as img:
                 # 비율 유지하면서 300x200 안에 맞추기
                 img.thumbnail((300, 200), Image.Resampling.LANCZOS)
 
@@ -560,6 +639,69 @@ class ConditionDialog:
             preview_label.configure(image="", text=f"미리보기 오류:\n{str(e)}")
             preview_label.image = None
 
+    def add_expression_condition(self):
+        """Condition on run variables (no screen capture)."""
+        editing_block = self.edit_block if self.is_edit_mode_callback and self.is_edit_mode_callback() else None
+
+        win = tk.Toplevel(self.parent)
+        win.title("조건식")
+        win.geometry("380x190+560+320")
+        win.resizable(False, False)
+        win.transient(self.parent)
+        win.lift()
+        win.grab_set()
+        win.focus_force()
+
+        frm = tk.Frame(win, padx=10, pady=10)
+        frm.pack(fill="both", expand=True)
+
+        tk.Label(frm, text="조건식이 참이면 하위 블록을 실행합니다.\n예: loop % 50 == 0, count >= 3 and elapsed < 60",
+                 justify="center").pack(pady=4)
+        expr_var = tk.StringVar(value=editing_block.action if editing_block is not None and editing_block.action else "")
+        entry = tk.Entry(frm, textvariable=expr_var, width=40)
+        entry.pack(pady=4)
+        win.after(100, entry.focus_force)
+
+        def apply_block():
+            expression = expr_var.get().strip()
+            try:
+                compile_expression(expression)
+            except ExpressionError as e:
+                messagebox.showwarning("오류", str(e), parent=win)
+                return
+            macro_block = MacroFactory.create_expression_condition_block(expression)
+
+            # 편집 모드인 경우 기존 블록의 macro_blocks 보존
+            if editing_block is not None:
+                macro_block.macro_blocks = editing_block.macro_blocks.copy()
+                macro_block.key = editing_block.key  # 기존 키도 유지
+
+            self.insert_callback(macro_block)
+            try:
+                win.grab_release()
+            except Exception:
+                pass
+            win.destroy()
+
+        def on_close():
+            try:
+                win.grab_release()
+            except Exception:
+                pass
+            if self.cancel_edit_callback:
+                self.cancel_edit_callback()
+            win.destroy()
+
+        button_text = "수정 (Enter)" if editing_block is not None else "추가 (Enter)"
+        tk.Button(frm, text=button_text, command=apply_block, width=20).pack(pady=4)
+        tk.Button(frm, text="취소 (Esc)", command=on_close, width=20).pack(pady=4)
+
+        win.bind("<Return>", lambda e: apply_block())
+        win.bind("<Escape>", lambda e: on_close())
+        win.protocol("WM_DELETE_WINDOW", on_close)
+
+        fit_window_height(win, 380, 190)
+
     def add_coordinate_condition(self):
         """Add coordinate condition dialog."""
         win = tk.Toplevel(self.parent)
@@ -1,9 +1,11 @@
 import tkinter as tk
-from tkinter import messagebox
-from typing import Callable
+from tkinter import messagebox, filedialog
+from typing import Callable, List
 
 from core.macro_block import MacroBlock
 from core.macro_factory import MacroFactory
+from core.event_types import EventType
+from core.expressions import compile_expression, is_valid_variable_name, ExpressionError, BUILTIN_NAMES
 from utils.dialog_utils import fit_window_height
 
 # Lazy imports for faster startup
@@ -405,6 +407,380 @@ class InputDialogs:
 
         fit_window_height(delay_window, w, h)
 
+    def add_type_text(self, edit_block: MacroBlock = None):
+        text_window = tk.Toplevel(self.parent)
+        text_window.title("텍스트 입력")
+        w = int(360 * self.window_scale)
+        h = int(260 * self.window_scale)
+        text_window.geometry(f"{w}x{h}+520+300")
+        text_window.resizable(False, False)
+
+        text_window.transient(self.parent)
+        text_window.lift()
+        text_window.attributes("-topmost", True)
+        text_window.grab_set()
+        text_window.focus_force()
+        text_window.after(200, lambda: text_window.attributes("-topmost", False))
+
+        frame = tk.Frame(text_window, bd=2, relief=tk.RAISED)
+        frame.pack(expand=True, fill="both", padx=6, pady=6)
+
+        tk.Label(frame, text="입력할 텍스트를 입력하세요:", font=("맑은 고딕", 12)).pack(pady=(10, 5))
+
+        text_box = tk.Text(frame, font=("맑은 고딕", 10), width=36, height=5, wrap="word")
+        text_box.pack(padx=8, pady=5)
+        if edit_block is not None and edit_block.event_data:
+            text_box.insert("1.0", edit_block.event_data)
+
+        # 글자 사이 간격 (0 이면 한 번에 입력)
+        interval_frame = tk.Frame(frame)
+        interval_frame.pack(pady=5)
+        tk.Label(interval_frame, text="글자 사이 간격 (초, 0=한 번에)").pack(side=tk.LEFT)
+        interval_var = tk.StringVar(value=f"{float(edit_block.action):g}" if edit_block is not None and edit_block.action else "0")
+        tk.Entry(interval_frame, textvariable=interval_var, width=6).pack(side=tk.LEFT, padx=(6, 0))
+
+        text_window.after(100, text_box.focus_force)
+
+        def add_text_item():
+            text = text_box.get("1.0", "end-1c")
+            if not text:
+                messagebox.showwarning("오류", "입력할 텍스트가 없습니다.")
+                return
+            try:
+                interval = float(interval_var.get() or 0)
+            except ValueError:
+                messagebox.showwarning("오류", "간격에 유효한 숫자를 입력하세요.")
+                return
+            if interval < 0 or interval > 10:
+                messagebox.showwarning("오류", "간격은 0~10 사이의 값을 입력하세요.")
+                return
+            macro_block = MacroFactory.create_type_text_block(text, interval)
+            self.insert_callback(macro_block)
+            text_window.destroy()
+
+        def on_close():
+            try:
+                text_window.grab_release()
+            except:
+                pass
+            # 편집 모드 취소
+            if self.cancel_edit_callback:
+                self.cancel_edit_callback()
+            text_window.destroy()
+
+        btn_frame = tk.Frame(frame)
+        btn_frame.pack(pady=10)
+
+        button_text = "수정" if self.is_edit_mode_callback and self.is_edit_mode_callback() else "추가"
+
+        tk.Button(btn_frame, text=button_text, command=add_text_item).pack(side=tk.LEFT, padx=5)
+        tk.Button(btn_frame, text="취소", command=on_close).pack(side=tk.LEFT, padx=5)
+
+        # Enter 는 줄바꿈으로 쓰므로 Ctrl+Enter 로 추가
+        text_window.bind("<Control-Return>", lambda e: add_text_item())
+        text_window.bind("<Escape>", lambda e: on_close())
+        text_window.protocol("WM_DELETE_WINDOW", on_close)
+
+        fit_window_height(text_window, w, h)
+
+    def add_repeat(self, edit_block: MacroBlock = None):
+        repeat_window = tk.Toplevel(self.parent)
+        repeat_window.title("반복")
+        w = int(340 * self.window_scale)
+        h = int(250 * self.window_scale)
+        repeat_window.geometry(f"{w}x{h}+530+310")
+        repeat_window.resizable(False, False)
+
+        repeat_window.transient(self.parent)
+        repeat_window.lift()
+        repeat_window.attributes("-topmost", True)
+        repeat_window.grab_set()
+        repeat_window.focus_force()
+        repeat_window.after(200, lambda: repeat_window.attributes("-topmost", False))
+
+        frame = tk.Frame(repeat_window, bd=2, relief=tk.RAISED)
+        frame.pack(expand=True, fill="both", padx=6, pady=6)
+
+        tk.Label(frame, text="반복 횟수를 입력하세요:", font=("맑은 고딕", 12)).pack(pady=(10, 5))
+        count_var = tk.StringVar(value=str(edit_block.repeat_count or 0) if edit_block is not None else "2")
+        entry = tk.Entry(frame, textvariable=count_var, font=("맑은 고딕", 10), width=15)
+        entry.pack(pady=5)
+
+        # 선택: 이미지가 보일 때까지/사라질 때까지 (이 경우 횟수 0 = 제한 없음)
+        template = {"path": edit_block.action if edit_block is not None and edit_block.has_template() else None}
+        until_gone_var = tk.BooleanVar(value=bool(edit_block is not None and edit_block.inverted))
+        template_label = tk.Label(frame, fg="gray", wraplength=300, justify="left")
+        template_label.pack(pady=(5, 0))
+
+        def update_template_label():
+            if template["path"]:
+                template_label.config(text=f"종료 이미지: {template['path']}", fg="black")
+            else:
+                template_label.config(text="종료 이미지: 없음 (횟수만큼 반복)", fg="gray")
+
+        def choose_template():
+            path = filedialog.askopenfilename(
+                parent=repeat_window,
+                filetypes=[("이미지 파일", "*.png *.jpg *.jpeg *.bmp"), ("모든 파일", "*.*")]
+            )
+            if path:
+                template["path"] = path
+                update_template_label()
+
+        def clear_template():
+            template["path"] = None
+            update_template_label()
+
+        update_template_label()
+        until_frame = tk.Frame(frame)
+        until_frame.pack(pady=4)
+        tk.Button(until_frame, text="이미지 선택", command=choose_template).pack(side=tk.LEFT, padx=4)
+        tk.Button(until_frame, text="지우기", command=clear_template).pack(side=tk.LEFT, padx=4)
+        tk.Radiobutton(until_frame, text="보일 때까지", variable=until_gone_var, value=False).pack(side=tk.LEFT)
+        tk.Radiobutton(until_frame, text="사라질 때까지", variable=until_gone_var, value=True).pack(side=tk.LEFT)
+
+        repeat_window.after(100, lambda: (entry.focus_force(), entry.select_range(0, tk.END)))
+
+        def add_repeat_item():
+            try:
+                count = int(count_var.get())
+            except ValueError:
+                messagebox.showwarning("오류", "유효한 횟수를 입력하세요.")
+                return
+            if count < 0 or (count == 0 and not template["path"]):
+                messagebox.showwarning("오류", "반복 횟수는 1 이상이어야 합니다. (종료 이미지가 있으면 0=제한 없음)")
+                return
+            macro_block = MacroFactory.create_repeat_block(count, template["path"], until_gone_var.get())
+            # 편집 모드인 경우 기존 블록의 자식과 키 유지
+            if edit_block is not None:
+                macro_block.macro_blocks = edit_block.macro_blocks.copy()
+                macro_block.key = edit_block.key
+                if edit_block.has_template() and template["path"] == edit_block.action:
+                    macro_block.match_threshold = edit_block.match_threshold
+            self.insert_callback(macro_block)
+            repeat_window.destroy()
+
+        def on_close():
+            try:
+                repeat_window.grab_release()
+            except:
+                pass
+            # 편집 모드 취소
+            if self.cancel_edit_callback:
+                self.cancel_edit_callback()
+            repeat_window.destroy()
+
+        btn_frame = tk.Frame(frame)
+        btn_frame.pack(pady=10)
+
+        button_text = "수정" if self.is_edit_mode_callback and self.is_edit_mode_callback() else "추가"
+
+        tk.Button(btn_frame, text=button_text, command=add_repeat_item).pack(side=tk.LEFT, padx=5)
+        tk.Button(btn_frame, text="취소", command=on_close).pack(side=tk.LEFT, padx=5)
+
+        repeat_window.bind("<Return>", lambda e: add_repeat_item())
+        repeat_window.bind("<Escape>", lambda e: on_close())
+        repeat_window.protocol("WM_DELETE_WINDOW", on_close)
+
+        fit_window_height(repeat_window, w, h)
+
+    def add_variable(self, edit_block: MacroBlock = None):
+        """SET (value expression) or INCREMENT block for a run variable."""
+        var_window = tk.Toplevel(self.parent)
+        var_window.title("변수")
+        w = int(340 * self.window_scale)
+        h = int(230 * self.window_scale)
+        var_window.geometry(f"{w}x{h}+530+310")
+        var_window.resizable(False, False)
+
+        var_window.transient(self.parent)
+        var_window.lift()
+        var_window.attributes("-topmost", True)
+        var_window.grab_set()
+        var_window.focus_force()
+        var_window.after(200, lambda: var_window.attributes("-topmost", False))
+
+        frame = tk.Frame(var_window, bd=2, relief=tk.RAISED)
+        frame.pack(expand=True, fill="both", padx=6, pady=6)
+
+        is_increment = edit_block is not None and edit_block.event_type == EventType.INCREMENT
+        name_frame = tk.Frame(frame)
+        name_frame.pack(pady=(10, 5))
+        tk.Label(name_frame, text="변수 이름", font=("맑은 고딕", 10)).pack(side=tk.LEFT)
+        name_var = tk.StringVar(value=edit_block.event_data if edit_block is not None else "count")
+        name_entry = tk.Entry(name_frame, textvariable=name_var, font=("맑은 고딕", 10), width=16)
+        name_entry.pack(side=tk.LEFT, padx=(6, 0))
+
+        mode_var = tk.StringVar(value="increment" if is_increment else "set")
+        mode_frame = tk.Frame(frame)
+        mode_frame.pack(pady=4)
+        tk.Radiobutton(mode_frame, text="값 지정 (=)", variable=mode_var, value="set").pack(side=tk.LEFT)
+        tk.Radiobutton(mode_frame, text="더하기 (+=)", variable=mode_var, value="increment").pack(side=tk.LEFT)
+
+        default_value = "1" if is_increment or edit_block is None else "0"
+        value_var = tk.StringVar(value=str(edit_block.action) if edit_block is not None and edit_block.action is not None else default_value)
+        tk.Entry(frame, textvariable=value_var, font=("맑은 고딕", 10), width=28).pack(pady=4)
+        tk.Label(frame, text="값에는 식을 쓸 수 있습니다 (예: count * 2, elapsed)", fg="gray").pack()
+
+        var_window.after(100, lambda: (name_entry.focus_force(), name_entry.select_range(0, tk.END)))
+
+        def add_variable_item():
+            name = name_var.get().strip()
+            if not is_valid_variable_name(name):
+                messagebox.showwarning("오류", f"사용할 수 없는 변수 이름입니다. ({', '.join(BUILTIN_NAMES)} 는 예약됨)")
+                return
+            value = value_var.get().strip()
+            if mode_var.get() == "increment":
+                try:
+                    amount = float(value or 1)
+                except ValueError:
+                    messagebox.showwarning("오류", "더할 값은 숫자여야 합니다.")
+                    return
+                macro_block = MacroFactory.create_increment_block(name, int(amount) if amount.is_integer() else amount)
+            else:
+                try:
+                    compile_expression(value)
+                except ExpressionError as e:
+                    messagebox.showwarning("오류", str(e))
+                    return
+                macro_block = MacroFactory.create_set_variable_block(name, value)
+            if edit_block is not None:
+                macro_block.key = edit_block.key
+            self.insert_callback(macro_block)
+            var_window.destroy()
+
+        def on_close():
+            try:
+                var_window.grab_release()
+            except:
+                pass
+            # 편집 모드 취소
+            if self.cancel_edit_callback:
+                self.cancel_edit_callback()
+            var_window.destroy()
+
+        btn_frame = tk.Frame(frame)
+        btn_frame.pack(pady=10)
+
+        button_text = "수정" if self.is_edit_mode_callback and self.is_edit_mode_callback() else "추가"
+
+        tk.Button(btn_frame, text=button_text, command=add_variable_item).pack(side=tk.LEFT, padx=5)
+        tk.Button(btn_frame, text="취소", command=on_close).pack(side=tk.LEFT, padx=5)
+
+        var_window.bind("<Return>", lambda e: add_variable_item())
+        var_window.bind("<Escape>", lambda e: on_close())
+        var_window.protocol("WM_DELETE_WINDOW", on_close)
+
+        fit_window_height(var_window, w, h)
+
+    def add_call(self, names: List[str], edit_block: MacroBlock = None):
+        """Pick a subroutine for a CALL block."""
+        call_window = tk.Toplevel(self.parent)
+        call_window.title("서브루틴 호출")
+        w = int(300 * self.window_scale)
+        h = int(280 * self.window_scale)
+        call_window.geometry(f"{w}x{h}+540+320")
+        call_window.resizable(False, False)
+
+        call_window.transient(self.parent)
+        call_window.lift()
+        call_window.attributes("-topmost", True)
+        call_window.grab_set()
+        call_window.focus_force()
+        call_window.after(200, lambda: call_window.attributes("-topmost", False))
+
+        frame = tk.Frame(call_window, bd=2, relief=tk.RAISED)
+        frame.pack(expand=True, fill="both", padx=6, pady=6)
+
+        tk.Label(frame, text="호출할 서브루틴을 고르세요:", font=("맑은 고딕", 12)).pack(pady=(10, 5))
+        listbox = tk.Listbox(frame, font=("맑은 고딕", 10), height=8, exportselection=False)
+        listbox.pack(fill="both", expand=True, padx=8, pady=5)
+        for name in names:
+            listbox.insert(tk.END, name)
+        current = edit_block.event_data if edit_block is not None else None
+        selected = names.index(current) if current in names else 0
+        if names:
+            listbox.selection_set(selected)
+            listbox.see(selected)
+
+        def add_call_item():
+            sel = listbox.curselection()
+            if not sel:
+                messagebox.showwarning("오류", "서브루틴을 선택하세요.")
+                return
+            macro_block = MacroFactory.create_call_block(names[sel[0]])
+            # 편집 모드인 경우 기존 블록 키 유지
+            if edit_block is not None:
+                macro_block.key = edit_block.key
+            self.insert_callback(macro_block)
+            call_window.destroy()
+
+        def on_close():
+            try:
+                call_window.grab_release()
+            except:
+                pass
+            # 편집 모드 취소
+            if self.cancel_edit_callback:
+                self.cancel_edit_callback()
+            call_window.destroy()
+
+        btn_frame = tk.Frame(frame)
+        btn_frame.pack(pady=10)
+
+        button_text = "수정" if self.is_edit_mode_callback and self.is_edit_mode_callback() else "추가"
+
+        tk.Button(btn_frame, text=button_text, command=add_call_item).pack(side=tk.LEFT, padx=5)
+        tk.Button(btn_frame, text="취소", command=on_close).pack(side=tk.LEFT, padx=5)
+
+        listbox.bind("<Double-Button-1>", lambda e: add_call_item())
+        call_window.bind("<Return>", lambda e: add_call_item())
+        call_window.bind("<Escape>", lambda e: on_close())
+        call_window.protocol("WM_DELETE_WINDOW", on_close)
+
+        fit_window_height(call_window, w, h)
+
+    def ask_subroutine_name(self, initial: str, on_ok: Callable[[str], None]):
+        """Ask for a subroutine name; on_ok(name) runs after the window closes."""
+        name_window = tk.Toplevel(self.parent)
+        name_window.title("서브루틴 만들기")
+        w = int(300 * self.window_scale)
+        h = int(150 * self.window_scale)
+        name_window.geometry(f"{w}x{h}+540+320")
+        name_window.resizable(False, False)
+
+        name_window.transient(self.parent)
+        name_window.lift()
+        name_window.grab_set()
+        name_window.focus_force()
+
+        frame = tk.Frame(name_window, bd=2, relief=tk.RAISED)
+        frame.pack(expand=True, fill="both", padx=6, pady=6)
+
+        tk.Label(frame, text="서브루틴 이름을 입력하세요:", font=("맑은 고딕", 12)).pack(pady=10)
+        name_var = tk.StringVar(value=initial)
+        entry = tk.Entry(frame, textvariable=name_var, font=("맑은 고딕", 10), width=24)
+        entry.pack(pady=5)
+        name_window.after(100, lambda: (entry.focus_force(), entry.select_range(0, tk.END)))
+
+        def confirm():
+            name = name_var.get().strip()
+            if not name:
+                messagebox.showwarning("오류", "이름을 입력하세요.")
+                return
+            name_window.destroy()
+            on_ok(name)
+
+        btn_frame = tk.Frame(frame)
+        btn_frame.pack(pady=10)
+        tk.Button(btn_frame, text="확인", command=confirm).pack(side=tk.LEFT, padx=5)
+        tk.Button(btn_frame, text="취소", command=name_window.destroy).pack(side=tk.LEFT, padx=5)
+
+        name_window.bind("<Return>", lambda e: confirm())
+        name_window.bind("<Escape>", lambda e: name_window.destroy())
+
+        fit_window_height(name_window, w, h)
+
     def show_reference_selector(self, parent_win, btn_var, action_var, add_callback, cancel_callback):
         """상위좌표 선택 다이얼로그를 표시"""
         from core.state import GlobalState
@@ -441,7 +817,7 @@ class InputDialogs:
 
         for block in condition_blocks:
             if hasattr(block, 'condition_type') and block.condition_type:
-                condition_type_name = "이미지매치" if block.condition_type.value == "image_match" else "RGB매치"
+                condition_type_name = "이미지매치" if block.is_image_condition() else "RGB매치"
                 display_text = f"{block.event_data} ({condition_type_name})"
             else:
                 display_text = f"{block.event_data} (조건)"
@@ -525,7 +901,7 @@ class InputDialogs:
 
         for block in condition_blocks:
             if hasattr(block, 'condition_type') and block.condition_type:
-                condition_type_name = "이미지매치" if block.condition_type.value == "image_match" else "RGB매치"
+                condition_type_name = "이미지매치" if block.is_image_condition() else "RGB매치"
                 display_text = f"{block.event_data} ({condition_type_name})"
             else:
                 display_text = f"{block.event_data} (조건)"
@@ -74,6 +74,15 @@ class SettingsDialog:
             variable=self.beep_var
         ).grid(row=row, column=0, columnspan=3, sticky="w", pady=(10, 0))
 
+        row += 1
+        # 연속된 이미지/RGB 조건을 한 화면에서 동시에 판정 (순서와 결과는 그대로)
+        self.parallel_var = tk.BooleanVar(value=bool(self.settings.get("parallel_conditions", False)))
+        tk.Checkbutton(
+            frm,
+            text="연속된 조건 동시에 검사",
+            variable=self.parallel_var
+        ).grid(row=row, column=0, columnspan=3, sticky="w", pady=(4, 0))
+
         row += 1
         tk.Label(frm, text="시작 단축키").grid(row=row, column=0, sticky="w", pady=(10, 0))
         start_entry = tk.Entry(frm, width=12, textvariable=self.start_key_var, state="readonly", readonlybackground="white")
@@ -108,6 +117,7 @@ class SettingsDialog:
         self.settings["start_delay"] = delay
         self.settings["step_delay"] = step_delay
         self.settings["beep_on_finish"] = bool(self.beep_var.get())
+        self.settings["parallel_conditions"] = bool(self.parallel_var.get())
         
         if self.mark_dirty_callback:
             self.mark_dirty_callback(True)
@@ -1,9 +1,12 @@
 import tkinter as tk
-from typing import Callable, Optional, Tuple, List
+from typing import Callable, Dict, Optional, Tuple, List
 
 from ui.styled_list import StyledList
 from utils.inline_edit import InlineEditHandler
 from core.macro_block import MacroBlock
+from core.macro_tree import MacroTree, flatten_blocks, collapse_repeats
+from core.macro_factory import MacroFactory
+from core.subroutines import SubroutineLibrary
 from core.event_types import EventType
 from core.state import GlobalState
 
@@ -14,6 +17,7 @@ class MacroListManager:
         self.mark_dirty_callback = mark_dirty_callback
         self.save_callback = save_callback
         self.edit_mode_callback = None  # 편집 모드 콜백
+        self.before_edit_callback: Optional[Callable[[], None]] = None  # 구조 변경 직전 콜백 (불러오기 마무리 등)
 
         self.container_frame = tk.Frame(parent)
 
@@ -37,15 +41,18 @@ class MacroListManager:
             mark_dirty_callback, 
             self._update_block_description
         )
-        self.macro_blocks: List[MacroBlock] = []
+        self.tree = MacroTree()
+        # 파일에 한 번만 저장되는 서브루틴 본문 (CALL 블록이 이름으로 참조)
+        self.subroutines = SubroutineLibrary()
         self.selected_indices: List[int] = []
         self.flat_blocks: List[Tuple[MacroBlock, int]] = []  # (block, depth) pairs
+        self._flat_index: Dict[str, int] = {}  # block key -> flat_blocks index
         self.clipboard: List[MacroBlock] = []  # Clipboard for copy/cut/paste
         self.last_selected_index: Optional[int] = None  # For range selection
         self.range_anchor: Optional[int] = None  # Fixed anchor point for range selection
         
-        # Undo functionality - store up to 5 states
-        self.undo_history: List[List[MacroBlock]] = []
+        # Undo functionality - store up to 5 states (blocks, subroutines)
+        self.undo_history: List[Tuple[List[MacroBlock], SubroutineLibrary]] = []
         self.max_undo_levels = 5
 
         # Bind click events for selection
@@ -88,6 +95,15 @@ class MacroListManager:
     def pack(self, **kwargs):
         self.container_frame.pack(**kwargs)
 
+    @property
+    def macro_blocks(self) -> List[MacroBlock]:
+        """Root-level blocks of the tree."""
+        return self.tree.roots
+
+    @macro_blocks.setter
+    def macro_blocks(self, blocks: List[MacroBlock]):
+        self.tree.load(blocks)
+
     def insert_macro_block(self, macro_block: MacroBlock):
         """Insert a MacroBlock into the list."""
         self._save_state_for_undo()
@@ -97,15 +113,15 @@ class MacroListManager:
 
         if sel:
             selected_idx = sel[0]
-            selected_block, selected_depth = self.flat_blocks[selected_idx]
-            if selected_block.event_type == EventType.IF:
+            selected_block, _ = self.flat_blocks[selected_idx]
+            if selected_block.is_container():
                 self._clear_reference_positions_if_needed(macro_block, selected_block, is_image_match_copy)
-                selected_block.macro_blocks.insert(0, macro_block)
+                self.tree.insert(macro_block, selected_block, 0)
             else:
-                self._insert_after_selected_block(macro_block, selected_idx, selected_block, selected_depth)
+                self._insert_after_selected_block(macro_block, selected_block)
         else:
             self._clear_reference_positions_if_needed(macro_block, None, is_image_match_copy)
-            self.macro_blocks.append(macro_block)
+            self.tree.insert(macro_block)
 
         self._rebuild_flat_list()
         self._refresh_display()
@@ -121,15 +137,14 @@ class MacroListManager:
 
     def _is_image_match_block(self, block: MacroBlock) -> bool:
         """Check if block is an image match condition."""
-        return (block.event_type == EventType.IF and
-                hasattr(block, 'condition_type') and
-                block.condition_type and
-                block.condition_type.value == 'image_match')
+        return block.is_image_condition()
 
     def clear(self):
         self.macro_listbox.delete(0, tk.END)
-        self.macro_blocks.clear()
+        self.tree.clear()
+        self.subroutines = SubroutineLibrary()
         self.flat_blocks.clear()
+        self._flat_index.clear()
         self.selected_indices.clear()
         self.last_selected_index = -1
 
@@ -138,13 +153,24 @@ class MacroListManager:
 
     def load_macro_blocks(self, macro_blocks: List[MacroBlock]):
         """Load macro blocks into the list."""
-        self.macro_blocks = macro_blocks.copy()
+        self.tree.load(macro_blocks)
         self.selected_indices.clear()
         self.last_selected_index = -1
         self._rebuild_flat_list()
         self._refresh_display()
         self._update_global_state()
 
+    def append_macro_blocks(self, macro_blocks: List[MacroBlock]):
+        """Append root blocks while a file is still loading (no undo, no full refresh)."""
+        for block in macro_blocks:
+            self.tree.insert(block)
+            start = len(self.flat_blocks)
+            subtree = flatten_blocks([block])
+            self.flat_blocks.extend(subtree)
+            for offset, (row_block, depth) in enumerate(subtree):
+                self._flat_index[row_block.key] = start + offset
+                self.macro_listbox.insert(tk.END, self._row_text(row_block, depth))
+
     def _split_raw_desc(self, s: str) -> Tuple[str, str]:
         if " - " in s:
             raw, desc = s.rsplit(" - ", 1)
@@ -237,9 +263,9 @@ class MacroListManager:
                 block, _ = self.flat_blocks[index]
                 blocks_to_delete.append(block)
 
-        # Remove blocks from their parent containers
-        for block in blocks_to_delete:
-            self._remove_block_from_tree(block)
+        # Remove blocks from their parent containers in one pass per sibling list;
+        # blocks inside a selected ancestor go with it.
+        self.tree.remove_many(blocks_to_delete)
 
         # Clear selection and rebuild
         self.selected_indices.clear()
@@ -260,15 +286,15 @@ class MacroListManager:
 
     def _rebuild_flat_list(self):
         """Rebuild the flat list from the hierarchical structure."""
-        self.flat_blocks.clear()
-        self._flatten_blocks(self.macro_blocks, 0)
-
-    def _flatten_blocks(self, blocks: List[MacroBlock], depth: int):
-        """Recursively flatten the block hierarchy."""
-        for block in blocks:
-            self.flat_blocks.append((block, depth))
-            if block.macro_blocks:
-                self._flatten_blocks(block.macro_blocks, depth + 1)
+        self.flat_blocks = self.tree.flatten()
+        self._flat_index = {block.key: i for i, (block, _) in enumerate(self.flat_blocks)}
+
+    def flat_index_of(self, block: MacroBlock) -> Optional[int]:
+        """Row index of block in the list widget, or None if not shown."""
+        i = self._flat_index.get(block.key)
+        if i is not None and self.flat_blocks[i][0] is block:
+            return i
+        return None
 
     def _refresh_display(self):
         """Refresh the listbox display with indented text."""
@@ -278,86 +304,28 @@ class MacroListManager:
         self.macro_listbox.delete(0, tk.END)
 
         for block, depth in self.flat_blocks:
-            indent = "    " * depth  # 4 spaces per depth level
-            display_text = indent + block.get_display_text()
-            if block.description:
-                display_text = self._join_raw_desc(display_text, block.description)
-            self.macro_listbox.insert(tk.END, display_text)
+            self.macro_listbox.insert(tk.END, self._row_text(block, depth))
 
         # Restore scroll position
         self.macro_listbox.yview_moveto(yview[0])
 
-    def _find_root_block(self, flat_index: int) -> MacroBlock:
-        """Find the root block for a given flat index."""
-        if flat_index < len(self.flat_blocks):
-            block, depth = self.flat_blocks[flat_index]
-
-            # If it's already at depth 0, it's a root block
-            if depth == 0:
-                return block
-
-            # Search backwards for the parent root block
-            for i in range(flat_index - 1, -1, -1):
-                parent_block, parent_depth = self.flat_blocks[i]
-                if parent_depth == 0:
-                    return parent_block
-
-        # Fallback to first root block
-        return self.macro_blocks[0] if self.macro_blocks else None
-
-    def _remove_block_from_tree(self, target_block: MacroBlock):
-        """Remove a block from the tree structure."""
-        # Try to remove from root level
-        if target_block in self.macro_blocks:
-            self.macro_blocks.remove(target_block)
-            return
-
-        # Recursively search in nested blocks
-        self._remove_from_nested_blocks(self.macro_blocks, target_block)
-
-    def _remove_from_nested_blocks(self, blocks: List[MacroBlock], target_block: MacroBlock) -> bool:
-        """Recursively remove a block from nested structures."""
-        for block in blocks:
-            if target_block in block.macro_blocks:
-                block.macro_blocks.remove(target_block)
-                return True
-            if self._remove_from_nested_blocks(block.macro_blocks, target_block):
-                return True
-        return False
-
     def get_raw_items(self) -> List[str]:
         """Get raw text items for backward compatibility."""
-        items = []
-        for block, depth in self.flat_blocks:
-            indent = "    " * depth
-            display_text = indent + block.get_display_text()
-            if block.description:
-                display_text = self._join_raw_desc(display_text, block.description)
-            items.append(display_text)
-        return items
-
-    def _insert_after_selected_block(self, macro_block: MacroBlock, selected_idx: int, selected_block: MacroBlock, selected_depth: int):
-        """Insert a macro block after the selected block."""
-        is_image_match_copy = self._is_image_match_block(macro_block)
+        return [self._row_text(block, depth) for block, depth in self.flat_blocks]
 
-        if selected_depth == 0:
-            root_idx = self.macro_blocks.index(selected_block)
-            self._clear_reference_positions_if_needed(macro_block, None, is_image_match_copy)
-            self.macro_blocks.insert(root_idx + 1, macro_block)
-        else:
-            parent_block = self._find_parent_block(selected_idx, selected_block)
-            if parent_block and hasattr(parent_block, 'macro_blocks'):
-                if selected_block in parent_block.macro_blocks:
-                    child_idx = parent_block.macro_blocks.index(selected_block)
-                    self._clear_reference_positions_if_needed(macro_block, parent_block, is_image_match_copy)
-                    parent_block.macro_blocks.insert(child_idx + 1, macro_block)
-                else:
-                    self._clear_reference_positions_if_needed(macro_block, parent_block, is_image_match_copy)
-                    parent_block.macro_blocks.append(macro_block)
-            else:
-                self._clear_reference_positions_if_needed(macro_block, None, is_image_match_copy)
-                self.macro_blocks.append(macro_block)
+    def _row_text(self, block: MacroBlock, depth: int) -> str:
+        """Build a list row; the block memoizes its own display text."""
+        display_text = "    " * depth + block.get_display_text()  # 4 spaces per depth level
+        if block.description:
+            display_text = self._join_raw_desc(display_text, block.description)
+        return display_text
 
+    def _insert_after_selected_block(self, macro_block: MacroBlock, selected_block: MacroBlock):
+        """Insert a macro block after the selected block."""
+        is_image_match_copy = self._is_image_match_block(macro_block)
+        parent_block = self.tree.parent_of(selected_block)
+        self._clear_reference_positions_if_needed(macro_block, parent_block, is_image_match_copy)
+        self.tree.insert_after(macro_block, selected_block)
 
     def _copy_blocks_for_clipboard(self, selected_blocks: List[MacroBlock]) -> List[MacroBlock]:
         """Copy blocks for clipboard, excluding blocks whose ancestors are also selected.
@@ -372,50 +340,17 @@ class MacroListManager:
         result = []
 
         for block in selected_blocks:
-            # Find this block's index in flat_blocks
-            block_idx = None
-            for i, (fb, _) in enumerate(self.flat_blocks):
-                if fb is block:
-                    block_idx = i
-                    break
-
-            if block_idx is None:
+            if block not in self.tree:
                 continue
 
             # Check if any ancestor is also selected
-            has_selected_ancestor = False
-            current_depth = self.flat_blocks[block_idx][1]
-
-            for i in range(block_idx - 1, -1, -1):
-                ancestor, depth = self.flat_blocks[i]
-                if depth < current_depth:
-                    if ancestor.key in selected_keys:
-                        has_selected_ancestor = True
-                        break
-                    current_depth = depth
-                if depth == 0:
-                    break
+            has_selected_ancestor = any(ancestor.key in selected_keys for ancestor in self.tree.ancestors_of(block))
 
             if not has_selected_ancestor:
                 result.append(block.copy())
 
         return result
 
-    def _find_parent_block(self, selected_idx: int, selected_block: MacroBlock) -> Optional[MacroBlock]:
-        """Find the parent block of the selected block."""
-        if selected_idx <= 0:
-            return None
-
-        selected_depth = self.flat_blocks[selected_idx][1]
-
-        # Search backwards for a block with depth one level up
-        for i in range(selected_idx - 1, -1, -1):
-            block, depth = self.flat_blocks[i]
-            if depth == selected_depth - 1:
-                return block
-
-        return None
-
     def _update_block_description(self, flat_index: int, new_description: str):
         """Update the description of a MacroBlock based on flat list index."""
         if 0 <= flat_index < len(self.flat_blocks):
@@ -467,38 +402,23 @@ class MacroListManager:
         if sel:
             # Use the last selected index as the base insertion point
             selected_idx = max(sel)
-            selected_block, selected_depth = self.flat_blocks[selected_idx]
+            selected_block, _ = self.flat_blocks[selected_idx]
 
             # Determine the insertion location
-            if selected_block.event_type == EventType.IF:
-                # Insert inside the IF block
+            if selected_block.is_container():
+                # Insert inside the container block, at its beginning
                 parent_block = selected_block
-                insert_list = parent_block.macro_blocks
-                insert_position = 0  # Insert at the beginning of the IF block
+                insert_position = 0
             else:
                 # Insert after the selected block
-                if selected_depth == 0:
-                    # Root level
-                    parent_block = None
-                    insert_list = self.macro_blocks
-                    insert_position = self.macro_blocks.index(selected_block) + 1
-                else:
-                    # Find parent block
-                    parent_block = self._find_parent_block(selected_idx, selected_block)
-                    if parent_block and hasattr(parent_block, 'macro_blocks'):
-                        insert_list = parent_block.macro_blocks
-                        insert_position = parent_block.macro_blocks.index(selected_block) + 1
-                    else:
-                        # Fallback to root level
-                        parent_block = None
-                        insert_list = self.macro_blocks
-                        insert_position = len(self.macro_blocks)
+                parent_block = self.tree.parent_of(selected_block)
+                insert_position = self.tree.index_in_parent(selected_block) + 1
 
             for i, block in enumerate(self.clipboard):
                 copied_block = block.copy()
                 is_image_match_copy = self._is_image_match_block(copied_block)
                 self._clear_reference_positions_if_needed(copied_block, parent_block, is_image_match_copy)
-                insert_list.insert(insert_position + i, copied_block)
+                self.tree.insert(copied_block, parent_block, insert_position + i)
                 pasted_blocks.append(copied_block)
 
         else:
@@ -506,7 +426,7 @@ class MacroListManager:
                 copied_block = block.copy()
                 is_image_match_copy = self._is_image_match_block(copied_block)
                 self._clear_reference_positions_if_needed(copied_block, None, is_image_match_copy)
-                self.macro_blocks.append(copied_block)
+                self.tree.insert(copied_block)
                 pasted_blocks.append(copied_block)
 
         self._rebuild_flat_list()
@@ -514,10 +434,9 @@ class MacroListManager:
 
         # Select the pasted blocks
         if pasted_blocks:
-            pasted_indices = []
-            for i, (block, _) in enumerate(self.flat_blocks):
-                if block in pasted_blocks:
-                    pasted_indices.append(i)
+            pasted_indices = sorted(
+                i for i in (self.flat_index_of(block) for block in pasted_blocks) if i is not None
+            )
 
             if pasted_indices:
                 self.selected_indices = pasted_indices
@@ -533,8 +452,12 @@ class MacroListManager:
 
     def _save_state_for_undo(self):
         """Save current state to undo history."""
-        # Deep copy the current macro blocks state
-        current_state = [block.copy() for block in self.macro_blocks]
+        # 모든 구조 변경은 여기를 거치므로, 진행 중인 불러오기를 먼저 끝낸다
+        if self.before_edit_callback:
+            self.before_edit_callback()
+
+        # Deep copy the current macro blocks state (서브루틴 본문은 바꾸지 않으므로 이름 표만 복사)
+        current_state = ([block.copy() for block in self.macro_blocks], self.subroutines.copy())
         
         # Add to history
         self.undo_history.append(current_state)
@@ -553,8 +476,8 @@ class MacroListManager:
             return  # No states to undo
             
         # Restore the last saved state
-        last_state = self.undo_history.pop()
-        self.macro_blocks = last_state
+        last_blocks, self.subroutines = self.undo_history.pop()
+        self.tree.load(last_blocks)
         
         # Rebuild and refresh display
         self._rebuild_flat_list()
@@ -700,11 +623,7 @@ class MacroListManager:
             hasattr(block, 'clear_reference_position') and
             block.has_reference_position()):
 
-            if not (target_parent and
-                   target_parent.event_type == EventType.IF and
-                   hasattr(target_parent, 'condition_type') and
-                   target_parent.condition_type and
-                   target_parent.condition_type.value == 'image_match'):
+            if not (target_parent and target_parent.is_image_condition()):
                 block.clear_reference_position()
 
         if hasattr(block, 'macro_blocks') and block.macro_blocks:
@@ -722,13 +641,12 @@ class MacroListManager:
 
     def _select_newly_added_block(self, new_block: MacroBlock):
         """Select the newly added block."""
-        for i, (block, depth) in enumerate(self.flat_blocks):
-            if block is new_block:
-                self.selected_indices = [i]
-                self.last_selected_index = i
-                self._update_selection_display()
-                self.macro_listbox.focus_set()
-                break
+        i = self.flat_index_of(new_block)
+        if i is not None:
+            self.selected_indices = [i]
+            self.last_selected_index = i
+            self._update_selection_display()
+            self.macro_listbox.focus_set()
 
     def _on_double_click(self, event):
         """Handle double-click to edit macro block."""
@@ -752,25 +670,8 @@ class MacroListManager:
         """Replace a block with a new block at the specified index."""
         self._save_state_for_undo()
 
-        # flat_blocks에서 해당 블록 찾기
-        if block_index < len(self.flat_blocks):
-            flat_block, depth = self.flat_blocks[block_index]
-
-            # 부모 블록에서 교체
-            if depth == 0:
-                # 루트 레벨 블록
-                for i, root_block in enumerate(self.macro_blocks):
-                    if root_block is old_block:
-                        self.macro_blocks[i] = new_block
-                        break
-            else:
-                # 중첩된 블록 - 부모 찾아서 교체
-                parent_block = self._find_parent_block(block_index, flat_block)
-                if parent_block and hasattr(parent_block, 'macro_blocks'):
-                    for i, child_block in enumerate(parent_block.macro_blocks):
-                        if child_block is old_block:
-                            parent_block.macro_blocks[i] = new_block
-                            break
+        # 부모 블록에서 교체 (트리가 부모 포인터를 유지)
+        self.tree.replace(old_block, new_block)
 
         # 화면 업데이트
         self._rebuild_flat_list()
@@ -783,6 +684,76 @@ class MacroListManager:
         if self.mark_dirty_callback:
             self.mark_dirty_callback(True)
 
+    def collapse_repeats(self) -> int:
+        """Replace identical consecutive runs with REPEAT blocks. Returns how many were created."""
+        self._save_state_for_undo()
+        collapsed, created = collapse_repeats(self.macro_blocks)
+        if not created:
+            # 바뀐 게 없으면 실행 취소 기록도 남기지 않는다
+            self.undo_history.pop()
+            return 0
+
+        self.load_macro_blocks(collapsed)
+        if self.mark_dirty_callback:
+            self.mark_dirty_callback(True)
+        return created
+
+    def selected_sibling_run(self) -> List[MacroBlock]:
+        """Selected blocks (without their selected descendants) if they share one parent, in order; else []."""
+        selected = self.get_selected_macro_blocks()
+        selected_keys = {block.key for block in selected}
+        blocks = [block for block in selected
+                  if block in self.tree and not any(a.key in selected_keys for a in self.tree.ancestors_of(block))]
+        if not blocks or len({id(self.tree.parent_of(block)) for block in blocks}) != 1:
+            return []
+        return sorted(blocks, key=self.tree.index_in_parent)
+
+    def convert_selection_to_subroutine(self, name: str) -> Optional[MacroBlock]:
+        """Move the selected sibling blocks into subroutine name and leave a CALL in their place."""
+        blocks = self.selected_sibling_run()
+        if not blocks:
+            return None
+
+        self._save_state_for_undo()
+        call_block = MacroFactory.create_call_block(name)
+        self.tree.insert(call_block, self.tree.parent_of(blocks[0]), self.tree.index_in_parent(blocks[0]))
+        self.tree.remove_many(blocks)
+        self.subroutines.define(name, blocks)
+
+        self._rebuild_flat_list()
+        self._refresh_display()
+        self._update_global_state()
+        self._select_newly_added_block(call_block)
+        if self.mark_dirty_callback:
+            self.mark_dirty_callback(True)
+        return call_block
+
+    def expand_call(self, call_block: MacroBlock) -> bool:
+        """Replace a CALL block with an editable copy of the subroutine body."""
+        body = self.subroutines.get(call_block.event_data) if call_block.event_type == EventType.CALL else None
+        if body is None or call_block not in self.tree:
+            return False
+
+        self._save_state_for_undo()
+        parent = self.tree.parent_of(call_block)
+        index = self.tree.index_in_parent(call_block)
+        self.tree.remove(call_block)
+        copies = [block.copy() for block in body]
+        for offset, block in enumerate(copies):
+            self.tree.insert(block, parent, index + offset)
+
+        self._rebuild_flat_list()
+        self._refresh_display()
+        self._update_global_state()
+        indices = sorted(i for i in (self.flat_index_of(block) for block in copies) if i is not None)
+        if indices:
+            self.selected_indices = indices
+            self.last_selected_index = indices[0]
+            self._update_selection_display()
+        if self.mark_dirty_callback:
+            self.mark_dirty_callback(True)
+        return True
+
     def _on_move_outside(self, event):
         """Handle Shift+Tab to move selected block outside of condition."""
         self.move_selected_blocks_outside()
@@ -808,39 +779,19 @@ class MacroListManager:
                 continue
 
             # 직계 부모 블록 찾기
-            parent_block = self._find_parent_block(idx, block)
+            parent_block = self.tree.parent_of(block)
             if not parent_block:
                 continue
 
-            blocks_to_move.append((block, parent_block, depth))
+            blocks_to_move.append((block, parent_block))
 
         if not blocks_to_move:
             return
 
-        # 블록들을 한 단계 밖으로 이동
-        for block, parent_block, depth in blocks_to_move:
-            # 부모의 macro_blocks에서 해당 블록 제거
-            if block in parent_block.macro_blocks:
-                parent_block.macro_blocks.remove(block)
-
-            # depth가 1이면 최상위로 이동
-            if depth == 1:
-                # 부모 블록의 루트 레벨 위치 찾기
-                parent_root_idx = self._find_root_index(parent_block)
-                if parent_root_idx is not None:
-                    # 부모 블록 바로 다음에 삽입
-                    self.macro_blocks.insert(parent_root_idx + 1, block)
-            else:
-                # depth > 1이면 조부모 블록을 찾아서 그 안에 삽입
-                grandparent_block = self._find_grandparent_block(parent_block)
-                if grandparent_block and hasattr(grandparent_block, 'macro_blocks'):
-                    # 부모 블록 바로 다음 위치에 삽입
-                    try:
-                        parent_idx = grandparent_block.macro_blocks.index(parent_block)
-                        grandparent_block.macro_blocks.insert(parent_idx + 1, block)
-                    except ValueError:
-                        # 부모를 찾지 못한 경우 마지막에 추가
-                        grandparent_block.macro_blocks.append(block)
+        # 블록들을 한 단계 밖으로 이동: 부모 블록 바로 다음 위치 (부모가 루트면 최상위)
+        for block, parent_block in blocks_to_move:
+            grandparent_block = self.tree.parent_of(parent_block)
+            self.tree.move(block, grandparent_block, self.tree.index_in_parent(parent_block) + 1)
 
         # 화면 업데이트
         self._rebuild_flat_list()
@@ -854,61 +805,3 @@ class MacroListManager:
 
         if self.mark_dirty_callback:
             self.mark_dirty_callback(True)
-
-    def _find_grandparent_block(self, parent_block: MacroBlock) -> Optional[MacroBlock]:
-        """Find the grandparent block (parent of the parent block)."""
-        # 루트 레벨에서 부모의 부모 찾기
-        for root_block in self.macro_blocks:
-            if root_block is parent_block:
-                return None  # 부모가 루트 레벨이면 조부모 없음
-
-            if hasattr(root_block, 'macro_blocks'):
-                # 직접 자식인지 확인
-                if parent_block in root_block.macro_blocks:
-                    return root_block
-
-                # 재귀적으로 자손 중에서 찾기
-                grandparent = self._find_grandparent_recursive(parent_block, root_block)
-                if grandparent:
-                    return grandparent
-
-        return None
-
-    def _find_grandparent_recursive(self, target_parent: MacroBlock, current: MacroBlock) -> Optional[MacroBlock]:
-        """Recursively find the grandparent of target_parent."""
-        if not hasattr(current, 'macro_blocks'):
-            return None
-
-        for child in current.macro_blocks:
-            if child is target_parent:
-                return current
-
-            if hasattr(child, 'macro_blocks'):
-                result = self._find_grandparent_recursive(target_parent, child)
-                if result:
-                    return result
-
-        return None
-
-    def _find_root_index(self, target_block: MacroBlock) -> Optional[int]:
-        """Find the index of a block in the root macro_blocks list."""
-        for i, block in enumerate(self.macro_blocks):
-            if block is target_block:
-                return i
-            # 재귀적으로 검색
-            if hasattr(block, 'macro_blocks') and block.macro_blocks:
-                if self._is_block_in_children(target_block, block):
-                    return i
-        return None
-
-    def _is_block_in_children(self, target_block: MacroBlock, parent: MacroBlock) -> bool:
-        """Check if target_block is a child of parent."""
-        if not hasattr(parent, 'macro_blocks'):
-            return False
-
-        for child in parent.macro_blocks:
-            if child is target_block:
-                return True
-            if hasattr(child, 'macro_blocks') and self._is_block_in_children(target_block, child):
-                return True
-        return False
\ No newline at end of file
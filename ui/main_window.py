@@ -1,23 +1,41 @@
 import os
 import sys
-import json
+import itertools
+import time
 import tkinter as tk
 from tkinter import messagebox, filedialog
 
 from core.state import default_settings, default_hotkeys
 from core.keyboard_hotkey import register_hotkeys
-from core.persistence import export_data, load_macro_data, load_app_state, save_app_state
+from core.persistence import MacroFileReader
+from core.app_state import get_app_state
+from core.autosave import AutoSaver, SaveJob, recovery_path, snapshot_blocks
+from core.macro_package import load_macro_package, release_macro_package, is_package_path
+from core import template_store
 from core.macro_block import MacroBlock
+from core.macro_tree import flatten_blocks
+from core.subroutines import SubroutineLibrary
+from core.match_history import get_match_history, format_report
+from core.run_metrics import format_metrics
 from core.event_types import EventType, ConditionType
 from ui.macro_list import MacroListManager
 from ui.execution.executor import MacroExecutor
 from ui.execution.highlighter import MacroHighlighter
-from ui.dialogs.settings import SettingsDialog
-from ui.dialogs.input_dialogs import InputDialogs
-from ui.dialogs.condition_dialog import ConditionDialog
+from core.warmup import Warmup, template_paths, WARMUP_RUNNING, WARMUP_READY
+from utils import startup_profile
+
+
+MACRO_FILE_EXTENSIONS = (".json", ".ckp")
+MACRO_FILE_TYPES = [("Macro JSON", "*.json"), ("Clikey Package", "*.ckp"), ("All files", "*.*")]
 
 
 class MacroUI:
+    # 불러오기 시 첫 화면에 바로 보여줄 블록 수 / 이후 한 번에 추가할 블록 수
+    LOAD_FIRST_BATCH = 200
+    LOAD_BATCH = 500
+    # 실행 지표 패널 갱신 간격 (실행 단계마다 Tk 작업을 하지 않도록 고정 간격으로 샘플링)
+    METRICS_INTERVAL_MS = 500
+
     def __init__(self, root: tk.Tk, initial_file: str | None = None):
         self.root = root
         self.root.title("Clikey")
@@ -93,8 +111,12 @@ class MacroUI:
         self.hotkeys = default_hotkeys()
         self.hotkey_handles = {"start": None, "stop": None}
 
+        self.app_state = get_app_state()
         self.current_path: str | None = None
         self.is_dirty: bool = False
+        self._run_started: float | None = None
+        self._metrics_job = None
+        self._pending_load = None  # 스트리밍 불러오기 진행 상태
 
         # 편집 모드 상태
         self.edit_mode = {"enabled": False, "block": None, "index": None}
@@ -103,6 +125,7 @@ class MacroUI:
         self._build_menu()
         self._build_layout()
         self._ensure_window_fits_content()
+        self._restore_window_geometry()
         self._bind_events()
         self._register_hotkeys_if_available()
         # UI 표시 후 파일 로드 (체감 속도 개선)
@@ -111,10 +134,78 @@ class MacroUI:
     def _init_components(self):
         self.macro_list = None
         self.executor = MacroExecutor(self.root)
+        self.autosaver = AutoSaver(self.root, self._autosave_snapshot)
+        self.warmup = Warmup(lambda state, detail: self.root.after(0, self._show_warmup_status, state, detail))
         self.highlighter = None
-        self.settings_dialog = None
-        self.input_dialogs = None
-        self.condition_dialog = None
+        # 다이얼로그(PIL 등 포함)는 처음 쓸 때 생성 (시작 속도)
+        self._settings_dialog = None
+        self._input_dialogs = None
+        self._condition_dialog = None
+        self.on_interactive = None  # 마지막 파일 복원까지 끝나면 한 번 호출
+        # 시작 직후 파일 복원이 아직 끝나지 않음 (_notify_interactive 가 한 번만 처리)
+        self._startup_pending = True
+        # 지금 매크로가 이미지를 참조하는 .ckp (다른 파일을 열면 놓아서 mmap 을 닫음)
+        self._package_path = None
+
+    @property
+    def settings_dialog(self):
+        if self._settings_dialog is None:
+            from ui.dialogs.settings import SettingsDialog
+            self._settings_dialog = SettingsDialog(
+                self.root, self.settings, self.hotkeys,
+                self._mark_dirty, self._register_hotkeys_if_available,
+                self.scale_factor
+            )
+        return self._settings_dialog
+
+    @property
+    def input_dialogs(self):
+        if self._input_dialogs is None:
+            from ui.dialogs.input_dialogs import InputDialogs
+            self._input_dialogs = InputDialogs(
+                self.root, self._handle_macro_insert, self._is_edit_mode,
+                self._cancel_edit_mode, self.scale_factor
+            )
+        return self._input_dialogs
+
+    @property
+    def condition_dialog(self):
+        if self._condition_dialog is None:
+            from ui.dialogs.condition_dialog import ConditionDialog
+            self._condition_dialog = ConditionDialog(
+                self.root, self._handle_macro_insert, self._is_edit_mode,
+                self._cancel_edit_mode, self.scale_factor
+            )
+            self._condition_dialog.set_macro_list(self.macro_list)
+        return self._condition_dialog
+
+    def _notify_interactive(self):
+        """End of startup (last file restored or failed); later loads don't come here."""
+        if not self._startup_pending:
+            return
+        self._startup_pending = False
+        callback, self.on_interactive = self.on_interactive, None
+        if callback is not None:
+            callback()
+        else:
+            startup_profile.mark("interactive")
+        # 화면이 뜬 뒤 이미지 매칭 엔진을 미리 준비 (시작 때 불러온 파일의 템플릿 포함)
+        self._start_warmup()
+
+    def _start_warmup(self):
+        self.warmup.start(template_paths(self.macro_list.get_macro_blocks() + self.macro_list.subroutines.all_blocks()))
+
+    def _show_warmup_status(self, state: str, detail: str):
+        if state == WARMUP_RUNNING:
+            text, color = "이미지 엔진 준비 중...", "gray"
+        elif state == WARMUP_READY:
+            text, color = f"이미지 엔진 준비 완료 ({detail})", "gray"
+        else:
+            text, color = "이미지 엔진 준비 실패", "red"
+        try:
+            self.warmup_label.config(text=text, fg=color)
+        except Exception:
+            pass
 
     def _build_menu(self):
         menubar = tk.Menu(self.root)
@@ -124,6 +215,8 @@ class MacroUI:
         file_menu.add_command(label="열기", command=self.load_file)
         file_menu.add_command(label="저장", command=self.save_file)
         file_menu.add_command(label="다른 이름으로 저장", command=self.save_file_as)
+        self.recent_menu = tk.Menu(file_menu, tearoff=0, postcommand=self._populate_recent_menu)
+        file_menu.add_cascade(label="최근 파일", menu=self.recent_menu)
         file_menu.add_separator()
         file_menu.add_command(label="종료", command=self.request_quit)
         menubar.add_cascade(label="파일", menu=file_menu)
@@ -137,6 +230,10 @@ class MacroUI:
         edit_menu.add_separator()
         edit_menu.add_command(label="설명 추가", accelerator="/", command=self.add_description)
         edit_menu.add_command(label="조건 밖으로", accelerator="Shift+Tab", command=self.move_outside)
+        edit_menu.add_separator()
+        edit_menu.add_command(label="선택 영역을 서브루틴으로", command=self.convert_to_subroutine)
+        edit_menu.add_command(label="서브루틴 호출 추가", command=self.add_call)
+        edit_menu.add_command(label="서브루틴 펼치기", command=self.expand_call)
         edit_menu.add_command(label="삭제", accelerator="Delete", command=self.delete_macro)
         menubar.add_cascade(label="편집", menu=edit_menu)
 
@@ -144,8 +241,37 @@ class MacroUI:
         settings_menu.add_command(label="환경 설정", command=self.open_settings)
         menubar.add_cascade(label="설정", menu=settings_menu)
 
+        tools_menu = tk.Menu(menubar, tearoff=0)
+        tools_menu.add_command(label="이미지 탐색 적중률", command=self.show_match_report)
+        tools_menu.add_command(label="입력 지연 통계", command=self.show_input_stats)
+        tools_menu.add_command(label="실행 기록 저장", command=self.save_trace)
+        tools_menu.add_separator()
+        tools_menu.add_command(label="반복 구간 묶기", command=self.collapse_repeats)
+        menubar.add_cascade(label="도구", menu=tools_menu)
+
         self.root.config(menu=menubar)
 
+    def _populate_recent_menu(self):
+        self.recent_menu.delete(0, tk.END)
+        recent = self.app_state.recent_files()
+        if not recent:
+            self.recent_menu.add_command(label="(없음)", state=tk.DISABLED)
+            return
+        for i, path in enumerate(recent, 1):
+            self.recent_menu.add_command(label=f"{i}. {path}", command=lambda p=path: self.open_recent(p))
+
+    def open_recent(self, file_path: str):
+        if self.running:
+            messagebox.showwarning("경고", "실행 중에는 불러올 수 없습니다. 중지 후 다시 시도하세요.")
+            return
+        if not os.path.exists(file_path):
+            messagebox.showerror("불러오기 실패", f"파일을 찾을 수 없습니다:\n{file_path}")
+            self.app_state.remove_recent_file(file_path)
+            return
+        if not self._confirm_save_if_dirty():
+            return
+        self._open_path(file_path)
+
     def _build_layout(self):
         main_frame = tk.Frame(self.root)
         main_frame.pack(fill=tk.BOTH, expand=True)
@@ -158,6 +284,7 @@ class MacroUI:
 
         self.macro_list = MacroListManager(left_frame, self._mark_dirty, self.save_file)
         self.macro_list.pack(fill=tk.BOTH, expand=True, padx=6, pady=6)
+        self.macro_list.before_edit_callback = self._drain_pending_load
 
         self.highlighter = MacroHighlighter(self.macro_list.macro_listbox)
 
@@ -167,21 +294,6 @@ class MacroUI:
             finish_cb=self._finish_execution
         )
 
-        self.settings_dialog = SettingsDialog(
-            self.root, self.settings, self.hotkeys,
-            self._mark_dirty, self._register_hotkeys_if_available,
-            self.scale_factor
-        )
-        self.input_dialogs = InputDialogs(
-            self.root, self._handle_macro_insert, self._is_edit_mode,
-            self._cancel_edit_mode, self.scale_factor
-        )
-        self.condition_dialog = ConditionDialog(
-            self.root, self._handle_macro_insert, self._is_edit_mode,
-            self._cancel_edit_mode, self.scale_factor
-        )
-        self.condition_dialog.set_macro_list(self.macro_list)
-
         # 매크로 리스트에 편집 모드 콜백 설정
         self.macro_list.edit_mode_callback = self._start_edit_mode
 
@@ -198,6 +310,18 @@ class MacroUI:
         )
         self.toggle_btn.pack(pady=int(6 * self.scale_factor))
 
+        self.warmup_label = tk.Label(
+            bottom_frame, text="", fg="gray",
+            font=("맑은 고딕", max(7, self.base_font_size - 1))
+        )
+        self.warmup_label.pack()
+
+        self.metrics_label = tk.Label(
+            bottom_frame, text="", fg="gray", justify=tk.LEFT,
+            font=("맑은 고딕", max(7, self.base_font_size - 2))
+        )
+        self.metrics_label.pack()
+
         # 나머지 버튼들을 위쪽에 배치하기 위한 프레임
         top_frame = tk.Frame(right_frame)
         top_frame.pack(side=tk.TOP, fill=tk.X)
@@ -213,10 +337,22 @@ class MacroUI:
             top_frame, text="마우스", width=self.button_width,
             font=button_font, command=self.add_mouse
         ).pack(pady=button_pady)
+        tk.Button(
+            top_frame, text="텍스트", width=self.button_width,
+            font=button_font, command=self.add_type_text
+        ).pack(pady=button_pady)
         tk.Button(
             top_frame, text="딜레이", width=self.button_width,
             font=button_font, command=self.add_delay
         ).pack(pady=button_pady)
+        tk.Button(
+            top_frame, text="반복", width=self.button_width,
+            font=button_font, command=self.add_repeat
+        ).pack(pady=button_pady)
+        tk.Button(
+            top_frame, text="변수", width=self.button_width,
+            font=button_font, command=self.add_variable
+        ).pack(pady=button_pady)
         tk.Button(
             top_frame, text="중지", width=self.button_width,
             font=button_font, command=self.add_stop_macro
@@ -229,6 +365,10 @@ class MacroUI:
             top_frame, text="이미지조건", width=self.button_width,
             font=button_font, command=self.add_image_match_condition
         ).pack(pady=button_pady)
+        tk.Button(
+            top_frame, text="조건식", width=self.button_width,
+            font=button_font, command=self.add_expression_condition
+        ).pack(pady=button_pady)
         # 추후 전문가 기능에 추가
         # tk.Button(top_frame, text="좌표조건", width=self.button_width, font=button_font, command=self.add_coordinate_condition).pack(pady=button_pady)
 
@@ -244,6 +384,28 @@ class MacroUI:
         except Exception:
             pass
 
+    def _restore_window_geometry(self):
+        geometry = self.app_state.window_geometry()
+        if not geometry:
+            return
+        try:
+            size, _, pos = geometry.partition("+")
+            x, y = (int(v) for v in pos.split("+")[:2])
+            # 모니터 구성이 바뀌어 화면 밖이면 위치는 버리고 크기만 적용
+            if 0 <= x < self.root.winfo_screenwidth() and 0 <= y < self.root.winfo_screenheight():
+                self.root.geometry(geometry)
+            else:
+                self.root.geometry(size)
+        except Exception:
+            pass
+
+    def remember_window_geometry(self):
+        try:
+            if self.root.state() == "normal":
+                self.app_state.set_window_geometry(self.root.geometry())
+        except Exception:
+            pass
+
     def _bind_events(self):
         self.root.bind("<Control-s>", self._on_save)
         self.root.bind("<Control-c>", self._on_copy)
@@ -413,8 +575,8 @@ class MacroUI:
         if not paths:
             return
         file_path = paths[0]
-        if not file_path.lower().endswith(".json"):
-            messagebox.showwarning("불러오기 실패", "JSON 파일만 불러올 수 있습니다.")
+        if not file_path.lower().endswith(MACRO_FILE_EXTENSIONS):
+            messagebox.showwarning("불러오기 실패", "JSON 또는 CKP 파일만 불러올 수 있습니다.")
             return
         if not os.path.exists(file_path):
             messagebox.showerror("불러오기 실패", f"파일을 찾을 수 없습니다:\n{file_path}")
@@ -428,8 +590,8 @@ class MacroUI:
             messagebox.showwarning("경고", "실행 중에는 불러올 수 없습니다. 중지 후 다시 시도하세요.")
             return
         file_path = files[0]
-        if not file_path.lower().endswith(".json"):
-            messagebox.showwarning("불러오기 실패", "JSON 파일만 불러올 수 있습니다.")
+        if not file_path.lower().endswith(MACRO_FILE_EXTENSIONS):
+            messagebox.showwarning("불러오기 실패", "JSON 또는 CKP 파일만 불러올 수 있습니다.")
             return
         if not os.path.exists(file_path):
             messagebox.showerror("불러오기 실패", f"파일을 찾을 수 없습니다:\n{file_path}")
@@ -445,14 +607,35 @@ class MacroUI:
     def _restore_last_file(self):
         try:
             if self._initial_file and os.path.exists(self._initial_file):
-                self._open_path(self._initial_file)
+                if not self._offer_recovery(self._initial_file):
+                    self._open_path(self._initial_file)
+                return
+            last_path = self.app_state.get("last_file_path")
+            if last_path and not os.path.exists(last_path):
+                last_path = None
+            if self._offer_recovery(last_path):
                 return
-            app_state = load_app_state() or {}
-            last_path = app_state.get("last_file_path")
-            if last_path and os.path.exists(last_path):
+            if last_path:
                 self._open_path(last_path)
         except Exception:
             pass
+        finally:
+            if self._pending_load is None:
+                self._notify_interactive()
+
+    def _offer_recovery(self, file_path: str | None) -> bool:
+        """Offer to reopen an autosave left behind by a crash. True if recovered."""
+        rec_path = recovery_path(file_path)
+        if not os.path.exists(rec_path):
+            return False
+        if file_path and os.path.getmtime(rec_path) <= os.path.getmtime(file_path):
+            self.autosaver.discard(file_path)
+            return False
+        name = os.path.basename(file_path) if file_path else "Untitled"
+        if not messagebox.askyesno("자동 저장 복구", f"저장되지 않은 변경사항이 있습니다 ({name}).\n복구하시겠습니까?"):
+            self.autosaver.discard(file_path)
+            return False
+        return self._open_path(rec_path, target_path=file_path, recovered=True)
 
     # ---------- 타이틀/더티 ----------
     def _update_title(self):
@@ -461,21 +644,141 @@ class MacroUI:
         else:
             name = "Untitled"
         mark = "*" if self.is_dirty else ""
-        self.root.title(f"Clikey - {name}{mark}")
+        loading = " (불러오는 중...)" if self._pending_load else ""
+        self.root.title(f"Clikey - {name}{mark}{loading}")
 
     def _mark_dirty(self, flag=True):
         self.is_dirty = bool(flag)
         self._update_title()
+        if self.is_dirty:
+            self.autosaver.touch()
+
+    def _autosave_snapshot(self) -> SaveJob | None:
+        """Called on the UI thread once edits settle; the write happens on the autosave thread."""
+        if not self.is_dirty or self._pending_load is not None or self.running:
+            return None
+        return SaveJob(
+            recovery_path(self.current_path),
+            snapshot_blocks(self.macro_list.get_macro_blocks()),
+            dict(self.settings), dict(self.hotkeys),
+            keep_open=False,
+            subroutines=self.macro_list.subroutines.snapshot(),
+        )
 
     # ---------- 파일 I/O ----------
-    def _open_path(self, file_path: str) -> bool:
+    def _open_path(self, file_path: str, target_path: str | None = None, recovered: bool = False) -> bool:
+        """Open a macro file, showing the first rows before parsing finishes.
+
+        For an autosave recovery, file_path is the recovery file and
+        target_path the macro it belongs to.
+        """
+        self._cancel_pending_load()
+        if not recovered:
+            target_path = file_path
+        if is_package_path(file_path):
+            return self._open_package(file_path, target_path, recovered)
+        reader = MacroFileReader(file_path)
+        blocks = iter(reader)
         try:
-            data = load_macro_data(file_path)
+            first_batch = list(itertools.islice(blocks, self.LOAD_FIRST_BATCH))
+        except Exception as e:
+            reader.close()
+            messagebox.showerror("불러오기 실패", f"파일을 불러오는 중 오류 발생:\n{e}")
+            return False
 
-            macro_blocks = [MacroBlock.from_dict(block_data) for block_data in data["macro_blocks"]]
-            self.macro_list.load_macro_blocks(macro_blocks)
+        self.macro_list.load_macro_blocks(first_batch)
+        self._hold_package(None)
+        self._pending_load = {"path": target_path, "recovered": recovered, "reader": reader, "blocks": blocks}
+        if reader.finished:
+            return self._finish_pending_load()
+
+        self.current_path = target_path
+        self._mark_dirty(False)
+        self.root.after(1, self._continue_pending_load)
+        return True
+
+    def _open_package(self, file_path: str, target_path: str | None, recovered: bool) -> bool:
+        """Open a .ckp package; its templates stay memory-mapped for matching."""
+        try:
+            blocks, header = load_macro_package(file_path)
+        except Exception as e:
+            messagebox.showerror("불러오기 실패", f"파일을 불러오는 중 오류 발생:\n{e}")
+            return False
+        self.macro_list.load_macro_blocks(blocks)
+        self._hold_package(file_path)
+        return self._apply_loaded_file(target_path, header.get("settings", {}), header.get("hotkeys", {}), recovered,
+                                       SubroutineLibrary.from_dict(header.get("subroutines")))
+
+    def _hold_package(self, package_path: str | None):
+        """Keep package_path (already acquired) for the shown macro and release the previous one."""
+        previous, self._package_path = self._package_path, package_path
+        if previous is None:
+            return
+        try:
+            release_macro_package(previous)
+        except BufferError:
+            # 아직 읽는 중인 이미지가 있으면 열린 채로 둠 (그 파일에 저장할 때 다시 닫아 봄)
+            pass
+
+    def _continue_pending_load(self):
+        pending = self._pending_load
+        if pending is None:
+            return
+        try:
+            batch = list(itertools.islice(pending["blocks"], self.LOAD_BATCH))
+        except Exception as e:
+            self._abort_pending_load(e)
+            return
+        if batch:
+            self.macro_list.append_macro_blocks(batch)
+        if pending["reader"].finished:
+            self._finish_pending_load()
+        else:
+            self.root.after(1, self._continue_pending_load)
+
+    def _drain_pending_load(self) -> bool:
+        """Synchronously finish an in-progress load (before save/run/edit)."""
+        pending = self._pending_load
+        if pending is None:
+            return True
+        try:
+            rest = list(pending["blocks"])
+        except Exception as e:
+            self._abort_pending_load(e)
+            return False
+        if rest:
+            self.macro_list.append_macro_blocks(rest)
+        return self._finish_pending_load()
+
+    def _cancel_pending_load(self):
+        pending = self._pending_load
+        if pending is not None:
+            self._pending_load = None
+            pending["reader"].close()
+
+    def _abort_pending_load(self, error: Exception):
+        self._cancel_pending_load()
+        self._notify_interactive()
+        self.macro_list.clear()
+        self._hold_package(None)
+        self.current_path = None
+        self._mark_dirty(False)
+        messagebox.showerror("불러오기 실패", f"파일을 불러오는 중 오류 발생:\n{error}")
+
+    def _finish_pending_load(self) -> bool:
+        pending = self._pending_load
+        self._pending_load = None
+        if self._startup_pending:
+            self.root.after_idle(self._notify_interactive)
+        return self._apply_loaded_file(pending["path"], pending["reader"].settings, pending["reader"].hotkeys,
+                                       pending["recovered"], pending["reader"].subroutines)
+
+    def _apply_loaded_file(self, file_path: str | None, settings: dict, hotkeys: dict, recovered: bool = False,
+                           subroutines: SubroutineLibrary | None = None) -> bool:
+        try:
+            self.macro_list.subroutines = subroutines or SubroutineLibrary()
+            self.macro_list._update_global_state()
 
-            settings = data.get("settings", {})
             if "repeat" in settings:
                 self.settings["repeat"] = int(settings["repeat"])
             if "start_delay" in settings:
@@ -484,36 +787,30 @@ class MacroUI:
                 self.settings["step_delay"] = float(settings["step_delay"])
             if "beep_on_finish" in settings:
                 self.settings["beep_on_finish"] = bool(settings["beep_on_finish"])
+            if "parallel_conditions" in settings:
+                self.settings["parallel_conditions"] = bool(settings["parallel_conditions"])
 
-            hotkeys = data.get("hotkeys", {})
             if hotkeys:
                 self.hotkeys.update(hotkeys)
                 self._register_hotkeys_if_available()
 
             self.current_path = file_path
-            self._mark_dirty(False)
-            try:
-                save_app_state({"last_file_path": file_path})
-            except Exception:
-                pass
+            # 복구한 내용은 아직 원본에 저장되지 않았으므로 변경됨으로 표시
+            self._mark_dirty(recovered)
+            if file_path and not recovered:
+                self.app_state.add_recent_file(file_path)
+            # 새 매크로의 템플릿을 미리 디코딩 (시작 직후 복원은 _notify_interactive 에서 한 번)
+            if not self._startup_pending:
+                self._start_warmup()
 
             # 설정 다이얼로그를 새로운 설정으로 다시 생성
-            self.settings_dialog = SettingsDialog(
-                self.root, self.settings, self.hotkeys,
-                self._mark_dirty, self._register_hotkeys_if_available,
-                self.scale_factor
-            )
+            self._settings_dialog = None
 
             return True
         except Exception as e:
             messagebox.showerror("불러오기 실패", f"파일을 불러오는 중 오류 발생:\n{e}")
             return False
 
-    def _collect_export_data(self) -> dict:
-        """Collect data for export using MacroBlock format."""
-        macro_blocks = self.macro_list.get_macro_blocks()
-        return export_data(macro_blocks, self.settings, self.hotkeys)
-
     def _confirm_save_if_dirty(self) -> bool:
         if not self.is_dirty:
             return True
@@ -521,7 +818,9 @@ class MacroUI:
         if res is None:
             return False
         if res is True:
-            return self.save_file()
+            return self.save_file(wait=True)
+        # 저장하지 않기로 했으므로 자동 저장본도 버림
+        self.autosaver.discard(self.current_path)
         return True
 
     def new_file(self):
@@ -530,7 +829,9 @@ class MacroUI:
             return
         if not self._confirm_save_if_dirty():
             return
+        self._cancel_pending_load()
         self.macro_list.clear()
+        self._hold_package(None)
         self.settings = default_settings()
         self.hotkeys = default_hotkeys()
         self._register_hotkeys_if_available()
@@ -538,11 +839,7 @@ class MacroUI:
         self._mark_dirty(False)
 
         # 설정 다이얼로그를 새로운 설정으로 다시 생성
-        self.settings_dialog = SettingsDialog(
-            self.root, self.settings, self.hotkeys,
-            self._mark_dirty, self._register_hotkeys_if_available,
-            self.scale_factor
-        )
+        self._settings_dialog = None
 
     def request_quit(self):
         if self.running:
@@ -550,6 +847,9 @@ class MacroUI:
             return
         if not self._confirm_save_if_dirty():
             return
+        self.autosaver.shutdown()
+        self.remember_window_geometry()
+        self.app_state.flush()
         self.root.quit()
 
     def load_file(self):
@@ -560,52 +860,157 @@ class MacroUI:
             return
         file_path = filedialog.askopenfilename(
             title="매크로 파일 불러오기",
-            filetypes=[("Macro JSON", "*.json"), ("All files", "*.*")],
+            filetypes=MACRO_FILE_TYPES,
         )
         if not file_path:
             return
         self._open_path(file_path)
 
-    def save_file(self) -> bool:
+    def save_file(self, wait: bool = False) -> bool:
+        """Save to current_path on the autosave thread.
+
+        With wait the call blocks until the file is written and returns
+        whether it succeeded (used before quitting or replacing the macro).
+        """
         if self.running:
             messagebox.showwarning("저장 불가", "실행 중에는 저장할 수 없습니다. 중지 후 다시 시도하세요.")
             return False
+        if not self._drain_pending_load():
+            return False
         path = self.current_path
         if not path:
-            return self.save_file_as()
+            return self.save_file_as(wait=wait)
         try:
-            data = self._collect_export_data()
-            with open(path, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            self._mark_dirty(False)
-            try:
-                save_app_state({"last_file_path": path})
-            except Exception:
-                pass
-            return True
+            blocks = self.macro_list.get_macro_blocks()
+            if not is_package_path(path):
+                # JSON 은 이미지를 담을 수 없으므로 패키지 이미지는 images 폴더에 파일로 풀어둔다
+                program_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+                template_store.materialize_refs(blocks + self.macro_list.subroutines.all_blocks(),
+                                                os.path.join(program_root, "images"))
+            result = {}
+
+            def on_done(error):
+                result["error"] = error
+                if not wait:
+                    self.root.after(0, lambda: self._on_save_done(path, error))
+
+            self.autosaver.cancel()
+            self.autosaver.submit(SaveJob(
+                path, snapshot_blocks(blocks), dict(self.settings), dict(self.hotkeys),
+                subroutines=self.macro_list.subroutines.snapshot(),
+                discard_on_success=recovery_path(path), on_done=on_done
+            ))
         except Exception as e:
             messagebox.showerror("에러", f"저장 실패:\n{e}")
             return False
+        self._mark_dirty(False)
+        if wait:
+            self.autosaver.flush()
+            return self._on_save_done(path, result.get("error"))
+        return True
+
+    def _on_save_done(self, path: str, error: Exception | None) -> bool:
+        if error is not None:
+            messagebox.showerror("에러", f"저장 실패:\n{error}")
+            if path == self.current_path:
+                self._mark_dirty(True)
+            return False
+        if is_package_path(path):
+            # 저장(keep_open)으로 새 파일을 연 사용자가 됨
+            self._hold_package(path)
+        self.app_state.add_recent_file(path)
+        return True
 
-    def save_file_as(self) -> bool:
+    def save_file_as(self, wait: bool = False) -> bool:
         if self.running:
             messagebox.showwarning("저장 불가", "실행 중에는 저장할 수 없습니다. 중지 후 다시 시도하세요.")
             return False
         path = filedialog.asksaveasfilename(
             title="다른 이름으로 저장",
             defaultextension=".json",
-            filetypes=[("Macro JSON", "*.json"), ("All Files", "*.*")],
+            filetypes=MACRO_FILE_TYPES,
         )
         if not path:
             return False
+        if self.current_path is None:
+            self.autosaver.discard(None)
         self.current_path = path
         self._update_title()
-        return self.save_file()
+        return self.save_file(wait=wait)
 
     # ---------- 설정 ----------
     def open_settings(self):
         self.settings_dialog.open_settings()
 
+    def show_input_stats(self):
+        """Per-event injection latency of the input driver since startup."""
+        from core.input_driver import get_input_driver
+        driver = get_input_driver()
+        stats = driver.stats()
+        if not stats["events"]:
+            messagebox.showinfo("입력 지연 통계", f"드라이버: {driver.name}\n아직 주입한 입력이 없습니다.")
+            return
+        messagebox.showinfo(
+            "입력 지연 통계",
+            f"드라이버: {driver.name}\n"
+            f"이벤트 {stats['events']}개 / 묶음 {stats['batches']}번\n"
+            f"이벤트당 평균 {stats['mean_us']:.0f}µs, 95% {stats['p95_us']:.0f}µs, 최대 {stats['max_us']:.0f}µs"
+        )
+
+    def save_trace(self):
+        """Dump the current (or last) run's per-block execution trace."""
+        from core.trace import TRACE_EXTENSION
+        runner = self.executor.runner
+        if runner is None or not runner.trace.total:
+            messagebox.showinfo("실행 기록 저장", "아직 실행 기록이 없습니다.")
+            return
+        path = filedialog.asksaveasfilename(
+            title="실행 기록 저장",
+            defaultextension=TRACE_EXTENSION,
+            filetypes=[("Clikey 실행 기록", "*" + TRACE_EXTENSION)],
+        )
+        if not path:
+            return
+        if runner.dump_trace(path) is None:
+            messagebox.showerror("실행 기록 저장", "실행 기록을 저장하지 못했습니다.")
+            return
+        messagebox.showinfo("실행 기록 저장", f"{path}\n\n보기: python -m core.trace \"{path}\"")
+
+    def collapse_repeats(self):
+        """Fold identical consecutive blocks into REPEAT blocks (undoable)."""
+        if self.executor.running:
+            return
+        created = self.macro_list.collapse_repeats()
+        if created:
+            messagebox.showinfo("반복 구간 묶기", f"반복 블록 {created}개로 묶었습니다.")
+        else:
+            messagebox.showinfo("반복 구간 묶기", "묶을 수 있는 반복 구간이 없습니다.")
+
+    def show_match_report(self):
+        """Per-block image search hit rates for the current macro (this session)."""
+        history = get_match_history()
+        labels = {block.key: block.get_display_text()
+                  for block, _ in flatten_blocks(self.macro_list.get_macro_blocks()) if block.is_image_condition()}
+        stats = {key: s for key, s in history.stats().items() if key in labels}
+
+        win = tk.Toplevel(self.root)
+        win.title("이미지 탐색 적중률")
+        win.transient(self.root)
+        text = tk.Text(win, width=70, height=20, wrap="word")
+        text.pack(fill="both", expand=True, padx=10, pady=(10, 5))
+        lines = format_report(stats, labels)
+        text.insert("1.0", "\n".join(lines) if lines else "아직 실행된 이미지 조건이 없습니다.")
+        text.config(state=tk.DISABLED)
+
+        def reset():
+            history.clear()
+            win.destroy()
+
+        btn_frame = tk.Frame(win)
+        btn_frame.pack(pady=(0, 10))
+        tk.Button(btn_frame, text="초기화", width=8, command=reset).pack(side=tk.LEFT, padx=4)
+        tk.Button(btn_frame, text="닫기", width=8, command=win.destroy).pack(side=tk.LEFT, padx=4)
+
     # ---------- 매크로 추가 ----------
     def add_keyboard(self):
         self.input_dialogs.add_keyboard()
@@ -626,6 +1031,57 @@ class MacroUI:
     def add_delay(self):
         self.input_dialogs.add_delay()
 
+    def add_type_text(self):
+        edit_block = self.edit_mode["block"] if self.edit_mode["enabled"] else None
+        self.input_dialogs.add_type_text(edit_block)
+
+    def add_repeat(self):
+        edit_block = self.edit_mode["block"] if self.edit_mode["enabled"] else None
+        self.input_dialogs.add_repeat(edit_block)
+
+    def add_variable(self):
+        edit_block = self.edit_mode["block"] if self.edit_mode["enabled"] else None
+        self.input_dialogs.add_variable(edit_block)
+
+    def add_expression_condition(self):
+        self.condition_dialog.add_expression_condition()
+
+    def add_call(self):
+        names = self.macro_list.subroutines.names()
+        edit_block = self.edit_mode["block"] if self.edit_mode["enabled"] else None
+        if not names:
+            self._cancel_edit_mode()
+            messagebox.showinfo("서브루틴 호출", "서브루틴이 없습니다. 블록을 선택하고 '선택 영역을 서브루틴으로'를 먼저 사용하세요.")
+            return
+        self.input_dialogs.add_call(names, edit_block)
+
+    def convert_to_subroutine(self):
+        """Move the selected sibling blocks into a named subroutine, leaving a CALL block."""
+        if self.running:
+            return
+        if not self.macro_list.selected_sibling_run():
+            messagebox.showinfo("서브루틴 만들기", "같은 단계에 있는 블록을 하나 이상 선택하세요.")
+            return
+
+        def on_name(name: str):
+            if name in self.macro_list.subroutines and not messagebox.askyesno(
+                    "서브루틴 만들기", f"'{name}' 서브루틴이 이미 있습니다. 선택한 블록으로 바꿀까요?"):
+                return
+            self.macro_list.convert_selection_to_subroutine(name)
+
+        self.input_dialogs.ask_subroutine_name(self.macro_list.subroutines.unique_name(), on_name)
+
+    def expand_call(self):
+        """Replace the selected CALL block with an editable copy of its body."""
+        if self.running:
+            return
+        selected = self.macro_list.get_selected_macro_blocks()
+        if len(selected) != 1 or selected[0].event_type != EventType.CALL:
+            messagebox.showinfo("서브루틴 펼치기", "서브루틴 호출 블록 하나를 선택하세요.")
+            return
+        if not self.macro_list.expand_call(selected[0]):
+            messagebox.showwarning("서브루틴 펼치기", f"'{selected[0].event_data}' 서브루틴을 찾을 수 없습니다.")
+
     def add_image_condition(self):
         self.condition_dialog.add_image_condition()
 
@@ -675,17 +1131,29 @@ class MacroUI:
         if self.running:
             messagebox.showinfo("안내", "이미 실행 중입니다.")
             return
+        if not self._drain_pending_load():
+            return
         if self.macro_list.size() == 0:
             messagebox.showwarning("실행 불가", "매크로 리스트가 비어있습니다.")
             return
 
+        macro_blocks = self.macro_list.get_macro_blocks()
+        subroutines = self.macro_list.subroutines.copy()
+        missing = subroutines.compile(macro_blocks).missing
+        if missing:
+            messagebox.showwarning("실행 불가", "정의되지 않은 서브루틴을 호출합니다:\n" + "\n".join(missing))
+            return
+
         self.running = True
         self.toggle_btn.config(text="■ 중지")
+        self._run_started = time.perf_counter()
 
-        macro_blocks = self.macro_list.get_macro_blocks()
-        if self.executor.start_execution(macro_blocks, self.settings):
-            pass
+        # 실행 기록/지표 내보내기에 쓰는 이름: 파일 이름 (저장 전이면 editor)
+        name = os.path.splitext(os.path.basename(self.current_path))[0] if self.current_path else "editor"
+        if self.executor.start_execution(macro_blocks, self.settings, subroutines, name=name):
+            self._schedule_metrics()
         else:
+            self._run_started = None
             self._finish_execution()
 
     def stop_execution(self):
@@ -693,9 +1161,34 @@ class MacroUI:
             return
         self.executor.stop_execution()
 
+    def _schedule_metrics(self):
+        self._metrics_job = self.root.after(self.METRICS_INTERVAL_MS, self._update_metrics)
+
+    def _update_metrics(self):
+        self._metrics_job = None
+        runner = self.executor.runner
+        if runner is None:
+            return
+        try:
+            self.metrics_label.config(text=format_metrics(runner.sample_metrics()))
+        except Exception:
+            pass
+        if self.running:
+            self._schedule_metrics()
+
     def _finish_execution(self):
         self.running = False
         self.toggle_btn.config(text="▶ 실행하기")
+        if self._metrics_job is not None:
+            self.root.after_cancel(self._metrics_job)
+        # 마지막 값을 남겨 둠 (다음 실행 전까지 조정에 참고)
+        self._update_metrics()
+        if self._run_started is not None and self.current_path:
+            # 중지 요청 여부가 아니라 실행기가 알려 준 종료 이유 (완료/EXIT 만 완료로 기록)
+            runner = self.executor.runner
+            self.app_state.record_run(self.current_path, time.perf_counter() - self._run_started,
+                                      completed=runner is not None and runner.completed)
+        self._run_started = None
 
         if self.settings.get("beep_on_finish", True):
             try:
@@ -758,6 +1251,14 @@ class MacroUI:
             self.add_mouse()
         elif block.event_type == EventType.DELAY:
             self.add_delay()
+        elif block.event_type == EventType.TYPE_TEXT:
+            self.add_type_text()
+        elif block.event_type == EventType.REPEAT:
+            self.add_repeat()
+        elif block.event_type == EventType.CALL:
+            self.add_call()
+        elif block.event_type in (EventType.SET_VAR, EventType.INCREMENT):
+            self.add_variable()
         elif block.event_type == EventType.IF:
             # 조건 타입에 따라 분기
             if hasattr(block, 'condition_type'):
@@ -765,8 +1266,10 @@ class MacroUI:
                 self.condition_dialog.set_edit_block(block)
                 if block.condition_type == ConditionType.RGB_MATCH:
                     self.add_image_condition()
-                elif block.condition_type == ConditionType.IMAGE_MATCH:
+                elif block.is_image_condition():
                     self.add_image_match_condition()
+                elif block.condition_type == ConditionType.EXPRESSION:
+                    self.add_expression_condition()
 
     def _finish_edit_mode(self, new_block):
         """편집 모드 완료 - 기존 블록을 새 블록으로 교체"""
@@ -798,7 +1301,8 @@ class MacroUI:
         """편집 모드 취소"""
         self.edit_mode = {"enabled": False, "block": None, "index": None}
         # 조건 다이얼로그의 편집 블록도 초기화
-        self.condition_dialog.set_edit_block(None)
+        if self._condition_dialog is not None:
+            self._condition_dialog.set_edit_block(None)
 
 
 if __name__ == "__main__":
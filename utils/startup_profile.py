@@ -0,0 +1,121 @@
+"""시작 시간 프로파일링.
+
+``--profile-startup`` 인자나 ``CLIKEY_PROFILE_STARTUP=1`` 환경 변수로 켠다.
+켜지면 sys.meta_path 에 타이머를 걸어 모듈별 import 시간(자기 시간/누적 시간)을
+기록하고, first paint / interactive 시점과 함께 콘솔에 요약하고
+~/.clikey/startup_profile.json 으로 저장한다. 꺼져 있으면 mark() 는 시각만 기록한다.
+"""
+import json
+import os
+import sys
+import time
+
+_t0 = time.perf_counter()
+_enabled = False
+_marks = {}
+_imports = []  # (name, self_sec, total_sec, depth)
+_stack = []  # 진행 중인 import 의 [자식 누적 시간]
+
+
+def is_requested(argv=None) -> bool:
+    argv = sys.argv if argv is None else argv
+    return "--profile-startup" in argv or os.environ.get("CLIKEY_PROFILE_STARTUP") == "1"
+
+
+class _TimedLoader:
+    def __init__(self, loader, name):
+        self._loader = loader
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(self._loader, attr)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        _stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            total = time.perf_counter() - start
+            children = _stack.pop()
+            if _stack:
+                _stack[-1] += total
+            _imports.append((self._name, total - children, total, len(_stack)))
+
+
+class _TimingFinder:
+    """meta_path entry that wraps every other finder's loader with a timer."""
+
+    @staticmethod
+    def find_spec(name, path=None, target=None):
+        for finder in sys.meta_path:
+            if isinstance(finder, _TimingFinder) or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                    spec.loader = _TimedLoader(spec.loader, name)
+                return spec
+        return None
+
+
+def set_start_time(start_time: float) -> None:
+    """Use the process' own start timestamp (perf_counter) as time zero."""
+    global _t0
+    _t0 = start_time
+
+
+def enable() -> None:
+    global _enabled
+    if _enabled:
+        return
+    _enabled = True
+    sys.meta_path.insert(0, _TimingFinder())
+
+
+def disable() -> None:
+    global _enabled
+    _enabled = False
+    sys.meta_path[:] = [f for f in sys.meta_path if not isinstance(f, _TimingFinder)]
+
+
+def mark(name: str) -> float:
+    """Record the first time a milestone is reached; returns seconds since start."""
+    if name not in _marks:
+        _marks[name] = time.perf_counter() - _t0
+    return _marks[name]
+
+
+def elapsed(name: str):
+    return _marks.get(name)
+
+
+def report(top: int = 25) -> None:
+    """Print milestones and the slowest imports, and dump everything as JSON."""
+    for name, sec in sorted(_marks.items(), key=lambda kv: kv[1]):
+        print(f"[Startup] {name}: {sec * 1000:.1f} ms")
+    if not _enabled:
+        return
+    disable()
+    by_total = sorted(_imports, key=lambda r: r[2], reverse=True)
+    print(f"[Startup] {len(_imports)} modules imported, "
+          f"{sum(r[1] for r in _imports) * 1000:.1f} ms total import time")
+    print(f"{'self ms':>9} {'total ms':>9}  module")
+    for name, self_sec, total_sec, depth in by_total[:top]:
+        print(f"{self_sec * 1000:>9.1f} {total_sec * 1000:>9.1f}  {'  ' * depth}{name}")
+    try:
+        out_dir = os.path.join(os.path.expanduser("~"), ".clikey")
+        os.makedirs(out_dir, exist_ok=True)
+        with open(os.path.join(out_dir, "startup_profile.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "marks_ms": {k: round(v * 1000, 2) for k, v in _marks.items()},
+                "imports": [
+                    {"module": n, "self_ms": round(s * 1000, 3), "total_ms": round(t * 1000, 3), "depth": d}
+                    for n, s, t, d in _imports
+                ],
+            }, f, ensure_ascii=False, indent=2)
+    except Exception:
+        pass